@@ -0,0 +1,82 @@
+"""Benchmarks of calibrating synthetic experiments of several durations"""
+
+import os
+import tempfile
+
+import pandas
+
+from pylleo import lleocal
+from pylleo import lleoio
+from pylleo import synthetic
+
+DURATIONS_S = [600, 3600, 6 * 3600]
+
+
+class Calibration:
+    params = DURATIONS_S
+    param_names = ["duration_s"]
+    timeout = 600
+
+    def setup_cache(self):
+        path_parent = tempfile.mkdtemp(prefix="pylleo_bench_")
+        paths = dict()
+        for duration_s in DURATIONS_S:
+            path_dir = synthetic.write_experiment(
+                os.path.join(path_parent, str(duration_s)), duration_s=duration_s
+            )
+            meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+            lleoio.read_data(meta, path_dir)
+            paths[duration_s] = (path_dir, meta)
+
+        return paths
+
+    def setup(self, paths, duration_s):
+        self.path_dir, meta = paths[duration_s]
+        self.data_df = lleoio.read_data(meta, self.path_dir)
+
+        self.cal_dict = {"parameters": dict()}
+        for param, bound, start, end in synthetic.calibration_regions():
+            lleocal.update(self.data_df, self.cal_dict, param, bound, start, end)
+        for param in lleocal.ACC_PARAMS:
+            lower, upper = lleocal.get_cal_data(self.data_df, self.cal_dict, param)
+            self.cal_dict["parameters"][param]["poly"] = list(
+                lleocal.fit1d(lower, upper)
+            )
+        self.lower, self.upper = lower, upper
+
+        # Speed calibrations over the first dives
+        t0 = self.data_df["datetimes"].iloc[0]
+        self.speed_csv = os.path.join(self.path_dir, "speed_calibrations.csv")
+        pandas.DataFrame(
+            {
+                "start": [t0 + pandas.Timedelta(s, "s") for s in (80, 320)],
+                "end": [t0 + pandas.Timedelta(s, "s") for s in (200, 440)],
+                "est_speed": [2.0, 2.0],
+            }
+        ).to_csv(self.speed_csv, index=False)
+
+    def time_get_cal_data(self, paths, duration_s):
+        for param in lleocal.ACC_PARAMS:
+            lleocal.get_cal_data(self.data_df, self.cal_dict, param)
+
+    def peakmem_get_cal_data(self, paths, duration_s):
+        for param in lleocal.ACC_PARAMS:
+            lleocal.get_cal_data(self.data_df, self.cal_dict, param)
+
+    def time_fit1d(self, paths, duration_s):
+        lleocal.fit1d(self.lower, self.upper)
+
+    def peakmem_fit1d(self, paths, duration_s):
+        lleocal.fit1d(self.lower, self.upper)
+
+    def time_calibrate_acc(self, paths, duration_s):
+        lleocal.calibrate_acc(self.data_df, self.cal_dict)
+
+    def peakmem_calibrate_acc(self, paths, duration_s):
+        lleocal.calibrate_acc(self.data_df, self.cal_dict)
+
+    def time_create_speed_csv(self, paths, duration_s):
+        lleocal.create_speed_csv(self.speed_csv, self.data_df)
+
+    def peakmem_create_speed_csv(self, paths, duration_s):
+        lleocal.create_speed_csv(self.speed_csv, self.data_df)
@@ -0,0 +1,67 @@
+"""Benchmarks of reading synthetic experiments of several durations
+
+Run with `asv run`, or `asv dev` for a quick check of the current tree.
+"""
+
+import os
+import tempfile
+
+from pylleo import lleoio
+from pylleo import synthetic
+
+DURATIONS_S = [600, 3600, 6 * 3600]
+
+
+def _remove_caches(path_dir):
+    for name in os.listdir(path_dir):
+        if name == "meta.yml" or name.startswith("pydata_"):
+            os.remove(os.path.join(path_dir, name))
+
+
+class ReadData:
+    params = DURATIONS_S
+    param_names = ["duration_s"]
+    number = 1
+    repeat = 3
+    timeout = 600
+
+    def setup_cache(self):
+        path_parent = tempfile.mkdtemp(prefix="pylleo_bench_")
+        paths = dict()
+        for duration_s in DURATIONS_S:
+            paths[duration_s] = synthetic.write_experiment(
+                os.path.join(path_parent, str(duration_s)), duration_s=duration_s
+            )
+
+        return paths
+
+    def setup(self, paths, duration_s):
+        self.path_dir = paths[duration_s]
+        _remove_caches(self.path_dir)
+        self.meta = lleoio.read_meta(self.path_dir, "W190PD3GT", 34840)
+
+    def time_read_meta(self, paths, duration_s):
+        os.remove(os.path.join(self.path_dir, "meta.yml"))
+        lleoio.read_meta(self.path_dir, "W190PD3GT", 34840)
+
+    def peakmem_read_meta(self, paths, duration_s):
+        os.remove(os.path.join(self.path_dir, "meta.yml"))
+        lleoio.read_meta(self.path_dir, "W190PD3GT", 34840)
+
+    def time_read_data(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir, overwrite=True)
+
+    def peakmem_read_data(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir, overwrite=True)
+
+    def time_read_data_cached(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir)
+
+    def time_read_data_resampled(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir, overwrite=True, interval_s=1)
+
+    def peakmem_read_data_cached(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir)
+
+    def peakmem_read_data_resampled(self, paths, duration_s):
+        lleoio.read_data(self.meta, self.path_dir, overwrite=True, interval_s=1)
@@ -27,8 +27,14 @@ setup(
     package_dir={"": "src"},
     setup_requires=setup_requirements,
     install_requires=requirements("requirements.in"),
+    extras_require={
+        "archive": ["h5py"],
+        "dask": ["dask[dataframe]"],
+        "parquet": ["pyarrow"],
+        "zstd": ["zstandard"],
+    },
     test_requires=requirements("requirements_test.txt"),
-    scripts=["bin/pylleo-cal"],
+    scripts=["bin/pylleo", "bin/pylleo-cal"],
     include_package_data=True,
     use_scm_version={"write_to": "src/pylleo/_version.py", "relative_to": __file__},
     keywords=["datalogger", "accelerometer", "biotelemetry"],
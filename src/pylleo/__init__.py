@@ -2,3 +2,39 @@ try:
     from ._version import version as __version__
 except ImportError:
     __version__ = "0.0.0"
+
+# Submodules are imported on first access (e.g. `pylleo.lleoio`), so that
+# importing pylleo does not import numpy, pandas or bokeh
+_submodules = (
+    "align",
+    "archive",
+    "batch",
+    "catalog",
+    "derived",
+    "dives",
+    "lleocal",
+    "lleoio",
+    "metrics",
+    "parquet",
+    "qc",
+    "sources",
+    "spectral",
+    "synthetic",
+    "tags",
+    "utils",
+    "utils_bokeh",
+    "watch",
+)
+
+
+def __getattr__(name):
+    import importlib
+
+    if name in _submodules:
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_submodules))
@@ -0,0 +1,326 @@
+"""Time alignment of experiments with external sensors
+
+The clock of a tag and that of an external logger (e.g. a video camera or a
+GPS) differ by an offset, and drift apart at a constant rate over a
+deployment. `estimate_alignment` estimates both from a channel of the tag
+(e.g. acceleration or depth) and a time series of the external logger
+measuring the same movements:
+
+1. Both series are averaged over bins of `interval_s` and cross-correlated
+   for all offsets at once by FFT (see `xcorr`).
+2. The best offset is refined at the full rate of the channel, by
+   correlating it with the external series interpolated to its samples
+   within one bin of the offset.
+3. The offset is estimated in the same way in consecutive segments of the
+   deployment, and the drift is the slope of a line fit through them.
+
+The result is a time index of the tag's rows in the external clock, which
+`apply_alignment` stores in `attrs["time_index"]` of the data, so no
+timestamps are rewritten.
+"""
+
+
+def _standardize(values):
+    """Standardized values with missing values set to 0, and their mask"""
+    import numpy
+
+    valid = ~numpy.isnan(values)
+    z = numpy.zeros(len(values))
+    if valid.sum() > 1:
+        z[valid] = values[valid] - values[valid].mean()
+        sd = z[valid].std()
+        if sd > 0:
+            z[valid] /= sd
+
+    return z, valid.astype(float)
+
+
+def xcorr(x, y, min_overlap=1):
+    """Cross-correlate two regularly sampled series by FFT
+
+    Missing values (NaN) are left out of the correlation at each lag.
+
+    Args
+    ----
+    x: ndarray, shape (n,)
+        First series
+    y: ndarray, shape (m,)
+        Second series, sampled at the interval of `x`
+    min_overlap: int
+        Number of samples present in both series at a lag from which its
+        correlation is returned
+
+    Returns
+    -------
+    lags: ndarray, shape (n + m - 1,)
+        Lags, `x[i]` matching `y[i + lag]`
+    corr: ndarray, shape (n + m - 1,)
+        Correlation of the standardized series at each lag, NaN below
+        `min_overlap`
+    overlap: ndarray, shape (n + m - 1,)
+        Number of samples present in both series at each lag
+
+    Example
+    -------
+    >>> import numpy
+    >>> x = numpy.random.default_rng(0).normal(size=200)
+    >>> lags, corr, _ = xcorr(x, x[5:], min_overlap=100)
+    >>> int(lags[numpy.nanargmax(corr)])
+    -5
+    """
+    import numpy
+
+    zx, mx = _standardize(numpy.asarray(x, dtype=float))
+    zy, my = _standardize(numpy.asarray(y, dtype=float))
+    n = len(zx) + len(zy) - 1
+    nfft = 1 << (n - 1).bit_length()
+
+    def _cc(a, b):
+        fa, fb = numpy.fft.rfft(a, nfft), numpy.fft.rfft(b, nfft)
+        return numpy.fft.irfft(numpy.conj(fa) * fb, nfft)
+
+    # Negative lags wrap to the end of the circular correlation
+    lags = numpy.arange(-(len(zx) - 1), len(zy))
+    overlap = numpy.rint(_cc(mx, my)[lags]).astype(numpy.int64)
+    corr = numpy.full(len(lags), numpy.nan)
+    enough = overlap >= max(min_overlap, 1)
+    corr[enough] = _cc(zx, zy)[lags][enough] / overlap[enough]
+
+    return lags, corr, overlap
+
+
+def _bin(t_s, values, interval_s):
+    """Average values over bins of time, returning the first bin and means"""
+    import numpy
+
+    valid = ~numpy.isnan(values)
+    bins = numpy.floor(t_s[valid] / interval_s).astype(numpy.int64)
+    if len(bins) == 0:
+        return 0, numpy.empty(0)
+
+    k0 = bins.min()
+    counts = numpy.bincount(bins - k0)
+    sums = numpy.bincount(bins - k0, weights=values[valid])
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        return k0, sums / counts
+
+
+def _peak(corr, k):
+    """Position of the peak of a parabola through `corr[k]` and its neighbours"""
+    import numpy
+
+    if not 0 < k < len(corr) - 1:
+        return 0.0
+    c0, c1, c2 = corr[k - 1], corr[k], corr[k + 1]
+    denom = c0 - 2 * c1 + c2
+    if not (numpy.isfinite(denom) and denom < 0):
+        return 0.0
+
+    return 0.5 * (c0 - c2) / denom
+
+
+def _refine(x, interval_x, t_y, y, offset_s, n_lags, min_rows):
+    """Correlate a channel with the external series around an offset
+
+    The external series is interpolated to the samples of `x` (starting at
+    0 s) shifted by `offset_s + k * interval_x`, for `k` within `n_lags`.
+    """
+    import numpy
+
+    n = len(x)
+    t = offset_s + (numpy.arange(n + 2 * n_lags) - n_lags) * interval_x
+    y_x = numpy.interp(t, t_y, y, left=numpy.nan, right=numpy.nan)
+
+    corr = numpy.full(2 * n_lags + 1, numpy.nan)
+    for k in range(2 * n_lags + 1):
+        y_k = y_x[k : k + n]
+        valid = ~(numpy.isnan(x) | numpy.isnan(y_k))
+        if valid.sum() >= min_rows:
+            x_v, y_v = x[valid], y_k[valid]
+            if x_v.std() > 0 and y_v.std() > 0:
+                corr[k] = numpy.corrcoef(x_v, y_v)[0, 1]
+
+    return corr
+
+
+def _estimate(x, interval_x, t_y, y, interval_s, center_s, search_s, min_overlap):
+    """Estimate the offset of a channel, starting at 0 s, to the external series
+
+    Returns the offset [s], such that the sample of `x` at `t` matches the
+    external sample at `t + offset`, and its correlation, or NaNs when the
+    series do not overlap enough.
+    """
+    import numpy
+
+    t_x = numpy.arange(len(x)) * interval_x
+    kx, x_bins = _bin(t_x, x, interval_s)
+    ky, y_bins = _bin(t_y, y, interval_s)
+    shorter = min((~numpy.isnan(x_bins)).sum(), (~numpy.isnan(y_bins)).sum())
+    if shorter < 2:
+        return numpy.nan, numpy.nan
+
+    # Coarse offset, from the cross-correlation of the binned series
+    min_bins = max(int(min_overlap * shorter), 2)
+    lags, corr, _ = xcorr(x_bins, y_bins, min_overlap=min_bins)
+    offsets = (ky - kx + lags) * interval_s
+    corr[numpy.abs(offsets - center_s) > search_s] = numpy.nan
+    if numpy.isnan(corr).all():
+        return numpy.nan, numpy.nan
+    m = int(numpy.nanargmax(corr))
+    coarse = offsets[m] + _peak(corr, m) * interval_s
+
+    # Refined at the full rate within half a bin of the coarse offset
+    n_lags = int(numpy.ceil(0.5 * interval_s / interval_x)) + 1
+    # As many samples of `x` as bins of the shorter series were required
+    covered = min((t_y[-1] - t_y[0]) / (len(x) * interval_x), 1.0)
+    min_rows = max(int(min_overlap * covered * (~numpy.isnan(x)).sum()), 2)
+    fine = _refine(x, interval_x, t_y, y, coarse, n_lags, min_rows)
+    if numpy.isnan(fine).all():
+        return numpy.nan, numpy.nan
+    k = int(numpy.nanargmax(fine))
+
+    return coarse + (k - n_lags + _peak(fine, k)) * interval_x, fine[k]
+
+
+def estimate_alignment(
+    data_df,
+    col,
+    external,
+    interval_s=1.0,
+    max_offset_s=600.0,
+    segments=4,
+    max_drift_s=10.0,
+    min_overlap=0.5,
+):
+    """Estimate the clock offset and drift of an experiment to an external series
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Dataframe returned by `lleoio.read_data`
+    col: str
+        Column of `data_df` to align, e.g. `acceleration_z` or `depth`
+    external: pandas.Series
+        External time series measuring the same movements as `col`,
+        indexed by the times of the external clock. It may be sampled
+        irregularly and at another rate.
+    interval_s: float
+        Bin width [s] of the coarse cross-correlation, and the resolution of
+        the coarse offset refined at the rate of `col`
+    max_offset_s: float
+        Largest offset searched [s]
+    segments: int
+        Number of segments of the overlap in which the offset is estimated
+        to fit the drift, `1` to estimate only an offset
+    max_drift_s: float
+        Largest change of the offset over the overlap [s], searched around
+        the offset in each segment
+    min_overlap: float
+        Fraction of the shorter series that must overlap the other at an
+        offset
+
+    Returns
+    -------
+    alignment: dict
+        `offset_s` [s] of the external clock to the tag's at the first row
+        (over the overlap, without drift), `drift` of the external clock
+        [s/s], `corr` of the overall offset,
+        `segments` with the `t_s` (time of the center from the first row),
+        `offset_s` and `corr` of each segment, and `t_index`, the time index
+        of the rows in the external clock (see `apply_alignment`)
+    """
+    import numpy
+    import pandas
+
+    from . import lleoio
+
+    t_index = lleoio.get_time_index(data_df)
+    interval_x = t_index["interval_s"]
+    x = data_df[col].to_numpy(dtype=float, na_value=numpy.nan)
+
+    times = pandas.DatetimeIndex(external.index)
+    t_y = (times - t_index["start"]).total_seconds().to_numpy()
+    y = external.to_numpy(dtype=float, na_value=numpy.nan)
+    present = ~numpy.isnan(y)
+    order = numpy.argsort(t_y[present], kind="stable")
+    t_y, y = t_y[present][order], y[present][order]
+
+    offset, corr = _estimate(
+        x, interval_x, t_y, y, interval_s, 0.0, max_offset_s, min_overlap
+    )
+    if numpy.isnan(offset):
+        raise ValueError(
+            "No offset found where {} overlaps the external series".format(col)
+        )
+
+    # Offsets of segments of the overlap, in the tag's time
+    t0 = max(0.0, t_y[0] - offset)
+    t1 = min(len(x) * interval_x, t_y[-1] - offset)
+    bounds = numpy.linspace(t0, t1, segments + 1)
+    margin = abs(offset) + max_drift_s + interval_s
+    found = list()
+    for s0, s1 in zip(bounds[:-1], bounds[1:]):
+        i0, i1 = int(s0 / interval_x), int(numpy.ceil(s1 / interval_x))
+        j0, j1 = numpy.searchsorted(t_y, [s0 - margin, s1 + margin])
+        t_start = i0 * interval_x
+        seg_offset, seg_corr = _estimate(
+            x[i0:i1],
+            interval_x,
+            t_y[j0:j1] - t_start,
+            y[j0:j1],
+            interval_s,
+            offset,
+            max_drift_s,
+            min_overlap,
+        )
+        found.append(
+            dict(
+                t_s=float((s0 + s1) / 2),
+                offset_s=float(seg_offset),
+                corr=float(seg_corr),
+            )
+        )
+
+    drift, offset_0 = 0.0, offset
+    fit = [s for s in found if numpy.isfinite(s["offset_s"])]
+    if (segments > 1) and (len(fit) > 1):
+        t_s = numpy.array([s["t_s"] for s in fit])
+        offsets = numpy.array([s["offset_s"] for s in fit])
+        drift, offset_0 = numpy.polyfit(t_s, offsets, 1)
+
+    start = t_index["start"] + pandas.Timedelta(seconds=float(offset_0))
+    aligned = lleoio.time_index(start, interval_x * (1 + drift), t_index["n"])
+
+    return dict(
+        offset_s=float(offset_0),
+        drift=float(drift),
+        corr=float(corr),
+        segments=found,
+        t_index=aligned,
+    )
+
+
+def apply_alignment(data_df, alignment):
+    """Set the time index of a dataframe to the external clock
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Dataframe returned by `lleoio.read_data`
+    alignment: dict
+        Alignment returned by `estimate_alignment`
+
+    Returns
+    -------
+    data_df: pandas.DataFrame
+        Shallow copy of `data_df` with the aligned time index in `attrs`,
+        and its `datetimes` column, if any, recreated from it
+    """
+    from . import lleoio
+
+    data_df = data_df.copy(deep=False)
+    data_df.attrs = dict(data_df.attrs, time_index=alignment["t_index"])
+    if "datetimes" in data_df.columns:
+        data_df["datetimes"] = lleoio.materialize_datetimes(alignment["t_index"])
+
+    return data_df
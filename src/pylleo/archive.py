@@ -0,0 +1,170 @@
+"""Chunked, compressed HDF5 archives of experiment data
+
+Each column of a `read_data` dataframe, raw or calibrated, is stored as a
+chunked and compressed dataset, together with the implicit time index and
+the experiment's meta data and calibration. Time windows are read by
+converting their times to rows with the time index, so only the chunks
+covering the window are read and decompressed.
+
+Requires `h5py` (`pip install pylleo[archive]`).
+"""
+
+
+def _mask_name(col):
+    """Name of the dataset holding missing value masks of a column"""
+    return "{}__mask".format(col)
+
+
+def write_archive(
+    path, data_df, meta, cal_dict=None, chunk_rows=2**16, compression="gzip"
+):
+    """Write experiment data to a chunked, compressed HDF5 archive
+
+    Args
+    ----
+    path: str
+        Path of the archive file to create
+    data_df: pandas.DataFrame
+        Dataframe returned by `lleoio.read_data`, optionally with calibrated
+        columns, e.g. from `lleocal.calibrate_acc`
+    meta: dict
+        Dictionary of meta data from `lleoio.read_meta`
+    cal_dict: dict, optional
+        Calibration dictionary from `lleocal.read_cal`
+    chunk_rows: int
+        Number of rows in each chunk, the unit of reading and compression
+    compression: str
+        HDF5 compression filter, e.g. `gzip` or `lzf`
+    """
+    import h5py
+    import json
+    import numpy
+    import pandas
+
+    from . import lleoio
+    from . import utils
+
+    t_index = lleoio.get_time_index(data_df)
+
+    with utils.file_lock(path), utils.atomic_path(path) as tmp, h5py.File(
+        tmp, "w", track_order=True
+    ) as f:
+        f.attrs["start"] = t_index["start"].isoformat()
+        f.attrs["interval_s"] = t_index["interval_s"]
+        f.attrs["n"] = t_index["n"]
+        f.attrs["meta"] = json.dumps(meta, default=str)
+        f.attrs["cal"] = json.dumps(cal_dict or {}, default=str)
+
+        kwargs = dict(
+            chunks=(min(chunk_rows, max(len(data_df), 1)),),
+            compression=compression,
+            shuffle=True,
+        )
+        for col in data_df.columns:
+            if col == "datetimes":
+                continue
+            values = data_df[col].array
+            # Masked integers are stored as values and a mask of missing rows
+            if isinstance(values, pandas.arrays.IntegerArray):
+                data = values.to_numpy(values.dtype.numpy_dtype, na_value=0)
+                f.create_dataset(col, data=data, **kwargs)
+                mask = numpy.asarray(values.isna())
+                if mask.any():
+                    f.create_dataset(_mask_name(col), data=mask, **kwargs)
+            else:
+                f.create_dataset(col, data=numpy.asarray(values), **kwargs)
+
+    return None
+
+
+def read_archive_info(path):
+    """Read the time index, meta data and calibration of an archive
+
+    Returns
+    -------
+    t_index: dict
+        Implicit time index of the archived data, see `lleoio.time_index`
+    meta: dict
+        Meta data of the experiment
+    cal_dict: dict
+        Calibration dictionary of the experiment, empty if not archived
+    """
+    from collections import OrderedDict
+    import h5py
+    import json
+
+    from . import lleoio
+
+    with h5py.File(path, "r") as f:
+        t_index = lleoio.time_index(
+            f.attrs["start"], f.attrs["interval_s"], f.attrs["n"]
+        )
+        meta = json.loads(f.attrs["meta"], object_pairs_hook=OrderedDict)
+        cal_dict = json.loads(f.attrs["cal"], object_pairs_hook=OrderedDict)
+
+    return t_index, meta, cal_dict
+
+
+def read_archive(path, start=None, end=None, columns=None, datetimes=True):
+    """Read a time window of experiment data from an HDF5 archive
+
+    Args
+    ----
+    path: str
+        Path of the archive file
+    start: datetime-like, optional
+        Start of the window, defaults to the start of the data
+    end: datetime-like, optional
+        End of the window (inclusive), defaults to the end of the data
+    columns: list of str, optional
+        Columns to read, defaults to all columns
+    datetimes: bool
+        Add a materialized `datetimes` column for the window
+
+    Returns
+    -------
+    data_df: pandas.DataFrame
+        Rows of the window, indexed by their row in the whole experiment,
+        with the time index of the window and the archived `meta` and `cal`
+        dictionaries in `data_df.attrs`
+    """
+    import h5py
+    import numpy
+    import pandas
+
+    from . import lleoio
+
+    t_index, meta, cal_dict = read_archive_info(path)
+
+    rows = lleoio.time_slice(
+        t_index,
+        t_index["start"] if start is None else start,
+        lleoio.index_to_time(t_index, t_index["n"] - 1) if end is None else end,
+    )
+
+    data = dict()
+    with h5py.File(path, "r") as f:
+        if columns is None:
+            columns = [c for c in f.keys() if not c.endswith("__mask")]
+        for col in columns:
+            values = f[col][rows]
+            if _mask_name(col) in f:
+                mask = f[_mask_name(col)][rows]
+                values = pandas.arrays.IntegerArray(values, mask)
+            data[col] = values
+
+    index = pandas.RangeIndex(rows.start, rows.stop)
+    data_df = pandas.DataFrame(data, index=index, columns=columns)
+
+    t_index_window = lleoio.time_index(
+        lleoio.index_to_time(t_index, rows.start), t_index["interval_s"], len(index)
+    )
+    data_df.attrs["time_index"] = t_index_window
+    data_df.attrs["meta"] = meta
+    data_df.attrs["cal"] = cal_dict
+
+    if datetimes:
+        times = lleoio.index_to_time(t_index, numpy.arange(rows.start, rows.stop))
+        data_df.insert(0, "datetimes", times)
+
+    return data_df
@@ -0,0 +1,282 @@
+"""Batch calibration of the experiments in a parent directory
+
+`calibrate_batch` applies the accelerometer calibration of every experiment
+of a parent directory with a fitted `cal.yml` (see `lleocal.fit1d`), and
+optionally a propeller calibration, in a pool of worker processes, and
+exports the calibrated data to a Parquet dataset (see `parquet`).
+
+Each exported experiment records the inputs it was built from in the
+`provenance` entry of the meta data in its file footers: the latest
+modification time and size of its data files, hashes of its `cal.yml` and
+the propeller calibration, and the options and version of pylleo. An
+experiment is only calibrated again when its provenance changes.
+
+The data of each experiment is read within a memory budget (see
+`lleoio.read_data`), by default an equal share of half of the physical
+memory for each worker. Exports are never resampled to fit it: an
+experiment that only fits resampled fails, and the strategy it was read
+with is recorded as `read_strategy` in the meta data of its footers.
+
+Requires `pyarrow` (`pip install pylleo[parquet]`).
+"""
+
+OUTPUT_NAME = "pylleo_calibrated"
+
+# Physical memory assumed where it cannot be found [bytes]
+ASSUMED_MEMORY = 8 * 10**9
+
+
+def _hash_file(path):
+    """SHA-256 hash of the contents of a file, or `None` without a file"""
+    import hashlib
+
+    if path is None:
+        return None
+
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def worker_memory(workers=1):
+    """Memory budget of each worker, an equal share of half of the memory
+
+    Args
+    ----
+    workers: int
+        Number of workers reading data at once
+
+    Returns
+    -------
+    n_bytes: int
+        Memory available to each worker [bytes]
+    """
+    import os
+
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        total = ASSUMED_MEMORY
+
+    return total // (2 * max(workers, 1))
+
+
+def provenance(path_dir, propeller_cal=None, **options):
+    """Describe the inputs of calibrating an experiment
+
+    Args
+    ----
+    path_dir: str
+        Experiment directory or archive
+    propeller_cal: str, optional
+        Path of the propeller calibration csv, see `lleocal.read_propeller_cal`
+    **options
+        Options of calibration changing its output
+
+    Returns
+    -------
+    provenance: dict
+        Data file `signature` (see `watch.scan`), hashes of the `cal` and
+        `propeller_cal` files, `options` and pylleo `version`
+    """
+    import os
+
+    import pylleo
+
+    from . import sources
+    from . import tags
+    from . import utils
+    from . import watch
+
+    name = sources.experiment_name(path_dir)
+    channels = tags.get_tag_model(utils.parse_experiment_params(name)["tag_model"])
+    signature = watch._signature(path_dir, {ch["ext"] for ch in channels})
+
+    return dict(
+        signature=signature,
+        cal=_hash_file(os.path.join(sources.cache_dir(path_dir), "cal.yml")),
+        propeller_cal=_hash_file(propeller_cal),
+        options=options,
+        version=pylleo.__version__,
+    )
+
+
+def _exported_provenance(path_out, experiment):
+    """Provenance recorded in the exported files of an experiment, if any"""
+    import glob
+    import os
+
+    from . import parquet
+
+    pattern = os.path.join(path_out, "experiment=" + experiment, "**", "*.parquet")
+    paths = sorted(glob.glob(pattern, recursive=True))
+    if not paths:
+        return None
+
+    _, meta, _ = parquet.read_parquet_info(paths[0])
+
+    return meta.get("provenance")
+
+
+def calibrate_experiment(
+    path_dir, path_out, propeller_cal=None, max_memory=None, force=False
+):
+    """Calibrate the data of an experiment and export it, unless unchanged
+
+    Args
+    ----
+    path_dir: str
+        Experiment directory or archive with a fitted `cal.yml`
+    path_out: str
+        Root directory of the Parquet dataset to export to
+    propeller_cal: str, optional
+        Path of the propeller calibration csv, to add a `speed` column
+    max_memory: int or str, optional
+        Memory available for the data of the experiment, see
+        `lleoio.read_data`, defaults to `worker_memory()`. Data read lazily
+        with Dask is calibrated and exported one partition at a time. Data
+        is never resampled to fit, a ValueError is raised instead.
+    force: bool
+        Calibrate and export even if the inputs are unchanged
+
+    Returns
+    -------
+    written: bool
+        Whether the experiment was exported, or its export was up to date
+    """
+    import json
+    import os
+
+    from . import lleocal
+    from . import lleoio
+    from . import parquet
+    from . import sources
+    from . import utils
+
+    name = sources.experiment_name(path_dir)
+    # The budget changes how, not which, data is read, so is not an input
+    inputs = provenance(path_dir, propeller_cal)
+    # Compared as stored in the footers
+    inputs = json.loads(json.dumps(inputs))
+    recorded = _exported_provenance(path_out, name)
+    if (not force) and (recorded == inputs):
+        return False
+
+    # Caches read before the data changed are read again from the data files
+    overwrite = (recorded is not None) and (
+        recorded.get("signature") != inputs["signature"]
+    )
+
+    params = utils.parse_experiment_params(name)
+    meta = lleoio.read_meta(
+        path_dir, params["tag_model"], params["tag_id"], overwrite=overwrite
+    )
+    cal_dict = lleocal.read_cal(os.path.join(sources.cache_dir(path_dir), "cal.yml"))
+
+    if max_memory is None:
+        max_memory = worker_memory()
+    strategy, options = lleoio._budget_strategy(
+        meta,
+        path_dir,
+        utils.parse_size(max_memory),
+        compact=True,
+        datetimes=False,
+        interval_s=None,
+    )
+    if strategy == "decimation":
+        raise ValueError(
+            "Data of {} only fits in {} bytes resampled, which exports are not: "
+            "raise `max_memory`, or install dask to stream experiments that "
+            "are not archived".format(name, utils.parse_size(max_memory))
+        )
+
+    data_df = lleoio.read_data(meta, path_dir, overwrite=overwrite, **options)
+    data_df = lleocal.calibrate_acc(data_df, cal_dict)
+    if propeller_cal is not None:
+        data_df = lleocal.calibrate_propeller(data_df, propeller_cal)
+
+    meta = dict(meta, provenance=inputs, read_strategy=strategy)
+    parquet.write_parquet(path_out, data_df, meta, cal_dict)
+
+    return True
+
+
+def _fitted(path_dir):
+    """Whether the `cal.yml` of an experiment fits all accelerometer axes"""
+    from . import catalog
+    from . import sources
+
+    return catalog._cal_status(sources.cache_dir(path_dir)) == "fitted"
+
+
+def calibrate_batch(
+    path_parent,
+    path_out=None,
+    propeller_cal=None,
+    workers=2,
+    max_memory=None,
+    force=False,
+):
+    """Calibrate and export all calibrated experiments of a parent directory
+
+    Args
+    ----
+    path_parent: str
+        Parent directory containing experiment directories or archives
+    path_out: str, optional
+        Root directory of the Parquet dataset, defaults to
+        `pylleo_calibrated` in the parent directory
+    propeller_cal: str, optional
+        Path of a propeller calibration csv applied to all experiments
+    workers: int
+        Number of experiments calibrated at once, each in a process
+    max_memory: int or str, optional
+        Memory available to each worker, see `calibrate_experiment`,
+        defaults to `worker_memory(workers)`
+    force: bool
+        Calibrate and export all experiments, even if unchanged
+
+    Returns
+    -------
+    results: dict
+        Names of experiments `written`, `unchanged`, `uncalibrated` (without
+        a fitted `cal.yml`) and `failed`
+    """
+    import concurrent.futures
+    import logging
+    import os
+
+    from . import watch
+
+    logger = logging.getLogger(__name__)
+
+    path_out = path_out or os.path.join(path_parent, OUTPUT_NAME)
+    if max_memory is None:
+        max_memory = worker_memory(workers)
+    results = dict(written=list(), unchanged=list(), uncalibrated=list(), failed=list())
+
+    futures = dict()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, found in watch.scan(path_parent).items():
+            if not _fitted(found["path"]):
+                results["uncalibrated"].append(name)
+                continue
+            futures[name] = pool.submit(
+                calibrate_experiment,
+                found["path"],
+                path_out,
+                propeller_cal=propeller_cal,
+                max_memory=max_memory,
+                force=force,
+            )
+
+        for name, future in futures.items():
+            try:
+                written = future.result()
+            except Exception as e:
+                logger.warning("Could not calibrate %s: %s", name, e)
+                results["failed"].append(name)
+                continue
+            results["written" if written else "unchanged"].append(name)
+            logger.info("%s %s", "Calibrated" if written else "Unchanged", name)
+
+    return results
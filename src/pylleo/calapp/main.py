@@ -12,9 +12,13 @@ to write those to a calibration YAML file (cal.yml) in the data directory
 Example
 -------
 bokeh serve --show bokeh_calibration.py
+
+Pass `--data-dir <path>` as an app argument (see `pylleo-cal --data-dir`) to
+open a data directory or archive once the app has rendered.
 """
 import datetime
 import os
+import sys
 
 from bokeh.layouts import widgetbox, column, row
 from bokeh.models import (
@@ -82,10 +86,9 @@ def load_data(path_dir):
     params_data: list
         A list of the accelerometer parameter names
     """
-    import os
     import pylleo
 
-    exp_name = os.path.split(path_dir)[1]
+    exp_name = pylleo.sources.experiment_name(path_dir)
     params_tag = pylleo.utils.parse_experiment_params(exp_name)
 
     # Load the Little Leonardo tag data
@@ -105,9 +108,9 @@ def load_data(path_dir):
 def callback_parent(attr, old, new):
     """Update data directories drop down with new parent directory"""
     import os
+    import threading
 
-    def join_isdir(parent, d):
-        return os.path.isdir(os.path.join(parent, d))
+    from pylleo import catalog
 
     # Remove accidental white space if copy/pasted
     new = new.strip()
@@ -115,13 +118,32 @@ def callback_parent(attr, old, new):
 
     # Verify new parent path exists and update `datadirs_select` widget
     if os.path.exists(new):
-        # Create sorted list of data directories, ignore files
-        options = sorted([d for d in os.listdir(new) if join_isdir(new, d)])
+        # List data directories and archives by name only, and index them in
+        # the background, only re-reading those that have changed
+        datadir_paths.clear()
+        datadir_paths.update(catalog.list_experiments(new))
+        options = list(datadir_paths)
+        thread = threading.Thread(target=catalog.update_catalog, args=(new,))
+        thread.daemon = True
+        thread.start()
+
+        if not options:
+            datadirs_select.options = data_dirs
+            datadirs_select.value = data_dirs[0]
+            msg = """
+                  No data directories were found in `{}`.
+                  """.format(
+                new
+            )
+            output_window.text = output_template.format(msg)
+            return None
 
-        # Update dropdown list of available data directories and select first
+        # Update dropdown list of available data directories and select first,
+        # or the one passed with `--data-dir`
+        value = data_dir_name if data_dir_name in options else options[0]
         datadirs_select.options = options
-        datadirs_select.value = options[0]
-        callback_datadirs("value", options[0], options[0])
+        datadirs_select.value = value
+        callback_datadirs("value", value, value)
 
     else:
         msg = """
@@ -144,7 +166,7 @@ def callback_datadirs(attr, old, new):
 
     try:
         # Load data from new data directory
-        path_dir = os.path.join(parent_input.value, new)
+        path_dir = datadir_paths.get(new, os.path.join(parent_input.value, new))
         data, params_tag, params_data = load_data(path_dir)
 
         # Make title with new data directory
@@ -220,7 +242,6 @@ def callback_save_indices():
     """Save index from bokeh textinput"""
     import os
     import pylleo
-    import yamlord
 
     if datadirs_select.value != "None":
         path_dir = os.path.join(parent_input.value, datadirs_select.value)
@@ -243,10 +264,12 @@ def callback_save_indices():
         )
         output_window.text = output_template.format(msg)
 
-        cal_dict = pylleo.lleocal.read_cal(cal_yaml_path)
-        # Generalize for Class-ifying
-        cal_dict = pylleo.lleocal.update(data, cal_dict, param, region, start, end)
-        yamlord.write_yaml(cal_dict, cal_yaml_path)
+        # Lock so that edits from other sessions are not lost
+        with pylleo.utils.file_lock(cal_yaml_path):
+            cal_dict = pylleo.lleocal.read_cal(cal_yaml_path)
+            # Generalize for Class-ifying
+            cal_dict = pylleo.lleocal.update(data, cal_dict, param, region, start, end)
+            pylleo.utils.write_yaml(cal_dict, cal_yaml_path)
     else:
         msg = """
               You must first load data and select indices for calibration
@@ -263,7 +286,6 @@ def callback_save_poly():
     Globals: cal_fname, data (read-only, so no declaration)
     """
     import pylleo
-    import yamlord
 
     def _check_param_regions(param, regions, cal_dict):
         msg = """
@@ -340,8 +362,10 @@ def callback_save_poly():
             poly = list(pylleo.lleocal.fit1d(lower, upper))
             poly = [float(str(i)) for i in poly]
 
-            cal_dict["parameters"][param]["poly"] = poly
-            yamlord.write_yaml(cal_dict, cal_yaml_path)
+            with pylleo.utils.file_lock(cal_yaml_path):
+                cal_dict = pylleo.lleocal.read_cal(cal_yaml_path)
+                cal_dict["parameters"][param]["poly"] = poly
+                pylleo.utils.write_yaml(cal_dict, cal_yaml_path)
         except Exception as e:
             msg = "Problem saving polyfit: {}".format(e)
             output_window.text = output_template.format(msg)
@@ -386,6 +410,8 @@ parent_input.on_change("value", callback_parent)
 
 # Dropdown list of data directories in parent to load data from
 data_dirs = ["None"]
+# Paths of the data directories and archives listed, by experiment name
+datadir_paths = dict()
 title = "Data directories:"
 datadirs_select = Select(title=title, value=data_dirs[0], options=data_dirs)
 datadirs_select.on_change("value", callback_datadirs)
@@ -473,3 +499,21 @@ layout = column(p, row1, row2, width=1100)
 
 # Generate document from layout
 curdoc().add_root(layout)
+
+# Open the data directory passed with `--data-dir` after the first render
+data_dir_name = None
+if "--data-dir" in sys.argv:
+    data_dir = sys.argv[sys.argv.index("--data-dir") + 1]
+    from pylleo import sources
+
+    # Experiments are directories or archives read in place
+    if not (os.path.isdir(data_dir) or sources.is_archive(data_dir)):
+        raise ValueError("{} is neither a directory nor an archive".format(data_dir))
+
+    data_parent = os.path.dirname(os.path.abspath(data_dir))
+    data_dir_name = sources.experiment_name(data_dir)
+
+    def callback_open_data_dir():
+        parent_input.value = data_parent
+
+    curdoc().add_next_tick_callback(callback_open_data_dir)
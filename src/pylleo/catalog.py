@@ -0,0 +1,382 @@
+"""SQLite catalog of the experiments in a parent directory
+
+Each experiment directory or archive of a parent directory is indexed once with its
+parameters (see `utils.parse_experiment_params`), the time range and number
+of samples of each channel, which caches exist and how far it has been
+calibrated. Directories are only re-indexed when the modification time of
+one of their files changes, and channel files are only re-read when they
+change themselves, so updating and querying the catalog of thousands of
+experiments is fast.
+"""
+
+CATALOG_NAME = "pylleo_catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    experiment TEXT PRIMARY KEY,
+    path TEXT,
+    tag_model TEXT,
+    tag_id TEXT,
+    animal TEXT,
+    notes TEXT,
+    start TEXT,
+    end TEXT,
+    cache TEXT,
+    cal_status TEXT,
+    mtime REAL,
+    data_mtime REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    experiment TEXT,
+    channel TEXT,
+    start TEXT,
+    end TEXT,
+    interval_s REAL,
+    n_samples INTEGER,
+    PRIMARY KEY (experiment, channel)
+);
+CREATE INDEX IF NOT EXISTS experiments_animal ON experiments (animal);
+CREATE INDEX IF NOT EXISTS experiments_time ON experiments (start, end);
+"""
+
+# Fixed width, so that times compare as strings
+_TIME_FMT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def catalog_path(path_parent):
+    """Return the default path of the catalog of a parent directory"""
+    import os
+
+    return os.path.join(path_parent, CATALOG_NAME)
+
+
+def _connect(path_db):
+    """Open the catalog database, creating its tables if needed"""
+    import sqlite3
+
+    con = sqlite3.connect(path_db)
+    con.executescript(_SCHEMA)
+
+    return con
+
+
+def _format_time(t):
+    """Format a datetime-like as a string of the catalog"""
+    import pandas
+
+    return pandas.Timestamp(t).strftime(_TIME_FMT)
+
+
+def list_experiments(path_parent):
+    """Find the experiment directories and archives of a parent directory
+
+    Only names are parsed, no files are read, so this is fast enough to list
+    experiments in an interface.
+
+    Returns
+    -------
+    experiments: dict
+        Path of each experiment directory or archive, by experiment name
+    """
+    import os
+
+    from . import sources
+    from . import tags
+    from . import utils
+
+    experiments = dict()
+    for name in sorted(os.listdir(path_parent)):
+        path_dir = os.path.join(path_parent, name)
+        if os.path.isfile(path_dir) and (sources.split_archive(path_dir)[0] is None):
+            continue
+        try:
+            params = utils.parse_experiment_params(sources.experiment_name(name))
+            tags.get_tag_model(params["tag_model"])
+        except (IndexError, KeyError):
+            continue
+        # Archives replace the directory of their caches, sorted before them
+        experiments[sources.experiment_name(name)] = path_dir
+
+    return experiments
+
+
+def _mtimes(path_dir, data_exts):
+    """Return the latest modification time of all files and of data files
+
+    The data of an archive is the archive itself, and its other files are
+    those of its cache directory.
+    """
+    import os
+
+    from . import sources
+
+    mtime = os.stat(path_dir).st_mtime
+    data_mtime = 0.0
+    if os.path.isfile(path_dir):
+        data_mtime = mtime
+    for entry in os.scandir(sources.cache_dir(path_dir)):
+        if not entry.is_file():
+            continue
+        t = entry.stat().st_mtime
+        mtime = max(mtime, t)
+        name = sources.strip_compression(entry.name)
+        if os.path.splitext(name)[1] in data_exts:
+            data_mtime = max(data_mtime, t)
+
+    return mtime, data_mtime
+
+
+def _cal_status(path_dir):
+    """Get calibration status of an experiment from its `cal.yml`
+
+    Returns `none` without a calibration file, `fitted` if all accelerometer
+    axes have polynomial fits and `regions` otherwise.
+    """
+    import os
+    import yamlord
+
+    from . import lleocal
+
+    cal_yaml_path = os.path.join(path_dir, "cal.yml")
+    if not os.path.isfile(cal_yaml_path):
+        return "none"
+
+    cal_dict = yamlord.read_yaml(cal_yaml_path) or dict()
+    params = cal_dict.get("parameters", dict())
+    if all("poly" in params.get(param, dict()) for param in lleocal.ACC_PARAMS):
+        return "fitted"
+
+    return "regions"
+
+
+def _cache_files(path_dir, experiment):
+    """Return names of the data and dive caches of an experiment"""
+    import os
+
+    from . import sources
+
+    prefixes = ("pydata_" + experiment, "pydives_" + experiment)
+    names = [
+        f
+        for f in os.listdir(sources.cache_dir(path_dir))
+        if f.startswith(prefixes) and f.endswith(".p")
+    ]
+
+    return ",".join(sorted(names))
+
+
+def _scan_channels(path_dir, params):
+    """Get time range and number of samples of each channel of an experiment"""
+    from . import lleoio
+    from . import tags
+
+    meta = lleoio.read_meta(path_dir, params["tag_model"], params["tag_id"])
+
+    rows = list()
+    for ch in tags.get_tag_model(params["tag_model"]):
+        _, _, t_index = lleoio._channel_index(meta, path_dir, ch)
+        end = lleoio.index_to_time(t_index, max(t_index["n"] - 1, 0))
+        rows.append(
+            (
+                params["experiment"],
+                ch["name"],
+                _format_time(t_index["start"]),
+                _format_time(end),
+                t_index["interval_s"],
+                t_index["n"],
+            )
+        )
+
+    return rows
+
+
+def update_catalog(path_parent, path_db=None, force=False):
+    """Index the experiments of a parent directory incrementally
+
+    Args
+    ----
+    path_parent: str
+        Parent directory containing experiment directories or archives
+    path_db: str, optional
+        Path of the catalog database, defaults to `catalog_path(path_parent)`
+    force: bool
+        Re-index all experiments, even if unchanged
+
+    Returns
+    -------
+    changes: dict
+        Names of experiments `added`, `updated` and `removed`, and those that
+        could not be indexed (`failed`)
+    """
+    import logging
+    import os
+
+    from . import sources
+    from . import tags
+    from . import utils
+
+    path_db = path_db or catalog_path(path_parent)
+    changes = dict(added=list(), updated=list(), removed=list(), failed=list())
+
+    # Processes updating the catalog at once wait for each other's changes
+    with utils.file_lock(path_db):
+        con = _connect(path_db)
+        with con:
+            known = {
+                row[0]: row[1:]
+                for row in con.execute(
+                    "SELECT experiment, mtime, data_mtime FROM experiments"
+                )
+            }
+
+            found = set()
+            for name, path_dir in list_experiments(path_parent).items():
+                params = utils.parse_experiment_params(name)
+                channels = tags.get_tag_model(params["tag_model"])
+                found.add(name)
+
+                data_exts = {ch["ext"] for ch in channels}
+                mtime, data_mtime = _mtimes(path_dir, data_exts)
+                if (name in known) and not force and known[name][0] == mtime:
+                    continue
+
+                # Channel files are only read again if they have changed
+                rescan = force or (name not in known) or (known[name][1] != data_mtime)
+                try:
+                    if rescan:
+                        channel_rows = _scan_channels(path_dir, params)
+                        # Reading meta data may have written `meta.yml`
+                        mtime, data_mtime = _mtimes(path_dir, data_exts)
+                    cal_status = _cal_status(sources.cache_dir(path_dir))
+                except Exception as e:
+                    logging.getLogger(__name__).warning(
+                        "Could not index %s: %s", name, e
+                    )
+                    changes["failed"].append(name)
+                    continue
+
+                if rescan:
+                    start = min(row[2] for row in channel_rows)
+                    end = max(row[3] for row in channel_rows)
+                    con.execute("DELETE FROM channels WHERE experiment = ?", (name,))
+                    con.executemany(
+                        "INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?)", channel_rows
+                    )
+                else:
+                    start, end = con.execute(
+                        "SELECT start, end FROM experiments WHERE experiment = ?",
+                        (name,),
+                    ).fetchone()
+
+                con.execute(
+                    "INSERT OR REPLACE INTO experiments VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        name,
+                        os.path.abspath(path_dir),
+                        params["tag_model"],
+                        params["tag_id"],
+                        params["animal"],
+                        params["notes"],
+                        start,
+                        end,
+                        _cache_files(path_dir, name),
+                        cal_status,
+                        mtime,
+                        data_mtime,
+                    ),
+                )
+                changes["updated" if name in known else "added"].append(name)
+
+            for name in sorted(set(known) - found):
+                con.execute("DELETE FROM experiments WHERE experiment = ?", (name,))
+                con.execute("DELETE FROM channels WHERE experiment = ?", (name,))
+                changes["removed"].append(name)
+        con.close()
+
+    return changes
+
+
+def find_experiments(
+    path_parent,
+    animal=None,
+    tag_model=None,
+    tag_id=None,
+    start=None,
+    end=None,
+    path_db=None,
+):
+    """Find cataloged experiments by animal, tag and time range
+
+    Args
+    ----
+    path_parent: str
+        Parent directory containing experiment directories
+    animal, tag_model, tag_id: str, optional
+        Only return experiments with these parameters
+    start, end: datetime-like, optional
+        Only return experiments with data between these times
+    path_db: str, optional
+        Path of the catalog database, defaults to `catalog_path(path_parent)`
+
+    Returns
+    -------
+    experiments: pandas.DataFrame
+        Catalog entries of the matching experiments, indexed by experiment
+        name, with the `path` of their directories, their parameters, `start`
+        and `end` of data, names of caches (`cache`) and calibration status
+        (`cal_status`, `none`, `regions` or `fitted`)
+    """
+    import pandas
+
+    query = "SELECT * FROM experiments WHERE 1"
+    args = list()
+    for key, value in (("animal", animal), ("tag_model", tag_model)):
+        if value is not None:
+            query += " AND {} = ?".format(key)
+            args.append(value)
+    if tag_id is not None:
+        query += " AND tag_id = ?"
+        args.append(str(tag_id))
+    if start is not None:
+        query += " AND end >= ?"
+        args.append(_format_time(start))
+    if end is not None:
+        query += " AND start <= ?"
+        args.append(_format_time(end))
+    query += " ORDER BY experiment"
+
+    con = _connect(path_db or catalog_path(path_parent))
+    with con:
+        experiments = pandas.read_sql_query(query, con, params=args)
+    con.close()
+
+    experiments = experiments.drop(columns=["mtime", "data_mtime"])
+    for col in ("start", "end"):
+        experiments[col] = pandas.to_datetime(experiments[col], format=_TIME_FMT)
+
+    return experiments.set_index("experiment")
+
+
+def get_channels(path_parent, experiment, path_db=None):
+    """Get the time range and number of samples of an experiment's channels
+
+    Returns
+    -------
+    channels: pandas.DataFrame
+        `start`, `end`, `interval_s` and `n_samples` of each channel, indexed
+        by channel name
+    """
+    import pandas
+
+    con = _connect(path_db or catalog_path(path_parent))
+    with con:
+        channels = pandas.read_sql_query(
+            "SELECT * FROM channels WHERE experiment = ?", con, params=[experiment]
+        )
+    con.close()
+
+    for col in ("start", "end"):
+        channels[col] = pandas.to_datetime(channels[col], format=_TIME_FMT)
+
+    return channels.drop(columns="experiment").set_index("channel")
@@ -0,0 +1,176 @@
+"""Signals derived from calibrated acceleration
+
+Static (gravitational) acceleration is the centered running mean of each
+axis, and dynamic acceleration what remains. From these, overall (ODBA) and
+vectorial (VeDBA) dynamic body acceleration, pitch and roll are calculated.
+The running means are O(n) with cumulative sums of the values present, over
+whole arrays or chunk by chunk with `iter_derived`.
+"""
+
+ACC_COLS = ("Ax_g", "Ay_g", "Az_g")
+
+
+def _window_offsets(window):
+    """Return number of rows before and after each row in a centered window"""
+    before = window // 2
+    after = window - before - 1
+
+    return before, after
+
+
+def _derive(acc, static):
+    """Calculate derived signals from acceleration and its static component"""
+    from collections import OrderedDict
+    import numpy
+
+    dynamic = acc - static
+
+    derived = OrderedDict()
+    derived["static"] = static
+    derived["dynamic"] = dynamic
+    derived["odba"] = numpy.abs(dynamic).sum(axis=1)
+    derived["vedba"] = numpy.sqrt((dynamic * dynamic).sum(axis=1))
+    derived["pitch"] = numpy.arctan2(
+        static[:, 0], numpy.hypot(static[:, 1], static[:, 2])
+    )
+    derived["roll"] = numpy.arctan2(static[:, 1], static[:, 2])
+
+    return derived
+
+
+def _running_mean(buf, i0, rows, n, window):
+    """Centered running mean of rows of `buf`, which starts at row `i0`
+
+    Windows are truncated at the start of the data and at row `n`, so every
+    row is averaged over the samples available to it. Missing values (NaN)
+    are left out of the means, and windows without values are NaN.
+    """
+    import numpy
+
+    before, after = _window_offsets(window)
+
+    nans = numpy.isnan(buf)
+    csum = numpy.zeros((len(buf) + 1, buf.shape[1]))
+    numpy.cumsum(numpy.where(nans, 0.0, buf), axis=0, out=csum[1:])
+    ccount = numpy.zeros((len(buf) + 1, buf.shape[1]), dtype=numpy.int64)
+    numpy.cumsum(~nans, axis=0, out=ccount[1:])
+
+    lo = numpy.maximum(rows - before, 0) - i0
+    hi = numpy.minimum(rows + after + 1, n) - i0
+
+    count = ccount[hi] - ccount[lo]
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        return numpy.where(count > 0, (csum[hi] - csum[lo]) / count, numpy.nan)
+
+
+def derive(acc, window):
+    """Calculate static and dynamic acceleration, ODBA, VeDBA, pitch and roll
+
+    Args
+    ----
+    acc: ndarray, shape (n, 3)
+        Calibrated acceleration [g] of the x, y and z axes, e.g. from
+        `lleocal.calibrate_acc_array`
+    window: int
+        Number of samples in the centered running mean of static acceleration
+
+    Returns
+    -------
+    derived: OrderedDict
+        `static` and `dynamic` acceleration [g], shape (n, 3), and `odba`,
+        `vedba` [g], `pitch` and `roll` [radians], shape (n,)
+
+    Example
+    -------
+    >>> import numpy
+    >>> acc = numpy.array([[0.0, 0.0, 1.0], [0.2, 0.0, 1.0], [0.0, 0.0, 1.0]])
+    >>> derive(acc, window=3)["odba"].round(3).tolist()
+    [0.1, 0.133, 0.1]
+    """
+    import numpy
+
+    acc = numpy.asarray(acc, dtype=float)
+    static = _running_mean(acc, 0, numpy.arange(len(acc)), len(acc), window)
+
+    return _derive(acc, static)
+
+
+def iter_derived(chunks, window):
+    """Calculate derived signals chunk by chunk with carried filter state
+
+    The rows still needed by the centered running mean are carried between
+    chunks, so the concatenated outputs equal those of `derive`. Outputs lag
+    the input by up to half a window, and the last rows are yielded once the
+    input is exhausted.
+
+    Args
+    ----
+    chunks: iterable of ndarray, shape (m, 3)
+        Consecutive chunks of calibrated acceleration [g]
+    window: int
+        Number of samples in the centered running mean
+
+    Yields
+    ------
+    derived: OrderedDict
+        Derived signals of the next rows, see `derive`
+    """
+    import numpy
+
+    before, after = _window_offsets(window)
+
+    buf = numpy.empty((0, 3))
+    i0 = 0
+    j = 0
+    for chunk in chunks:
+        buf = numpy.concatenate((buf, numpy.asarray(chunk, dtype=float)))
+        i_end = i0 + len(buf)
+
+        # Rows with complete windows, unknown end of data does not truncate
+        rows = numpy.arange(j, max(i_end - after, j))
+        if len(rows) == 0:
+            continue
+        static = _running_mean(buf, i0, rows, i_end, window)
+        yield _derive(buf[rows - i0], static)
+        j = rows[-1] + 1
+
+        # Keep rows needed by the windows of later rows
+        drop = max(j - before - i0, 0)
+        buf = buf[drop:]
+        i0 += drop
+
+    i_end = i0 + len(buf)
+    if j < i_end:
+        rows = numpy.arange(j, i_end)
+        static = _running_mean(buf, i0, rows, i_end, window)
+        yield _derive(buf[rows - i0], static)
+
+
+def add_derived(data_df, window, cols=ACC_COLS):
+    """Add derived signal columns to a dataframe of calibrated acceleration
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with calibrated acceleration columns, see
+        `lleocal.calibrate_acc`
+    window: int
+        Number of samples in the centered running mean
+    cols: iterable of str
+        Calibrated acceleration columns of the x, y and z axes
+
+    Returns
+    -------
+    data_df: pandas.DataFrame
+        Input dataframe with `static_x`, ..., `dynamic_z`, `odba`, `vedba`,
+        `pitch` and `roll` columns added
+    """
+    derived = derive(data_df[list(cols)].to_numpy(dtype=float), window)
+
+    for key in ("static", "dynamic"):
+        names = ["{}_{}".format(key, ax) for ax in "xyz"]
+        data_df[names] = derived.pop(key)
+    for key, values in derived.items():
+        data_df[key] = values
+
+    return data_df
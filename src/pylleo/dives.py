@@ -0,0 +1,246 @@
+"""Dive detection from the depth channel
+
+Dives are found with threshold crossings with hysteresis on depth corrected
+for drift of the surface reading, and are summarized in a compact table of
+row indices that is cached in the data directory, so that the data of each
+dive is a slice of the `read_data` dataframe.
+"""
+
+DIVE_DEFAULTS = {
+    "depth_start": 1.0,
+    "depth_end": 0.5,
+    "min_depth": 2.0,
+    "min_duration_s": 0.0,
+    "offset_window_s": 3600.0,
+    "offset_q": 5.0,
+}
+
+
+def surface_offset(depth, window, q=5.0):
+    """Estimate the depth reading at the surface in consecutive blocks
+
+    Args
+    ----
+    depth: ndarray, shape (n,)
+        Depth samples [m]
+    window: int
+        Number of samples in each block
+    q: float
+        Percentile of the depths of each block taken as the surface reading
+
+    Returns
+    -------
+    offset: ndarray, shape (n,)
+        Surface reading, linearly interpolated between block centers
+
+    Example
+    -------
+    >>> import numpy
+    >>> depth = numpy.array([0.2, 0.2, 5.0, 0.2, 0.4, 0.4, 9.0, 0.4])
+    >>> surface_offset(depth, window=4, q=0).round(2).tolist()
+    [0.2, 0.2, 0.22, 0.28, 0.32, 0.38, 0.4, 0.4]
+    """
+    import numpy
+
+    depth = numpy.asarray(depth, dtype=float)
+    n_blocks = -(-len(depth) // window)
+
+    # Pad the last block with NaN to reshape into blocks
+    blocks = numpy.full(n_blocks * window, numpy.nan)
+    blocks[: len(depth)] = depth
+    levels = numpy.nanpercentile(blocks.reshape(n_blocks, window), q, axis=1)
+
+    block_starts = numpy.arange(n_blocks) * window
+    block_ends = numpy.minimum(block_starts + window, len(depth)) - 1
+    centers = (block_starts + block_ends) / 2
+
+    return numpy.interp(numpy.arange(len(depth)), centers, levels)
+
+
+def detect_dives(depth, interval_s, **kwargs):
+    """Detect dives with threshold crossings with hysteresis
+
+    A dive begins when the offset-corrected depth exceeds `depth_start`, and
+    ends when it returns shallower than `depth_end`. Each dive is extended
+    back to the last sample shallower than `depth_end` before it began.
+
+    Args
+    ----
+    depth: ndarray, shape (n,)
+        Depth [m]. NaN values, e.g. rows between the samples of a depth
+        channel sampled less often than the rows, are skipped.
+    interval_s: float
+        Interval between rows [s]
+    **kwargs
+        Options overriding `DIVE_DEFAULTS`: `depth_start` and `depth_end`
+        [m] thresholds, minimum `min_depth` [m] and `min_duration_s` [s] of
+        dives, and `offset_window_s` [s] and percentile `offset_q` of the
+        surface offset correction (see `surface_offset`)
+
+    Returns
+    -------
+    dives: pandas.DataFrame
+        One row per dive with the `start` and `end` (inclusive) row indices,
+        row of maximum depth `max_idx`, `max_depth` [m] and `duration_s` [s]
+    """
+    import numpy
+    import pandas
+
+    from . import utils
+
+    opts = dict(DIVE_DEFAULTS)
+    unknown = set(kwargs) - set(opts)
+    if unknown:
+        raise ValueError("Unknown dive options: {}".format(sorted(unknown)))
+    opts.update(kwargs)
+
+    depth = numpy.asarray(depth, dtype=float)
+    rows = numpy.flatnonzero(~numpy.isnan(depth))
+    d = depth[rows]
+
+    # Interval between depth samples, from the spacing of valid rows
+    step = numpy.median(numpy.diff(rows)) if len(rows) > 1 else 1
+    window = max(int(opts["offset_window_s"] / (interval_s * step)), 1)
+    if len(d) > 0:
+        d = d - surface_offset(d, window, opts["offset_q"])
+
+    # Hysteresis state is that of the last sample outside of the thresholds
+    above = d > opts["depth_start"]
+    below = d < opts["depth_end"]
+    idx = numpy.arange(len(d))
+    last_event = numpy.maximum.accumulate(numpy.where(above | below, idx, -1))
+    diving = (last_event >= 0) & above[numpy.maximum(last_event, 0)]
+
+    starts, ends = utils.find_runs(diving)
+
+    # Extend dives back to where they left the surface
+    last_below = numpy.maximum.accumulate(numpy.where(below, idx, -1))
+    starts = last_below[starts] + 1
+
+    max_depth = numpy.empty(0)
+    max_idx = numpy.empty(0, dtype=int)
+    if len(starts) > 0:
+        # Maximum depth of each dive, every other segment of the boundaries
+        bounds = numpy.column_stack((starts, ends + 1)).ravel()
+        padded = numpy.append(d, numpy.nan)
+        max_depth = numpy.maximum.reduceat(padded, bounds)[::2]
+
+        # First sample of each dive at its maximum depth
+        n_started = numpy.zeros(len(d), dtype=int)
+        n_started[starts] = 1
+        dive_no = numpy.cumsum(n_started) - 1
+        in_dive = numpy.zeros(len(d) + 1, dtype=int)
+        in_dive[starts] += 1
+        in_dive[ends + 1] -= 1
+        in_dive = numpy.cumsum(in_dive[:-1]) > 0
+        hits = numpy.flatnonzero(in_dive & (d == max_depth[dive_no]))
+        _, first = numpy.unique(dive_no[hits], return_index=True)
+        max_idx = hits[first]
+
+    dives = pandas.DataFrame(
+        {
+            "start": rows[starts],
+            "end": rows[ends],
+            "max_idx": rows[max_idx],
+            "max_depth": max_depth,
+        }
+    )
+    # Rows of `end` are the last of the dives
+    dives["duration_s"] = (dives["end"] - dives["start"] + 1) * interval_s
+
+    keep = (dives["max_depth"] >= opts["min_depth"]) & (
+        dives["duration_s"] >= opts["min_duration_s"]
+    )
+    dives = dives[keep].reset_index(drop=True)
+    dives.index.name = "dive"
+    dives.attrs["options"] = opts
+
+    return dives
+
+
+def read_dives(meta, path_dir, data_df, overwrite=False, **kwargs):
+    """Load the dive table of an experiment if cached, else detect and cache
+
+    Args
+    ----
+    meta: dict
+        Dictionary of meta data from header lines of lleo data files
+    path_dir: str
+        Parent directory containing lleo data files
+    data_df: pandas.DataFrame
+        Dataframe with a `depth` column returned by `lleoio.read_data`,
+        without subsampling (`sample_f=1`)
+    overwrite: bool
+        Detect dives even if a cached table exists
+    **kwargs
+        Dive detection options, see `detect_dives`. A cached table detected
+        with other options, or from data with other rows (e.g. read with
+        `interval_s`), is replaced.
+
+    Returns
+    -------
+    dives: pandas.DataFrame
+        Dive table, see `detect_dives`
+    """
+    import os
+    import pandas
+
+    from . import lleoio
+    from . import sources
+    from . import utils
+
+    pickle_file = os.path.join(
+        sources.cache_dir(path_dir), "pydives_" + meta["experiment"] + ".p"
+    )
+
+    opts = dict(DIVE_DEFAULTS)
+    opts.update(kwargs)
+    t_index = lleoio.get_time_index(data_df)
+
+    def _read_cached():
+        if os.path.exists(pickle_file) and not overwrite:
+            dives = pandas.read_pickle(pickle_file)
+            # Rows of the table are those of the data it was detected from
+            if (dives.attrs.get("options") == opts) and (
+                dives.attrs.get("time_index") == t_index
+            ):
+                return dives
+        return None
+
+    dives = _read_cached()
+    if dives is not None:
+        return dives
+
+    # Wait for another process detecting the same dives rather than repeating
+    with utils.file_lock(pickle_file):
+        dives = _read_cached()
+        if dives is None:
+            dives = detect_dives(
+                data_df["depth"].to_numpy(dtype=float), t_index["interval_s"], **kwargs
+            )
+            dives.attrs["time_index"] = t_index
+            utils.write_pickle(dives, pickle_file)
+
+    return dives
+
+
+def get_dive(data_df, dives, dive):
+    """Get the rows of a dive from a `read_data` dataframe as a slice
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Dataframe returned by `lleoio.read_data`
+    dives: pandas.DataFrame
+        Dive table, see `detect_dives`
+    dive: int
+        Number of the dive in `dives`
+
+    Returns
+    -------
+    dive_df: pandas.DataFrame
+        Rows of `data_df` from the start to the end of the dive
+    """
+    start, end = dives.loc[dive, ["start", "end"]]
+
+    return data_df.iloc[int(start) : int(end) + 1]
@@ -1,3 +1,28 @@
+ACC_PARAMS = ("acceleration_x", "acceleration_y", "acceleration_z")
+
+
+def _map_partitions(data_df, func, *args, **kwargs):
+    """Apply a function adding columns to each partition of a Dask dataframe
+
+    Partitions are copied, so the function may add columns in place.
+    """
+    return data_df.map_partitions(lambda df: func(df.copy(), *args, **kwargs))
+
+
+def _get_counts(data_df, params):
+    """Get parameter columns as an array, keeping compact numpy dtypes
+
+    Masked (nullable) integer columns are returned as floats with NaN values.
+    """
+    import numpy
+
+    counts = data_df[list(params)]
+    if all(isinstance(dtype, numpy.dtype) for dtype in counts.dtypes):
+        return counts.to_numpy()
+
+    return counts.to_numpy(dtype=float, na_value=numpy.nan)
+
+
 def get_cal_data(data_df, cal_dict, param):
     """Get data along specified axis during calibration intervals
 
@@ -96,6 +121,145 @@ def update(data_df, cal_dict, param, bound, start, end):
     return cal_dict
 
 
+def _static_windows(acc, window, std_tol=None):
+    """Return rolling means of `acc` and mask of windows where all axes still"""
+    import numpy
+
+    from . import utils
+
+    mean, var = utils.rolling_mean_var(acc, window)
+    std = numpy.sqrt(numpy.nanmax(var, axis=1))
+
+    if std_tol is None:
+        std_tol = max(4 * numpy.nanmin(std), 1.0)
+
+    return mean, std <= std_tol
+
+
+def static_mask(data_df, params=ACC_PARAMS, window=100, std_tol=None):
+    """Get mask of samples in static periods, when all axes are still
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with lleo data
+    params: iterable of str
+        Accelerometer parameter names
+    window: int
+        Number of samples in the rolling windows
+    std_tol: float, optional
+        Maximum standard deviation [counts] of a static window, see
+        `detect_static`
+
+    Returns
+    -------
+    mask: ndarray of bool, shape (len(data_df),)
+        True for samples in at least one static window
+    """
+    import numpy
+
+    _, static = _static_windows(_get_counts(data_df, params), window, std_tol)
+
+    # Spread each static window over the samples it spans
+    n_static = numpy.zeros(len(data_df) + 1, dtype=int)
+    n_static[: len(static)] += static
+    n_static[window : window + len(static)] -= static
+
+    return numpy.cumsum(n_static[:-1]) > 0
+
+
+def detect_static(
+    data_df, cal_dict, params=ACC_PARAMS, window=100, std_tol=None, g_tol=0.1
+):
+    """Detect +/-g static periods of each accelerometer axis
+
+    Rolling means and variances of all axes are calculated in a single O(n)
+    pass. Windows where all axes are still are static, and for each axis the
+    longest run of static windows at the lowest (-g) and highest (+g) static
+    means are written to `cal_dict` as its `lower` and `upper` regions.
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with lleo data
+    cal_dict: dict
+        Calibration dictionary to update
+    params: iterable of str
+        Accelerometer parameter names to detect regions for
+    window: int
+        Number of samples in the rolling windows
+    std_tol: float, optional
+        Maximum standard deviation [counts] of a static window. Defaults to
+        four times the lowest rolling standard deviation, and at least one
+        count.
+    g_tol: float
+        Fraction of the range between -g and +g static means within which a
+        window is considered to be at -g or +g. A `ValueError` is raised if
+        the magnitude of gravity in a region, from the axes of `params`,
+        differs from 1 g by more than twice this fraction, e.g. if an axis
+        was never held at -g.
+
+    Returns
+    -------
+    cal_dict: dict
+        Calibration dictionary with `start` and `end` indices of the `lower`
+        and `upper` regions for each parameter, as with `update`
+
+    See also
+    --------
+    update: set calibration regions manually
+    get_cal_data: get data from the detected regions
+    """
+    import numpy
+
+    from . import utils
+
+    params = list(params)
+    mean, static = _static_windows(_get_counts(data_df, params), window, std_tol)
+
+    runs = dict()
+    lims = numpy.empty((len(params), 2))
+    for i, param in enumerate(params):
+        mean_static = mean[static, i]
+        if len(mean_static) == 0:
+            raise ValueError("No static periods found for {}".format(param))
+        lo = mean_static.min()
+        hi = mean_static.max()
+        tol = g_tol * (hi - lo)
+        lims[i] = lo, hi
+
+        bounds = {
+            "lower": static & (mean[:, i] <= lo + tol),
+            "upper": static & (mean[:, i] >= hi - tol),
+        }
+        for bound, mask in bounds.items():
+            starts, ends = utils.find_runs(mask)
+            j = numpy.argmax(ends - starts)
+            runs[(i, bound)] = starts[j], ends[j]
+
+    # With the lowest and highest means at -g and +g, gravity has a magnitude
+    # of 1 g in every region. An axis not held at both -g and +g gives regions
+    # where another axis is also at -g or +g.
+    offset = lims.mean(axis=1)
+    scale = (lims[:, 1] - lims[:, 0]) / 2
+    for (i, bound), (w0, w1) in runs.items():
+        g = (mean[w0 : w1 + 1].mean(axis=0) - offset) / scale
+        norm = numpy.sqrt((g * g).sum())
+        if abs(norm - 1) > 2 * g_tol:
+            raise ValueError(
+                "The {} region of {} is at {:.2f} g rather than 1 g, check that "
+                "each axis was held at -g and +g".format(bound, params[i], norm)
+            )
+
+    for (i, bound), (w0, w1) in runs.items():
+        # Convert window positions to the samples they span
+        start = int(data_df.index[w0])
+        end = int(data_df.index[w1 + window - 1])
+        cal_dict = update(data_df, cal_dict, params[i], bound, start, end)
+
+    return cal_dict
+
+
 def fit1d(lower, upper):
     """Fit acceleration data at lower and upper boundaries of gravity
 
@@ -139,37 +303,297 @@ def fit1d(lower, upper):
     return numpy.polyfit(x, y, deg=1)
 
 
-def calibrate_acc(data_df, cal_dict):
-    def apply_poly(data_df, cal_dict, param):
-        """Apply poly fit to data array"""
-        import numpy
+def _ellipsoid_design(counts, center, scale, cross_axis):
+    """Design matrix of the quadric `D @ v = 1` for normalized counts"""
+    import numpy
+
+    x, y, z = ((counts - center) / scale).T
+    cols = [x * x, y * y, z * z]
+    if cross_axis:
+        cols += [2 * x * y, 2 * x * z, 2 * y * z]
+    cols += [2 * x, 2 * y, 2 * z]
+
+    return numpy.column_stack(cols)
+
+
+def fit_ellipsoid(counts, cross_axis=True, chunksize=1000000, max_samples=None):
+    """Fit offsets, scales and cross-axis terms of a triaxial accelerometer
+
+    Static samples lie on an ellipsoid in count space, `(c - o)^T Q (c - o) =
+    1`. The quadric is fit with one linear least squares solve whose normal
+    equations are accumulated chunk by chunk, so memory does not grow with
+    the number of samples. The calibration is then `a = T @ (c - o)` [g],
+    where `T` is the symmetric square root of `Q`.
+
+    Args
+    ----
+    counts: ndarray, shape (n, 3), or iterable of ndarray
+        Accelerometer counts of static samples, or chunks of them. Samples
+        should cover many orientations.
+    cross_axis: bool
+        Fit cross-axis (misalignment) terms. This requires at least nine
+        distinct orientations; use `False` for a six position calibration.
+    chunksize: int
+        Number of samples to accumulate at once when `counts` is an array
+    max_samples: int, optional
+        Subsample each array or chunk with a fixed stride to about this many
+        samples
+
+    Returns
+    -------
+    ellipsoid: dict
+        `offset` [counts], a list of 3 floats, and `transform` [g/count], a
+        3x3 nested list
+
+    See also
+    --------
+    static_mask: select static samples for the fit
+    calibrate_acc_array: apply the fit with `method="ellipsoid"`
+    """
+    from collections import OrderedDict
+    import numpy
+
+    if isinstance(counts, numpy.ndarray):
+        chunks = (counts[i : i + chunksize] for i in range(0, len(counts), chunksize))
+    else:
+        chunks = iter(counts)
+
+    n_params = 9 if cross_axis else 6
+    DtD = numpy.zeros((n_params, n_params))
+    Dt1 = numpy.zeros(n_params)
+    center = None
+    for chunk in chunks:
+        chunk = numpy.asarray(chunk, dtype=float)
+        chunk = chunk[~numpy.isnan(chunk).any(axis=1)]
+        if max_samples is not None and len(chunk) > max_samples:
+            chunk = chunk[:: -(-len(chunk) // max_samples)]
+        if len(chunk) == 0:
+            continue
+        # Normalize by the first chunk so that the sums are well conditioned
+        if center is None:
+            center = chunk.mean(axis=0)
+            scale = numpy.abs(chunk - center).max() or 1.0
+
+        D = _ellipsoid_design(chunk, center, scale, cross_axis)
+        DtD += D.T @ D
+        Dt1 += D.sum(axis=0)
+
+    if center is None:
+        raise ValueError("No samples passed for the ellipsoid fit")
+    if numpy.linalg.matrix_rank(DtD) < n_params:
+        raise ValueError(
+            "Static samples do not cover enough orientations to fit {} "
+            "parameters".format(n_params)
+        )
+
+    v = numpy.linalg.solve(DtD, Dt1)
+    if cross_axis:
+        A = numpy.array([[v[0], v[3], v[4]], [v[3], v[1], v[5]], [v[4], v[5], v[2]]])
+    else:
+        A = numpy.diag(v[:3])
+    b = v[-3:]
+
+    # Complete the square to get the center and shape of the ellipsoid
+    offset = -numpy.linalg.solve(A, b)
+    Q = A / (1 + offset @ A @ offset)
+    eigval, eigvec = numpy.linalg.eigh(Q)
+    if (eigval <= 0).any():
+        raise ValueError("Static samples do not describe an ellipsoid")
+    T = eigvec @ numpy.diag(numpy.sqrt(eigval)) @ eigvec.T
+
+    # Undo normalization, `a = (T / scale) @ (c - (center + scale * offset))`
+    ellipsoid = OrderedDict()
+    ellipsoid["offset"] = [float(i) for i in center + scale * offset]
+    ellipsoid["transform"] = [[float(i) for i in row] for row in T / scale]
+
+    return ellipsoid
+
+
+def calibrate_ellipsoid(data_df, cal_dict, params=ACC_PARAMS, **kwargs):
+    """Fit a triaxial ellipsoid calibration from static samples of `data_df`
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with lleo data
+    cal_dict: dict
+        Calibration dictionary to update
+    params: iterable of str
+        Accelerometer parameter names, in x, y, z order
+    **kwargs
+        `window` and `std_tol` are passed to `static_mask`, others to
+        `fit_ellipsoid`
+
+    Returns
+    -------
+    cal_dict: dict
+        Calibration dictionary with the fit in `cal_dict["parameters"]
+        ["ellipsoid"]`, next to the per-axis `poly` fits
+    """
+    mask_kwargs = {k: kwargs.pop(k) for k in ("window", "std_tol") if k in kwargs}
+    mask = static_mask(data_df, params, **mask_kwargs)
+    counts = _get_counts(data_df, params)[mask]
+
+    cal_dict["parameters"]["ellipsoid"] = fit_ellipsoid(counts, **kwargs)
+
+    return cal_dict
+
+
+def get_acc_coefs(cal_dict, params=ACC_PARAMS):
+    """Stack accelerometer polynomial coefficients into a single array
+
+    Args
+    ----
+    cal_dict: dict
+        Calibration dictionary with a `poly` entry for each of `params`
+    params: iterable of str
+        Accelerometer parameter names, in column order
+
+    Returns
+    -------
+    coefs: ndarray, shape (deg + 1, n_params)
+        Polynomial coefficients, highest power first, one column per axis
+    """
+    import numpy
+
+    polys = [cal_dict["parameters"][param]["poly"] for param in params]
 
-        poly = cal_dict["parameters"][param]["poly"]
-        a = numpy.polyval(poly, data_df[param])
+    # Pad lower degree polynomials with leading zeros so that all axes can be
+    # evaluated together
+    deg = max(len(poly) for poly in polys) - 1
+    coefs = numpy.zeros((deg + 1, len(polys)), dtype=float)
+    for i, poly in enumerate(polys):
+        coefs[deg + 1 - len(poly) :, i] = poly
 
-        return a.astype(float)
+    return coefs
 
-    # Apply calibration and add as a new column to the dataframe
-    for ax in ["x", "y", "z"]:
-        col = "A{}_g".format(ax)
-        col_cal = "acceleration_{}".format(ax)
-        data_df[col] = apply_poly(data_df, cal_dict, col_cal)
+
+def calibrate_acc_array(counts, cal_dict, out=None, dtype=None, method="poly"):
+    """Apply accelerometer calibration to all axes in one vectorized pass
+
+    Args
+    ----
+    counts: ndarray, shape (n, 3)
+        Accelerometer counts, one column per axis in the order of
+        `ACC_PARAMS`. May be a single chunk of a longer recording.
+    cal_dict: dict
+        Calibration dictionary with a `poly` entry for each axis
+    out: ndarray, shape (n, 3), optional
+        Preallocated floating point output array (e.g. `float32`). May be
+        `counts` itself, if floating point, to calibrate in place.
+    dtype: numpy.dtype, optional
+        Floating point output type when `out` is not passed. Defaults to
+        `float64`.
+    method: str
+        `poly` to apply the per-axis fits of `fit1d`, or `ellipsoid` to apply
+        the triaxial fit of `fit_ellipsoid`
+
+    Returns
+    -------
+    out: ndarray, shape (n, 3)
+        Calibrated acceleration [g]
+
+    Example
+    -------
+    >>> import numpy
+    >>> cal = {"parameters": {p: {"poly": [0.5, -1.0]} for p in ACC_PARAMS}}
+    >>> calibrate_acc_array(numpy.array([[2, 4, 6]]), cal, dtype="float32")
+    array([[0., 1., 2.]], dtype=float32)
+    """
+    import numpy
+
+    if out is None:
+        out = numpy.empty(counts.shape, dtype=dtype or float)
+    elif out.shape != counts.shape:
+        raise ValueError(
+            "Shape of `out` {} does not match shape of `counts` "
+            "{}".format(out.shape, counts.shape)
+        )
+    # Calibrated values [g] would be truncated by the unsafe casts below
+    if out.dtype.kind != "f":
+        raise ValueError(
+            "Output dtype must be floating point, not {}".format(out.dtype)
+        )
+
+    if method == "ellipsoid":
+        ellipsoid = cal_dict["parameters"]["ellipsoid"]
+        offset = numpy.asarray(ellipsoid["offset"])
+        T = numpy.asarray(ellipsoid["transform"])
+        out[:] = (counts - offset) @ T.T
+        return out
+    elif method != "poly":
+        raise ValueError("Unknown calibration method {}".format(method))
+
+    coefs = get_acc_coefs(cal_dict)
+
+    # Linear fits (the output of `fit1d`) need no temporary array, even when
+    # writing in place
+    if len(coefs) == 2:
+        numpy.multiply(counts, coefs[0], out=out, casting="unsafe")
+        out += coefs[1].astype(out.dtype)
+        return out
+
+    # Horner's method overwrites `out` on each step, so keep a copy of the
+    # counts when calibrating in place
+    if numpy.shares_memory(out, counts):
+        counts = counts.copy()
+    out[:] = coefs[0]
+    for coef in coefs[1:]:
+        out *= counts
+        out += coef.astype(out.dtype)
+
+    return out
+
+
+def calibrate_acc(data_df, cal_dict, dtype=None, method="poly"):
+    """Add calibrated acceleration columns `Ax_g`, `Ay_g`, `Az_g` [g]
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with lleo data
+    cal_dict: dict
+        Calibration dictionary with a `poly` entry for each axis
+    dtype: numpy.dtype, optional
+        Type of the calibrated columns. Defaults to `float64`.
+    method: str
+        `poly` or `ellipsoid`, see `calibrate_acc_array`
+
+    Returns
+    -------
+    data_df: pandas.DataFrame
+        Input dataframe with calibrated acceleration columns added
+
+    See also
+    --------
+    calibrate_acc_array: calibrate arrays or chunks of a streaming reader
+    """
+    # Dask dataframes, see `lleoio.read_data_dask`, are calibrated lazily
+    if hasattr(data_df, "map_partitions"):
+        return _map_partitions(
+            data_df, calibrate_acc, cal_dict, dtype=dtype, method=method
+        )
+
+    counts = _get_counts(data_df, ACC_PARAMS)
+    acc = calibrate_acc_array(counts, cal_dict, dtype=dtype, method=method)
+
+    # Add all axes as a single block rather than one column at a time
+    data_df[["A{}_g".format(ax) for ax in "xyz"]] = acc
 
     return data_df
 
 
 def create_speed_csv(cal_fname, data):
-    import numpy
     import pandas
 
     from pylleo import utils
 
     # Get a mask of values which contain a sample, assuming the propeller was
     # not sampled at as high of a frequency as the accelerometer
-    notnan = ~numpy.isnan(data["propeller"])
+    notnan = data["propeller"].notna()
 
     # Read speed, start, and end times from csv
-    cal = pandas.read_csv(cal_fname)
+    cal = pandas.read_csv(cal_fname, parse_dates=["start", "end"])
 
     # For each calibration in `speed_calibrations.csv`
     for i in range(len(cal)):
@@ -182,66 +606,146 @@ def create_speed_csv(cal_fname, data):
 
         cal.loc[i, "count_average"] = count_avg
 
-    cal.to_csv(cal_fname)
+    with utils.file_lock(cal_fname), utils.atomic_path(cal_fname) as tmp:
+        cal.to_csv(tmp)
 
     return cal
 
 
+def propeller_slopes(calibs, by="date"):
+    """Calculate through-origin speed/count slopes for each calibration group
+
+    Each slope is the closed-form least squares solution for a line forced
+    through zero (i.e. zero counts = zero speed), `sum(x * y) / sum(x * x)`,
+    calculated for all groups in a single aggregation.
+
+    Args
+    ----
+    calibs: pandas.DataFrame
+        Propeller calibrations with `est_speed` and `count_average` columns,
+        and the columns named in `by`
+    by: str or list of str
+        Column(s) identifying a calibration, e.g. `["experiment", "date"]`
+        to fit calibrations of many deployments at once
+
+    Returns
+    -------
+    slopes: pandas.Series
+        Speed per propeller count, indexed by `by`
+
+    Example
+    -------
+    >>> import pandas
+    >>> calibs = pandas.DataFrame({"date": ["a", "a", "b"],
+    ...                            "est_speed": [1.0, 2.0, 3.0],
+    ...                            "count_average": [10, 20, 10]})
+    >>> propeller_slopes(calibs).tolist()
+    [0.1, 0.3]
+    """
+    x = calibs["count_average"].astype(float)
+    y = calibs["est_speed"].astype(float)
+
+    keys = [by] if isinstance(by, str) else list(by)
+    sums = calibs[keys].assign(xy=x * y, xx=x * x).groupby(keys).sum()
+
+    return sums["xy"] / sums["xx"]
+
+
+def propeller_coef(calibs, deployment=None):
+    """Calculate the mean speed/count slope of all calibration dates
+
+    Args
+    ----
+    calibs: pandas.DataFrame
+        Propeller calibrations with `date`, `est_speed` and `count_average`
+        columns
+    deployment: str, optional
+        Column identifying the deployment of each calibration. If passed, a
+        mean slope is returned for every deployment.
+
+    Returns
+    -------
+    m_avg: float or pandas.Series
+        Mean speed per propeller count, per deployment if `deployment` passed
+    """
+    if deployment is None:
+        return float(propeller_slopes(calibs, by="date").mean())
+
+    slopes = propeller_slopes(calibs, by=[deployment, "date"])
+
+    return slopes.groupby(level=deployment).mean()
+
+
+def read_propeller_cal(cal_fname):
+    """Read propeller calibrations from a csv file
+
+    Notes
+    -----
+    `cal_fname` should contain three columns:
+    date,est_speed,count_average
+    2014-04-18,2.012,30
+    """
+    import pandas
+
+    calibs = pandas.read_csv(cal_fname)
+    calibs["date"] = pandas.to_datetime(calibs["date"])
+
+    return calibs
+
+
+def plot_propeller_cal(calibs, n_samples=1000):
+    """Plot the fit of each calibration date and their average
+
+    Requires `matplotlib`, which is only imported when plotting.
+    """
+    import matplotlib.pyplot as plt
+    import numpy
+
+    slopes = propeller_slopes(calibs, by="date")
+    x = numpy.arange(n_samples)
+
+    for i, m in enumerate(slopes):
+        plt.plot(x, m * x, label="cal{}".format(i))
+    plt.plot(x, slopes.mean() * x, label="avg")
+    plt.legend()
+    plt.show()
+
+    return None
+
+
 def calibrate_propeller(data_df, cal_fname, plot=False):
-    def speed_calibration_average(cal_fname, plot):
-        """Cacluate the coefficients for the mean fit of calibrations
-
-        Notes
-        -----
-        `cal_fname` should contain three columns:
-        date,est_speed,count_average
-        2014-04-18,2.012,30
-        """
-        import matplotlib.pyplot as plt
-        import numpy
-        import pandas
-
-        # Read calibration data
-        calibs = pandas.read_csv(cal_fname)
-        calibs["date"] = pandas.to_datetime(calibs["date"])
-
-        # Get unique dates to process fits for
-        udates = numpy.unique(calibs["date"])
-
-        # Create x data for samples and output array for y
-        n_samples = 1000
-        x = numpy.arange(n_samples)
-        fits = numpy.zeros((len(udates), n_samples), dtype=float)
-
-        # Calculate fit coefficients then store `n_samples number of samples
-        # Force intercept through zero (i.e. zero counts = zero speed)
-        # http://stackoverflow.com/a/9994484/943773
-        for i in range(len(udates)):
-            cal = calibs[calibs["date"] == udates[i]]
-            xi = cal["count_average"].values[:, numpy.newaxis]
-            yi = cal["est_speed"].values
-            m, _, _, _ = numpy.linalg.lstsq(xi, yi)
-            fits[i, :] = m * x
-            # Add fit to plot if switch on
-            if plot:
-                plt.plot(x, fits[i, :], label="cal{}".format(i))
-
-        # Calculate average of calibration samples
-        y_avg = numpy.mean(fits, axis=0)
-
-        # Add average fit to plot and show if switch on
-        if plot:
-            plt.plot(x, y_avg, label="avg")
-            plt.legend()
-            plt.show()
-
-        # Calculate fit coefficients for average samples
-        x_avg = x[:, numpy.newaxis]
-        m_avg, _, _, _ = numpy.linalg.lstsq(x_avg, y_avg)
-
-        return m_avg
-
-    m_avg = speed_calibration_average(cal_fname, plot=plot)
-    data_df["speed"] = m_avg * data_df["propeller"]
+    """Add a `speed` column calibrated from propeller counts
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Pandas dataframe with lleo data
+    cal_fname: str
+        Path to propeller calibration csv, see `read_propeller_cal`
+    plot: bool
+        Plot the calibration fits (requires `matplotlib`)
+
+    Returns
+    -------
+    data_df: pandas.DataFrame
+        Input dataframe with `speed` column added
+    """
+    calibs = read_propeller_cal(cal_fname)
+
+    # Add average fit to plot and show if switch on
+    if plot:
+        plot_propeller_cal(calibs)
+
+    m_avg = propeller_coef(calibs)
+
+    def _add_speed(data_df):
+        data_df["speed"] = m_avg * _get_counts(data_df, ["propeller"])[:, 0]
+        return data_df
+
+    # Dask dataframes, see `lleoio.read_data_dask`, are calibrated lazily
+    if hasattr(data_df, "map_partitions"):
+        return _map_partitions(data_df, _add_speed)
+
+    data_df = _add_speed(data_df)
 
     return data_df
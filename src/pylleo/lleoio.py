@@ -1,4 +1,4 @@
-def read_meta(path_dir, tag_model, tag_id):
+def read_meta(path_dir, tag_model, tag_id, overwrite=False):
     """Read meta data from Little Leonardo data header rows
 
     Args
@@ -9,6 +9,8 @@ def read_meta(path_dir, tag_model, tag_id):
         Little Leonardo tag model name
     tag_id: str, int
         Little Leonardo tag ID number
+    overwrite: bool
+        Create `meta.yml` again from the data files, e.g. after they changed
 
     Returns
     -------
@@ -16,11 +18,16 @@ def read_meta(path_dir, tag_model, tag_id):
         dictionary with meta data from header lines of lleo data files
     """
     from collections import OrderedDict
+    import logging
     import os
     import yamlord
 
+    from . import metrics
+    from . import sources
     from . import utils
 
+    logger = logging.getLogger(__name__)
+
     def _parse_meta_line(line):
         """Return key, value pair parsed from data header line"""
 
@@ -32,8 +39,7 @@ def read_meta(path_dir, tag_model, tag_id):
     def _read_meta_all(f, meta, n_header):
         """Read all meta data from header rows of data file"""
 
-        # Skip 'File name' line
-        f.seek(0)
+        # Skip 'File name' line of a newly opened file
         _ = f.readline()
 
         # Create child dictionary for channel / file
@@ -53,15 +59,16 @@ def read_meta(path_dir, tag_model, tag_id):
     def _create_meta(path_dir, tag_model, tag_id):
         """Create meta data dictionary"""
         import datetime
+        from . import tags
         from . import utils
 
-        param_strs = utils.get_tag_params(tag_model)
+        channels = tags.get_tag_model(tag_model)
 
         # Create dictionary of meta data
         meta = OrderedDict()
 
         # Create fields for the parameters in data directory name
-        exp_name = os.path.split(path_dir)[1]
+        exp_name = sources.experiment_name(path_dir)
         params_tag = utils.parse_experiment_params(exp_name)
         for key, value in params_tag.items():
             meta[key] = value
@@ -70,36 +77,61 @@ def read_meta(path_dir, tag_model, tag_id):
         meta["date_modified"] = datetime.datetime.now().strftime(fmt)
 
         meta["parameters"] = OrderedDict()
+        # Header rows of each file, so data are read without finding them again
+        meta["n_header"] = OrderedDict()
+
+        for ch in channels:
+            logger.info("Create meta entry for %s", ch["name"])
+            fields = dict(experiment=exp_name, channel=ch["name"])
 
-        for param_str in param_strs:
-            print("Create meta entry for {}".format(param_str))
+            path_file = utils.find_file(path_dir, ch["pattern"], ch["ext"])
+            with metrics.stage("encoding", **fields) as record:
+                enc = utils.predict_encoding(path_file, n_lines=20)
+                record["encoding"] = enc
 
-            path_file = utils.find_file(path_dir, param_str, ".TXT")
             # Get number of header rows
-            enc = utils.predict_encoding(path_file, n_lines=20)
-            with open(path_file, "r", encoding=enc) as f:
-                n_header = utils.get_n_header(f)
-                f.seek(0)
-                meta = _read_meta_all(f, meta, n_header=n_header)
+            with metrics.stage("header", **fields) as record:
+                # Opened again rather than seeking, as streams may not seek
+                with sources.open_text(path_file, encoding=enc) as f:
+                    n_header = ch["n_header"] or utils.get_n_header(
+                        f, ch["header_char"]
+                    )
+                with sources.open_text(path_file, encoding=enc) as f:
+                    meta = _read_meta_all(f, meta, n_header=n_header)
+                meta["n_header"][utils.posix_string(ch["name"])] = n_header
+                record["rows"] = n_header
 
         return meta
 
     # Load meta data from YAML file if it already exists
-    meta_yaml_path = os.path.join(path_dir, "meta.yml")
+    meta_yaml_path = os.path.join(sources.cache_dir(path_dir), "meta.yml")
 
-    # Load file if exists else create
-    if os.path.isfile(meta_yaml_path):
-        meta = yamlord.read_yaml(meta_yaml_path)
+    # Load file if exists else create, waiting for other processes creating it
+    if overwrite or not os.path.isfile(meta_yaml_path):
+        with utils.file_lock(meta_yaml_path):
+            if overwrite or not os.path.isfile(meta_yaml_path):
+                meta = _create_meta(path_dir, tag_model, tag_id)
+                utils.write_yaml(meta, meta_yaml_path)
+                return meta
 
-    # Else create meta dictionary and save to YAML
-    else:
-        meta = _create_meta(path_dir, tag_model, tag_id)
-        yamlord.write_yaml(meta, meta_yaml_path)
+    meta = yamlord.read_yaml(meta_yaml_path)
 
     return meta
 
 
-def read_data(meta, path_dir, sample_f=1, decimate=False, overwrite=False):
+def read_data(
+    meta,
+    path_dir,
+    sample_f=1,
+    decimate=False,
+    overwrite=False,
+    datetimes=True,
+    compact=True,
+    interval_s=None,
+    how=None,
+    backend="pandas",
+    max_memory=None,
+):
     """Read accelerometry data from leonardo txt files
 
     Args
@@ -110,6 +142,40 @@ def read_data(meta, path_dir, sample_f=1, decimate=False, overwrite=False):
         Parent directory containing lleo data files
     sample_f: int
         Return every `sample_f` data points
+    datetimes: bool
+        Add a materialized `datetimes` column. Times of all rows are always
+        available from the implicit time index in `data_df.attrs`, see
+        `get_time_index`.
+    compact: bool
+        Return data in the compact dtypes of the tag model (see
+        `utils.get_tag_dtypes`), e.g. `int16` accelerometer counts and
+        `float32` depths. Integer channels with missing rows use pandas'
+        masked integer arrays. Otherwise all parameters are `float64`.
+        For a W190PD3GT tag this takes 17 instead of 48 bytes per row, or
+        25 instead of 56 with the `datetimes` column. Channels sampled less
+        often than the first are still stored on its rows, so most of their
+        memory holds missing values.
+    interval_s: float, optional
+        Resample all parameters to a shared grid with this interval [s],
+        starting with the first parameter, while streaming them from their
+        files (see `iter_resample`). Otherwise parameters sampled less often
+        than the first are NaN between their samples.
+    how: dict, optional
+        Resampling method of each parameter (e.g. `{"depth": "linear"}`).
+        Defaults to the `resample` method of the tag model's channel when
+        downsampling, and `linear` interpolation when upsampling.
+    backend: str
+        `pandas` to read all data into memory, or `dask` for a lazily read
+        dataframe partitioned by time, see `read_data_dask`
+    max_memory: int or str, optional
+        Memory available for reading, in bytes or e.g. `4GB`. The memory
+        needed is estimated from the file sizes and headers (see
+        `estimate_memory`), and if the data as requested does not fit, it is
+        read in compact dtypes, without `datetimes`, lazily with Dask or
+        resampled to a longer `interval_s`, whichever changes it least. The
+        strategy chosen and why is logged. Archives and compressed files
+        cannot be read lazily, and a ValueError is raised if the budget is
+        too small for any strategy.
 
     Returns
     -------
@@ -121,115 +187,1334 @@ def read_data(meta, path_dir, sample_f=1, decimate=False, overwrite=False):
         Dataframe containing speed data from propeller
     temp: pandas.DataFrame
         Dataframe containing temperature data
+
+    The quality checks of the data files, made as they are parsed and cached
+    with the data, are in `data_df.attrs["qc"]` (see `qc.summarize`).
     """
+    import contextlib
+    import logging
+    import numpy
     import os
     import pandas
 
+    from pylleo import metrics
+    from pylleo import qc
+    from pylleo import sources
+    from pylleo import tags
     from pylleo import utils
 
-    def _generate_datetimes(date, time, interval_s, n_timestamps):
-        """Generate list of datetimes from date/time with given interval"""
-        import pandas
-        from datetime import timedelta
-
-        # TODO problematic if both m/d d/m options
-        fmts = [
-            "%Y/%m/%d %H%M%S",
-            "%d/%m/%Y %H%M%S",
-            "%m/%d/%Y %I%M%S %p",
-            "%d/%m/%Y %I%M%S %p",
-        ]
+    logger = logging.getLogger(__name__)
 
-        for fmt in fmts:
-            try:
-                start = pandas.to_datetime("{} {}".format(date, time), format=fmt)
-            except Exception:
-                print("Date format {:18} incorrect, " "trying next...".format(fmt))
-            else:
-                print("Date format {:18} correct.".format(fmt))
-                break
-
-        # Create datetime array
-        datetimes = list()
-        for i in range(n_timestamps):
-            secs = interval_s * i
-            datetimes.append(start + timedelta(seconds=secs))
+    if (max_memory is not None) and (backend == "pandas"):
+        _, options = _budget_strategy(
+            meta,
+            path_dir,
+            utils.parse_size(max_memory),
+            compact,
+            datetimes,
+            interval_s,
+            sample_f,
+        )
+        compact = options["compact"]
+        datetimes = options["datetimes"]
+        interval_s = options["interval_s"]
+        backend = options["backend"]
 
-        return datetimes
+    if backend == "dask":
+        if sample_f != 1:
+            raise ValueError("`sample_f` is not supported by the dask backend")
+        return read_data_dask(
+            meta,
+            path_dir,
+            datetimes=datetimes,
+            compact=compact,
+            interval_s=interval_s,
+            how=how,
+        )
+    elif backend != "pandas":
+        raise ValueError("Backend `{}` not one of pandas, dask".format(backend))
 
-    def _read_data_file(meta, path_dir, param_str):
+    def _read_data_file(meta, path_dir, ch, grid=None):
         """Read single Little Leonardo txt data file"""
         import numpy
-        import pandas
 
         from . import utils
 
-        # Get path of data file and associated pickle file
-        path_file = utils.find_file(path_dir, param_str, ".TXT")
-        col_name = utils.posix_string(param_str)
+        path_file, n_header, t_index = _channel_index(meta, path_dir, ch, count=False)
+        col_name = utils.posix_string(ch["name"])
+        fields = dict(experiment=meta["experiment"], channel=col_name)
 
-        # Get number of header rows in file
-        enc = utils.predict_encoding(path_file, n_lines=20)
-        with open(path_file, "r", encoding=enc) as f:
-            n_header = utils.get_n_header(f)
+        logger.info("Reading: %s", col_name)
 
-        print("\nReading: {}".format(col_name))
+        # Files that can be reread are counted first to preallocate their
+        # column, archive members and compressed files are decompressed once,
+        # counting rows as they are parsed
+        with metrics.stage("time_axis", **fields) as record:
+            if sources.is_plain_file(path_file):
+                t_index["n"] = _count_rows(path_file, n_header)
+                parsed = iter_channel(path_file, n_header)
+            else:
+                parsed = list(iter_channel(path_file, n_header))
+                t_index["n"] = sum(len(chunk) for chunk in parsed)
+            record["rows"] = t_index["n"]
+            record["bytes"] = sources.file_size(path_file)
 
-        data = numpy.genfromtxt(path_file, skip_header=n_header)
+        # Check values as they are parsed
+        report = dict()
+        stuck_rows = None
+        if ch["stuck_s"] is not None:
+            stuck_rows = max(int(round(ch["stuck_s"] / t_index["interval_s"])), 2)
+        chunks = qc.iter_checked(
+            parsed,
+            report,
+            valid_range=ch["valid_range"],
+            stuck_rows=stuck_rows,
+            saturation_range=qc.saturation_range(ch["saturates"], ch["dtype"]),
+        )
+        t_file = t_index
 
-        interval_s = float(meta["parameters"][col_name]["Interval(Sec)"])
-        date = meta["parameters"][col_name]["Start date"]
-        time = meta["parameters"][col_name]["Start time"]
+        # Stream values from the file onto the shared grid
+        t_index_out, method = _column_resampling(ch, t_index, grid, how)
+        with metrics.stage("tokenize", **fields) as record:
+            if grid is not None:
+                data = numpy.concatenate(
+                    list(iter_resample(chunks, t_index, t_index_out, method))
+                )
+                t_index = grid
+            else:
+                data = read_channel(
+                    path_file, n_header, ch["dtype"], chunks=chunks, n_rows=t_index["n"]
+                )
+            record["rows"] = t_index["n"]
+            record["bytes"] = sources.file_size(path_file)
 
-        # TODO review
         # Generate summed data if propeller sampling rate not 1
-        if (col_name == "propeller") and (interval_s < 1):
-            print("Too high sampling interval, taking sums")
-            # Sampling rate
-            fs = int(1 / interval_s)
+        if (grid is None) and (method is not None):
+            logger.info("Too high sampling interval, taking sums")
+            with metrics.stage("resample", **fields) as record:
+                data, t_index = resample(data, t_index, t_index_out, how=method)
+                record["rows"] = t_index["n"]
 
-            print("data before", data.max())
-            # Drop elements to make divisible by fs for summing
-            data = data[: -int(len(data) % fs)]
+        return _compact_column(data, ch["dtype"]), t_index, report, t_file
 
-            # Reshape to 2D with columns `fs` in length to be summed
-            data = data.reshape(fs, int(len(data) / fs))
-            data = numpy.sum(data, axis=0)
-            interval_s = 1
+    # Get channel schemas for tag model
+    channels = tags.get_tag_model(meta["tag_model"])
 
-            print("data after", data.max())
+    # Load pickle file exists and code unchanged
+    pickle_name = "pydata_" + meta["experiment"]
+    if interval_s is not None:
+        pickle_name += "_{}s".format(interval_s)
+        # Resampling methods only apply on the grid of `interval_s`
+        for col_name, method in sorted((how or dict()).items()):
+            pickle_name += "_{}-{}".format(col_name, method)
+    pickle_file = os.path.join(sources.cache_dir(path_dir), pickle_name + ".p")
 
-        datetimes = _generate_datetimes(date, time, interval_s, len(data))
-        data = numpy.vstack((datetimes, data)).T
-        df = pandas.DataFrame(data, columns=["datetimes", col_name])
+    fields = dict(experiment=meta["experiment"])
 
-        return df
+    # Only one process reads the data files, others wait to load its pickle
+    lock = contextlib.nullcontext()
+    if overwrite or not os.path.exists(pickle_file):
+        lock = utils.file_lock(pickle_file)
 
-    # Get list of string parameter names for tag model
-    param_names = utils.get_tag_params(meta["tag_model"])
+    with lock:
+        # Load or create pandas DataFrame with parameters associated with tag model
+        if (os.path.exists(pickle_file)) and (overwrite is not True):
+            with metrics.stage("cache_read", **fields) as record:
+                data_df = pandas.read_pickle(pickle_file)
+                record["rows"] = len(data_df)
+                record["bytes"] = os.path.getsize(pickle_file)
+            if "time_index" not in data_df.attrs:
+                data_df.attrs["time_index"] = _infer_time_index(data_df["datetimes"])
+            data_df = data_df.drop(columns="datetimes", errors="ignore")
+        else:
+            # Rows are those of the first parameter, others are aligned to them
+            columns = dict()
+            t_index_base = None
+            grid = None
+            if interval_s is not None:
+                _, _, t_index = _channel_index(meta, path_dir, channels[0])
+                grid = _resample_index(t_index, interval_s)
 
-    # Load pickle file exists and code unchanged
-    pickle_file = os.path.join(path_dir, "pydata_" + meta["experiment"] + ".p")
+            reports, t_files = dict(), dict()
+            for ch in channels:
+                col_name = utils.posix_string(ch["name"])
+                data, t_index, report, t_file = _read_data_file(
+                    meta, path_dir, ch, grid=grid
+                )
+                columns[col_name] = (data, t_index)
+                reports[col_name], t_files[col_name] = report, t_file
 
-    # Load or create pandas DataFrame with parameters associated with tag model
-    if (os.path.exists(pickle_file)) and (overwrite is not True):
-        data_df = pandas.read_pickle(pickle_file)
-    else:
-        first_col = True
-        for name in param_names:
-            next_df = _read_data_file(meta, path_dir, name)
-            if first_col is False:
-                data_df = pandas.merge(data_df, next_df, on="datetimes", how="left")
-            else:
-                data_df = next_df
-                first_col = False
-        print("")
+            with metrics.stage("merge", **fields) as record:
+                for col_name, (data, t_index) in columns.items():
+                    if t_index_base is None:
+                        t_index_base = t_index
+                    else:
+                        data = _align(t_index, data, t_index_base)
+                    columns[col_name] = data
 
-        # Covert columns to `datetime64` or `float64` types
-        data_df = data_df.apply(lambda x: pandas.to_numeric(x, errors="ignore"))
+                data_df = pandas.DataFrame(columns)
+                data_df.attrs["time_index"] = t_index_base
+                record["rows"] = len(data_df)
 
-        # Save file to pickle
-        data_df.to_pickle(pickle_file)
+            # Quality checks are cached with the data
+            data_df.attrs["qc"] = qc.summarize(reports, t_files, meta)
+            for flag in data_df.attrs["qc"]["flags"]:
+                logger.warning("Quality check of %s: %s", meta["experiment"], flag)
+
+            # Save file to pickle
+            with metrics.stage("cache_write", **fields) as record:
+                utils.write_pickle(data_df, pickle_file)
+                record["rows"] = len(data_df)
+                record["bytes"] = os.path.getsize(pickle_file)
 
     # Return DataFrame with ever `sample_f` values
-    return data_df.iloc[::sample_f, :]
+    t_index = get_time_index(data_df)
+    data_df = data_df.iloc[::sample_f, :]
+    data_df.attrs["time_index"] = time_index(
+        t_index["start"], t_index["interval_s"] * sample_f, len(data_df)
+    )
+
+    if not compact:
+        data_df = data_df.astype(float)
+
+    if datetimes:
+        rows = numpy.arange(0, t_index["n"], sample_f)
+        data_df.insert(0, "datetimes", index_to_time(t_index, rows))
+
+    return data_df
+
+
+def _estimate_rows(meta, path_dir, ch, sample_bytes=2**16):
+    """Estimate the rows of a data file from its size and first lines"""
+    from . import sources
+    from . import utils
+
+    path_file = utils.find_file(path_dir, ch["pattern"], ch["ext"])
+    with sources.open_text(path_file, encoding="latin-1") as f:
+        n_header = ch["n_header"] or utils.get_n_header(f, ch["header_char"])
+    with sources.open_file(path_file) as f:
+        header = b"".join(f.readline() for _ in range(n_header))
+        sample = f.read(sample_bytes)
+
+    # Sizes of compressed files are not those of their data, so count rows
+    if (sources.strip_compression(path_file) != path_file) or (len(sample) == 0):
+        return _count_rows(path_file, n_header)
+
+    size = sources.file_size(path_file) - len(header)
+
+    return int(round(size * max(sample.count(b"\n"), 1) / len(sample)))
+
+
+def estimate_memory(
+    meta, path_dir, compact=True, datetimes=True, interval_s=None, n_rows=None
+):
+    """Estimate the peak memory of `read_data` from file sizes and headers
+
+    The rows of the first parameter, which are the rows of the dataframe, are
+    estimated from the size of its file and the length of its first lines,
+    and the dtype of each column from the tag model and the sampling
+    intervals in the file headers, without reading the data.
+
+    Args
+    ----
+    meta: dict
+        Dictionary of meta data from header lines of lleo data files
+    path_dir: str
+        Parent directory containing lleo data files
+    compact, datetimes, interval_s
+        See `read_data`
+    n_rows: int, optional
+        Rows of the file of the first parameter, if already estimated, as
+        estimating them decompresses compressed files and archive members
+
+    Returns
+    -------
+    n_bytes: int
+        Estimated peak memory of reading the dataframe [bytes]
+    """
+    import numpy
+
+    from . import tags
+    from . import utils
+
+    channels = tags.get_tag_model(meta["tag_model"])
+    intervals = {
+        ch["name"]: float(
+            meta["parameters"][utils.posix_string(ch["name"])]["Interval(Sec)"]
+        )
+        for ch in channels
+    }
+    interval_base = intervals[channels[0]["name"]]
+    n_file = n_rows
+    if n_file is None:
+        n_file = _estimate_rows(meta, path_dir, channels[0])
+    n = n_file
+    if interval_s is not None:
+        n = int(n_file * interval_base / interval_s) + 1
+        interval_base = interval_s
+
+    # Bytes of each row as read, with masks of integers with missing rows
+    row_bytes = 0
+    for ch in channels:
+        dtype = numpy.dtype(ch["dtype"])
+        if interval_s is not None and ch["resample"] != "sum":
+            dtype = numpy.dtype("float64")
+        row_bytes += dtype.itemsize
+        if (dtype.kind in "iu") and (intervals[ch["name"]] != interval_base):
+            row_bytes += 1
+
+    # Columns are copied into the dataframe, and then cast and given times
+    # computed from row positions
+    out_bytes = (row_bytes if compact else 8 * len(channels)) + 16 * datetimes
+    if compact:
+        n_bytes = n * (row_bytes + out_bytes)
+    else:
+        n_bytes = n * (row_bytes + max(row_bytes, out_bytes))
+
+    # Parsing a chunk of `iter_channel` takes about 32 bytes per row
+    return n_bytes + 32 * min(n_file, 1000000)
+
+
+def _budget_strategy(
+    meta, path_dir, max_memory, compact, datetimes, interval_s, sample_f=1
+):
+    """Choose how to read data within a memory budget, logging the reason
+
+    Strategies are tried from the most to the least faithful to the data
+    requested: loading it as requested (`full`), in compact dtypes
+    (`compact`), without the materialized `datetimes` column (`projection`),
+    lazily in partitions with Dask (`streaming`, if installed, `sample_f`
+    is 1 and the data files are plain files that partitions can seek in), or
+    resampled to the shortest interval that fits (`decimation`).
+
+    Raises a ValueError if the data does not fit even resampled to a single
+    row, stating the smallest budget possible.
+
+    Returns
+    -------
+    strategy: str
+        Name of the chosen strategy
+    options: dict
+        Options of `read_data` implementing it
+    """
+    import importlib.util
+    import logging
+    import math
+
+    from . import sources
+    from . import tags
+    from . import utils
+
+    logger = logging.getLogger(__name__)
+
+    def _gb(n_bytes):
+        if n_bytes < 1e9:
+            return "{:.1f} MB".format(n_bytes / 1e6)
+        return "{:.2f} GB".format(n_bytes / 1e9)
+
+    candidates = [
+        ("full", dict(compact=compact, datetimes=datetimes)),
+        ("compact", dict(compact=True, datetimes=datetimes)),
+        ("projection", dict(compact=True, datetimes=False)),
+    ]
+    # Rows are estimated once, as it may decompress the file
+    channels = tags.get_tag_model(meta["tag_model"])
+    n_file = _estimate_rows(meta, path_dir, channels[0])
+
+    needs = dict()
+    for name, options in candidates:
+        needs[name] = estimate_memory(
+            meta, path_dir, interval_s=interval_s, n_rows=n_file, **options
+        )
+        if needs[name] <= max_memory:
+            options = dict(options, interval_s=interval_s, backend="pandas")
+            reason = "needs ~{} of {}".format(_gb(needs[name]), _gb(max_memory))
+            if name != "full":
+                reason += ", loading as requested needs ~{}".format(_gb(needs["full"]))
+            logger.info("Reading data with strategy `%s`: %s", name, reason)
+            return name, options
+
+    reason = "loading with compact dtypes and no datetimes needs ~{} of {}".format(
+        _gb(needs["projection"]), _gb(max_memory)
+    )
+    seekable = all(
+        sources.is_plain_file(utils.find_file(path_dir, ch["pattern"], ch["ext"]))
+        for ch in channels
+    )
+    if (sample_f == 1) and seekable and (importlib.util.find_spec("dask") is not None):
+        logger.info("Reading data with strategy `streaming`: %s", reason)
+        options = dict(
+            compact=True, datetimes=datetimes, interval_s=interval_s, backend="dask"
+        )
+        return "streaming", options
+
+    # Resample to the shortest multiple of the interval that fits
+    interval_file = float(
+        meta["parameters"][utils.posix_string(channels[0]["name"])]["Interval(Sec)"]
+    )
+    interval_base = interval_s or interval_file
+    # Rows at the base interval, resampled to a single row by this factor
+    n_base = max(math.ceil(n_file * interval_file / interval_base), 1)
+
+    def _need(factor):
+        return estimate_memory(
+            meta,
+            path_dir,
+            datetimes=False,
+            interval_s=interval_base * factor,
+            n_rows=n_file,
+        )
+
+    # Parsing takes memory whatever the interval, so some budgets cannot fit
+    smallest = _need(n_base)
+    if smallest > max_memory:
+        raise ValueError(
+            "Data of {} cannot be read within {}, even resampled to a single "
+            "row, use a `max_memory` of at least {}".format(
+                meta["experiment"], _gb(max_memory), _gb(smallest)
+            )
+        )
+
+    factor = min(math.ceil(needs["projection"] / max_memory), n_base)
+    while True:
+        need = _need(factor)
+        if (need <= max_memory) or (factor >= n_base):
+            break
+        factor = min(math.ceil(factor * max(need / max_memory, 1.1)), n_base)
+    interval_decimated = interval_base * factor
+    logger.info(
+        "Reading data with strategy `decimation` to %s s intervals: %s, and "
+        "cannot be streamed%s",
+        interval_decimated,
+        reason,
+        " without dask" if seekable else " from archives or compressed files",
+    )
+    options = dict(
+        compact=True, datetimes=False, interval_s=interval_decimated, backend="pandas"
+    )
+
+    return "decimation", options
+
+
+def warm_cache(path_dir, **kwargs):
+    """Read the meta data and data of an experiment directory into caches
+
+    Tag model and ID are parsed from the directory name (see
+    `utils.parse_experiment_params`), e.g. to read data in the background
+    before it is needed, as `pylleo-cal --data-dir` does.
+
+    Args
+    ----
+    path_dir: str
+        Experiment directory containing lleo data files
+    **kwargs
+        Passed to `read_data`
+    """
+    from . import sources
+    from . import utils
+
+    params = utils.parse_experiment_params(sources.experiment_name(path_dir))
+    meta = read_meta(path_dir, params["tag_model"], params["tag_id"])
+    read_data(meta, path_dir, datetimes=False, **kwargs)
+
+    return None
+
+
+def read_data_dask(
+    meta,
+    path_dir,
+    partition_s=21600.0,
+    datetimes=True,
+    compact=True,
+    interval_s=None,
+    how=None,
+    archive_path=None,
+):
+    """Read data lazily as a Dask dataframe partitioned by time
+
+    Partitions hold the rows of consecutive `partition_s` windows. Each is
+    parsed from the rows of the channel files covering its window, found
+    with byte offsets from one scan of each file, or read from an HDF5
+    archive (see `archive.write_archive`). Rows, columns and resampling are
+    those of `read_data`. Requires `dask[dataframe]`, and uncompressed data
+    files outside archives, as partitions seek to their rows (see `sources`).
+
+    Args
+    ----
+    meta: dict
+        Dictionary of meta data from header lines of lleo data files
+    path_dir: str
+        Parent directory containing lleo data files
+    partition_s: float
+        Duration of the data in each partition [s]
+    datetimes, compact, interval_s, how
+        See `read_data`. As partitions are cast independently, integer
+        parameters that may have missing rows use pandas' masked integer
+        dtypes, and sums are widened to at least 32 bits.
+    archive_path: str, optional
+        Read partitions from this HDF5 archive instead of the data files
+
+    Returns
+    -------
+    data_df: dask.dataframe.DataFrame
+        Dataframe indexed by row position, with divisions at the first row
+        of each partition. The time index of each partition is in the
+        `attrs` of its pandas dataframe.
+    """
+    import dask
+    import dask.dataframe
+    import numpy
+    import pandas
+
+    from . import tags
+    from . import utils
+    from .sources import is_plain_file
+
+    if archive_path is not None:
+        from . import archive
+
+        t_index_base, _, _ = archive.read_archive_info(archive_path)
+        window = max(int(round(partition_s / t_index_base["interval_s"])), 1)
+        bounds = list(range(0, t_index_base["n"], window))
+
+        def _read_window(b0, b1):
+            t_window = time_index(
+                index_to_time(t_index_base, b0), t_index_base["interval_s"], b1 - b0
+            )
+            return archive.read_archive(
+                archive_path,
+                t_window["start"],
+                index_to_time(t_window, b1 - b0 - 1),
+                datetimes=datetimes,
+            )
+
+        parts = [
+            dask.delayed(_read_window)(b0, min(b0 + window, t_index_base["n"]))
+            for b0 in bounds
+        ]
+        empty = archive.read_archive(
+            archive_path,
+            t_index_base["start"],
+            t_index_base["start"] - pandas.Timedelta(1, "s"),
+            datetimes=datetimes,
+        )
+        divisions = bounds + [t_index_base["n"] - 1]
+
+        return dask.dataframe.from_delayed(parts, meta=empty, divisions=divisions)
+
+    channels = tags.get_tag_model(meta["tag_model"])
+
+    grid = None
+    if interval_s is not None:
+        _, _, t_index = _channel_index(meta, path_dir, channels[0])
+        grid = _resample_index(t_index, interval_s)
+
+    # Time index of each channel's column and the rows it is computed from
+    sources = list()
+    for ch in channels:
+        path_file, n_header, t_index = _channel_index(meta, path_dir, ch)
+        if not is_plain_file(path_file):
+            raise ValueError(
+                "Partitions cannot seek in {}, use `read_data` or "
+                "`archive_path`".format(path_file)
+            )
+        t_index_out, method = _column_resampling(ch, t_index, grid, how)
+        sources.append(
+            dict(
+                name=utils.posix_string(ch["name"]),
+                path_file=path_file,
+                n_header=n_header,
+                t_index=t_index,
+                t_index_out=t_index if method is None else t_index_out,
+                method=method,
+            )
+        )
+
+    # Columns sampled as the first parameter for all its rows are dense
+    t_index_base = sources[0]["t_index_out"]
+    for src, ch in zip(sources, channels):
+        t = src["t_index"]
+        dense = (
+            (src["method"] is None)
+            and (t["start"] == t_index_base["start"])
+            and (_interval_ns(t) == _interval_ns(t_index_base))
+            and (t["n"] >= t_index_base["n"])
+        )
+        src["dtype"] = _partition_dtype(ch["dtype"], src["method"], dense, compact)
+
+    window = max(int(round(partition_s / t_index_base["interval_s"])), 1)
+    bounds = list(range(0, t_index_base["n"], window))
+
+    t_parts = [
+        time_index(
+            index_to_time(t_index_base, b0),
+            t_index_base["interval_s"],
+            min(b0 + window, t_index_base["n"]) - b0,
+        )
+        for b0 in bounds
+    ]
+
+    # Plan the rows of every partition, then find their offsets in one scan
+    plans = list()
+    for src in sources:
+        plan = [_partition_rows(src, t_part) for t_part in t_parts]
+        starts = numpy.array([p[0] for p in plan], dtype=numpy.int64)
+        offsets = _line_offsets(src["path_file"], src["n_header"], starts)
+        plans.append([p + (int(o),) for p, o in zip(plan, offsets)])
+
+    parts = list()
+    for k, (b0, t_part) in enumerate(zip(bounds, t_parts)):
+        part_plans = [plan[k] for plan in plans]
+        parts.append(
+            dask.delayed(_read_partition)(sources, part_plans, b0, t_part, datetimes)
+        )
+
+    empty = pandas.DataFrame(
+        {src["name"]: pandas.Series([], dtype=src["dtype"]) for src in sources}
+    )
+    if datetimes:
+        empty.insert(0, "datetimes", pandas.Series([], dtype="datetime64[ns]"))
+    divisions = bounds + [t_index_base["n"] - 1]
+
+    return dask.dataframe.from_delayed(parts, meta=empty, divisions=divisions)
+
+
+def _partition_dtype(dtype, method, dense=False, compact=True):
+    """Get the dtype of a column that is the same in every partition"""
+    import numpy
+
+    dtype = numpy.dtype(dtype)
+    if not compact:
+        return "float64"
+    if dtype.kind == "f":
+        return dtype.name
+    if method in ("mean", "linear"):
+        return "float64"
+
+    # Integers use masked dtypes unless no rows can be missing
+    if method == "sum":
+        dtype = numpy.promote_types(dtype, numpy.int32)
+    if dense:
+        return dtype.name
+
+    return dtype.name.capitalize()
+
+
+def _partition_rows(src, t_part):
+    """Get source rows `[c0, c1)` and column rows `[j0, j1)` of a partition"""
+    import numpy
+
+    t_index = src["t_index"]
+    t_index_out = src["t_index_out"]
+    t_end = index_to_time(t_part, max(t_part["n"] - 1, 0))
+
+    j0 = min(
+        max(time_to_index(t_index_out, t_part["start"], how="ceil"), 0),
+        t_index_out["n"],
+    )
+    j1 = min(
+        max(time_to_index(t_index_out, t_end, how="floor") + 1, j0), t_index_out["n"]
+    )
+
+    if src["method"] is None:
+        return j0, j1, j0, j1
+    if j1 == j0:
+        return 0, 0, j0, j1
+
+    # One more row before the first needed, so that bins start within rows
+    r0, r1, _ = _resample_rows(
+        numpy.arange(j0, j1), t_index, t_index_out, src["method"]
+    )
+    c0 = int(min(max(r0.min() - 1, 0), t_index["n"]))
+    c1 = int(min(max(r1.max(), c0), t_index["n"]))
+
+    return c0, c1, j0, j1
+
+
+def _line_offsets(path_file, n_header, rows, blocksize=2**24):
+    """Get byte offsets of the starts of data rows of a file in one scan"""
+    import numpy
+
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    # Row `r` starts after newline number `n_header + r` (counting from 1)
+    need = rows + n_header - 1
+    offsets = numpy.zeros(len(rows), dtype=numpy.int64)
+
+    n_seen = 0
+    pos = 0
+    with open(path_file, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            newlines = numpy.flatnonzero(numpy.frombuffer(block, numpy.uint8) == 10)
+            found = (need >= n_seen) & (need < n_seen + len(newlines))
+            offsets[found] = pos + newlines[need[found] - n_seen] + 1
+            n_seen += len(newlines)
+            pos += len(block)
+
+    # Rows after the end of the file start at its end
+    offsets[need >= n_seen] = pos
+    offsets[need < 0] = 0
+
+    return offsets
+
+
+def _read_rows(path_file, offset, nrows):
+    """Parse values of `nrows` rows of a data file from a byte offset"""
+    import numpy
+    import pandas
+
+    if nrows <= 0:
+        return numpy.empty(0)
+
+    with open(path_file, "rb") as f:
+        f.seek(offset)
+        values = pandas.read_csv(
+            f,
+            sep=r"\s+",
+            header=None,
+            usecols=[0],
+            nrows=nrows,
+            encoding="latin-1",
+        )
+
+    return _to_values(values[0])
+
+
+def _read_partition(sources, plans, b0, t_part, datetimes=True):
+    """Read the rows of a partition from the data files of its channels"""
+    import numpy
+    import pandas
+
+    columns = dict()
+    for src, (c0, c1, j0, j1, offset) in zip(sources, plans):
+        t_index = src["t_index"]
+        data = _read_rows(src["path_file"], offset, c1 - c0)
+        t_sub = time_index(index_to_time(t_index, c0), t_index["interval_s"], len(data))
+
+        if src["method"] is not None:
+            t_index_out = src["t_index_out"]
+            t_out = time_index(
+                index_to_time(t_index_out, j0), t_index_out["interval_s"], j1 - j0
+            )
+            chunks = iter_resample([data], t_sub, t_out, src["method"])
+            data = numpy.concatenate([numpy.empty(0)] + list(chunks))
+            t_sub = t_out
+
+        data = _align(t_sub, data, t_part)
+        columns[src["name"]] = pandas.array(data, dtype=src["dtype"])
+
+    index = pandas.RangeIndex(b0, b0 + t_part["n"])
+    data_df = pandas.DataFrame(columns, index=index)
+    data_df.attrs["time_index"] = t_part
+
+    if datetimes:
+        data_df.insert(0, "datetimes", materialize_datetimes(t_part))
+
+    return data_df
+
+
+def _parse_start(date, time):
+    """Parse start datetime of data file from header date and time"""
+    import logging
+    import pandas
+
+    logger = logging.getLogger(__name__)
+
+    # TODO problematic if both m/d d/m options
+    fmts = [
+        "%Y/%m/%d %H%M%S",
+        "%d/%m/%Y %H%M%S",
+        "%m/%d/%Y %I%M%S %p",
+        "%d/%m/%Y %I%M%S %p",
+    ]
+
+    for fmt in fmts:
+        try:
+            start = pandas.to_datetime("{} {}".format(date, time), format=fmt)
+        except Exception:
+            logger.debug("Date format %s incorrect, trying next...", fmt)
+        else:
+            logger.debug("Date format %s correct.", fmt)
+            break
+
+    return start
+
+
+def _channel_index(meta, path_dir, ch, count=True):
+    """Get path, number of header rows and time index of a data file
+
+    The number of header rows is that found when `meta` was created, so the
+    file is only read to count its rows, and not at all if `count` is False,
+    leaving `n` of the time index 0 for the caller to count while parsing.
+    """
+    import logging
+
+    from . import metrics
+    from . import sources
+    from . import utils
+
+    logger = logging.getLogger(__name__)
+
+    # Get path of data file and associated pickle file
+    path_file = utils.find_file(path_dir, ch["pattern"], ch["ext"])
+    col_name = utils.posix_string(ch["name"])
+    fields = dict(experiment=meta.get("experiment"), channel=col_name)
+
+    # Get number of header rows in file, unless fixed for the tag model
+    n_header = ch["n_header"]
+    if n_header is None:
+        n_header = meta.get("n_header", dict()).get(col_name)
+    if n_header is None:
+        with metrics.stage("encoding", **fields) as record:
+            enc = utils.predict_encoding(path_file, n_lines=20)
+            record["encoding"] = enc
+        with metrics.stage("header", **fields) as record:
+            with sources.open_text(path_file, encoding=enc) as f:
+                n_header = utils.get_n_header(f, ch["header_char"])
+            record["rows"] = n_header
+
+    interval_s = float(meta["parameters"][col_name]["Interval(Sec)"])
+    date = meta["parameters"][col_name]["Start date"]
+    time = meta["parameters"][col_name]["Start time"]
+
+    if (ch["interval_s"] is not None) and (interval_s != ch["interval_s"]):
+        logger.warning(
+            "Interval of %s (%s s) differs from tag model (%s s), using file header",
+            col_name,
+            interval_s,
+            ch["interval_s"],
+        )
+
+    if not count:
+        return path_file, n_header, time_index(_parse_start(date, time), interval_s, 0)
+
+    with metrics.stage("time_axis", **fields) as record:
+        n = _count_rows(path_file, n_header)
+        t_index = time_index(_parse_start(date, time), interval_s, n)
+        record["rows"] = n
+        record["bytes"] = sources.file_size(path_file)
+
+    return path_file, n_header, t_index
+
+
+def _column_resampling(ch, t_index, grid=None, how=None):
+    """Get the time index and method a channel is resampled with, if any"""
+    from . import utils
+
+    col_name = utils.posix_string(ch["name"])
+
+    if grid is not None:
+        if (how is not None) and (col_name in how):
+            method = how[col_name]
+        elif grid["interval_s"] >= t_index["interval_s"]:
+            method = ch["resample"]
+        else:
+            method = "linear"
+        return grid, method
+
+    # Propeller counts sampled more often than 1 s are summed to 1 s
+    if (col_name == "propeller") and (t_index["interval_s"] < 1):
+        return _resample_index(t_index, 1, "sum"), "sum"
+
+    return None, None
+
+
+def _align(t_index, data, t_index_base):
+    """Place data at the rows of the base time index with equal times"""
+    import numpy
+    import pandas
+
+    # Exact nanosecond arithmetic, so rows match as a merge on times would
+    step = _interval_ns(t_index_base)
+    offset = (t_index["start"] - t_index_base["start"]).value
+    t_ns = offset + numpy.arange(len(data), dtype=numpy.int64) * _interval_ns(t_index)
+
+    matched = t_ns % step == 0
+    rows = t_ns // step
+    matched &= (rows >= 0) & (rows < t_index_base["n"])
+
+    if matched.sum() == t_index_base["n"]:
+        return data[matched]
+
+    # Mark missing rows with a mask for integers, NaN for floats
+    if data.dtype.kind in "iu":
+        values = numpy.zeros(t_index_base["n"], dtype=data.dtype)
+        values[rows[matched]] = data[matched]
+        mask = numpy.ones(t_index_base["n"], dtype=bool)
+        mask[rows[matched]] = False
+        return pandas.arrays.IntegerArray(values, mask)
+
+    aligned = numpy.full(t_index_base["n"], numpy.nan, dtype=data.dtype)
+    aligned[rows[matched]] = data[matched]
+
+    return aligned
+
+
+def _compact_column(data, dtype):
+    """Cast to compact dtype, masking NaN values of integer dtypes"""
+    import numpy
+    import pandas
+
+    from . import utils
+
+    nan = numpy.isnan(data) if data.dtype.kind == "f" else None
+    if (numpy.dtype(dtype).kind in "iu") and (nan is not None) and nan.any():
+        values = utils.to_compact(numpy.where(nan, 0, data), dtype)
+        if values.dtype.kind in "iu":
+            return pandas.arrays.IntegerArray(values, nan)
+
+    return utils.to_compact(data, dtype)
+
+
+def _count_rows(path_file, n_header, blocksize=2**20):
+    """Count the data rows of a file from its newlines"""
+    from . import sources
+
+    n_lines = 0
+    last = b"\n"
+    with sources.open_file(path_file) as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+
+    # Count a final line without a trailing newline
+    if last != b"\n":
+        n_lines += 1
+
+    return max(n_lines - n_header, 0)
+
+
+def iter_channel(path_file, n_header, chunksize=1000000):
+    """Iterate over chunks of values of a Little Leonardo data file
+
+    Args
+    ----
+    path_file: str
+        Path to the data file
+    n_header: int
+        Number of header rows to skip
+    chunksize: int
+        Number of values in each chunk
+
+    Yields
+    ------
+    chunk: ndarray of float64
+        Values of the next `chunksize` rows of the file, NaN for rows that
+        are not numbers
+    """
+    import pandas
+
+    from . import sources
+
+    # Compressed files and archive members are decompressed as they are parsed
+    with sources.open_file(path_file) as f:
+        reader = pandas.read_csv(
+            f,
+            sep=r"\s+",
+            header=None,
+            usecols=[0],
+            skiprows=n_header,
+            chunksize=chunksize,
+            encoding="latin-1",
+        )
+        with reader:
+            for chunk in reader:
+                yield _to_values(chunk[0])
+
+
+def _to_values(column):
+    """Convert a parsed column to float64, with rows that are not numbers NaN
+
+    Columns are parsed with inferred dtypes rather than as float64, so that
+    rows that could not be parsed (e.g. `-`) are missing values, as
+    `numpy.genfromtxt` made them, rather than errors.
+    """
+    import numpy
+    import pandas
+
+    return pandas.to_numeric(column, errors="coerce").to_numpy(dtype=numpy.float64)
+
+
+def read_channel(
+    path_file, n_header, dtype="float64", chunksize=1000000, chunks=None, n_rows=None
+):
+    """Read values of a Little Leonardo data file into a preallocated array
+
+    Args
+    ----
+    path_file: str
+        Path to the data file
+    n_header: int
+        Number of header rows to skip
+    dtype: numpy.dtype
+        Storage dtype, widened if values cannot be cast exactly (see
+        `utils.to_compact`)
+    chunksize: int
+        Number of values parsed at once
+    chunks: iterable of ndarray, optional
+        Chunks of the values of the file to store, e.g. passed through
+        `qc.iter_checked`, instead of those of `iter_channel`
+    n_rows: int, optional
+        Number of rows of the file, if already known, else counted from it
+        before its values are parsed
+
+    Returns
+    -------
+    data: ndarray
+        Values of the data file
+    """
+    import numpy
+
+    from . import utils
+
+    if n_rows is None:
+        n_rows = _count_rows(path_file, n_header)
+    data = numpy.empty(n_rows, dtype=dtype)
+    if chunks is None:
+        chunks = iter_channel(path_file, n_header, chunksize)
+
+    n = 0
+    for chunk in chunks:
+        chunk = utils.to_compact(chunk, data.dtype)
+        if chunk.dtype != data.dtype:
+            data = data.astype(numpy.promote_types(data.dtype, chunk.dtype))
+        if n + len(chunk) > len(data):
+            data = numpy.resize(data, n + len(chunk))
+        data[n : n + len(chunk)] = chunk
+        n += len(chunk)
+
+    # Blank lines are counted but not parsed
+    return data[:n]
+
+
+def time_index(start, interval_s, n):
+    """Create an implicit time index of regularly sampled data
+
+    Args
+    ----
+    start: datetime-like
+        Time of the first sample
+    interval_s: float
+        Interval between samples [s]
+    n: int
+        Number of samples
+
+    Returns
+    -------
+    t_index: dict
+        `start` (pandas.Timestamp), `interval_s` and `n`
+    """
+    from collections import OrderedDict
+    import pandas
+
+    t_index = OrderedDict()
+    t_index["start"] = pandas.Timestamp(start)
+    t_index["interval_s"] = float(interval_s)
+    t_index["n"] = int(n)
+
+    return t_index
+
+
+def get_time_index(data_df):
+    """Get the implicit time index of a dataframe returned by `read_data`"""
+    return data_df.attrs["time_index"]
+
+
+def _interval_ns(t_index):
+    """Return the sampling interval in integer nanoseconds"""
+    return int(round(t_index["interval_s"] * 1e9))
+
+
+def _infer_time_index(datetimes):
+    """Create time index from a materialized `datetimes` column"""
+    import pandas
+
+    datetimes = pandas.to_datetime(pandas.Series(datetimes))
+    interval_s = (datetimes.iloc[1] - datetimes.iloc[0]).total_seconds()
+
+    return time_index(datetimes.iloc[0], interval_s, len(datetimes))
+
+
+def time_to_index(t_index, t, how="nearest"):
+    """Get row positions of times from an implicit time index in O(1)
+
+    Args
+    ----
+    t_index: dict
+        Implicit time index, see `time_index`
+    t: datetime-like or array-like of datetime-like
+        Time(s) to get the row positions of
+    how: str
+        Round to the `nearest` row, or the row at or before (`floor`) or at or
+        after (`ceil`) the time
+
+    Returns
+    -------
+    idx: int or ndarray of int
+        Row positions, which may be outside of `[0, n)` for times outside of
+        the index
+
+    Example
+    -------
+    >>> t_index = time_index("2016-04-18 10:00:00", 0.5, 10)
+    >>> time_to_index(t_index, "2016-04-18 10:00:02.2")
+    4
+    """
+    import numpy
+    import pandas
+
+    rounders = {"nearest": numpy.round, "floor": numpy.floor, "ceil": numpy.ceil}
+
+    t_ns = numpy.asarray(pandas.to_datetime(t), dtype="datetime64[ns]")
+    delta = (t_ns - numpy.datetime64(t_index["start"], "ns")).astype(numpy.int64)
+    idx = rounders[how](delta / _interval_ns(t_index)).astype(numpy.int64)
+
+    return int(idx) if idx.ndim == 0 else idx
+
+
+def index_to_time(t_index, idx):
+    """Get times of row positions from an implicit time index
+
+    Args
+    ----
+    t_index: dict
+        Implicit time index, see `time_index`
+    idx: int or array-like of int
+        Row positions
+
+    Returns
+    -------
+    t: pandas.Timestamp or pandas.DatetimeIndex
+        Times of the rows
+    """
+    import numpy
+    import pandas
+
+    delta = numpy.asarray(idx, dtype=numpy.int64) * _interval_ns(t_index)
+    t = t_index["start"] + pandas.to_timedelta(delta, unit="ns")
+
+    return t
+
+
+def time_slice(t_index, start, end):
+    """Get slice of rows between two times, inclusive
+
+    Example
+    -------
+    >>> t_index = time_index("2016-04-18 10:00:00", 1, 3600)
+    >>> time_slice(t_index, "2016-04-18 10:10:00", "2016-04-18 10:20:00")
+    slice(600, 1201, None)
+    """
+    i0 = max(time_to_index(t_index, start, how="ceil"), 0)
+    i1 = min(time_to_index(t_index, end, how="floor") + 1, t_index["n"])
+
+    return slice(i0, max(i0, i1))
+
+
+def materialize_datetimes(t_index):
+    """Create an array of the times of all rows of an implicit time index"""
+    import numpy
+
+    return index_to_time(t_index, numpy.arange(t_index["n"]))
+
+
+RESAMPLE_METHODS = ("sum", "mean", "linear", "nearest")
+
+
+def _resample_rows(j, t_index, t_index_out, how):
+    """Get source rows `[r0, r1)` needed for outputs `j`, and their times
+
+    Times are integer nanoseconds from the start of `t_index`, so that bins
+    and positions are exact.
+    """
+    import numpy
+
+    src = _interval_ns(t_index)
+    out = _interval_ns(t_index_out)
+    offset = (t_index_out["start"] - t_index["start"]).value
+    t = offset + numpy.asarray(j, dtype=numpy.int64) * out
+
+    if how in ("sum", "mean"):
+        # Rows with times in `[t, t + out)`
+        r0 = -(-t // src)
+        r1 = -(-(t + out) // src)
+    elif how == "linear":
+        r0 = t // src
+        r1 = r0 + 1 + (t % src > 0)
+    elif how == "nearest":
+        r0 = (t + src // 2) // src
+        r1 = r0 + 1
+    else:
+        raise ValueError(
+            "Resampling method `{}` not one of {}".format(how, RESAMPLE_METHODS)
+        )
+
+    return r0, r1, t
+
+
+def _resample_block(data, i0, r0, r1, t, src, how):
+    """Calculate outputs from the rows `[i0, i0 + len(data))` they need"""
+    import numpy
+
+    e0 = r0 - i0
+    e1 = r1 - i0
+
+    if how in ("sum", "mean"):
+        counts = e1 - e0
+        nonempty = counts > 0
+
+        # Integer sums stay integers unless there are empty intervals
+        exact = (how == "sum") and (data.dtype.kind in "iub") and nonempty.all()
+        if exact:
+            values = numpy.zeros(len(e0), dtype=numpy.int64)
+        else:
+            values = numpy.full(len(e0), numpy.nan)
+        if nonempty.any():
+            # Bins are contiguous, so each sum runs to the start of the next
+            sums = numpy.add.reduceat(
+                data[: e1[nonempty][-1]], e0[nonempty], dtype=values.dtype
+            )
+            values[nonempty] = sums if how == "sum" else sums / counts[nonempty]
+        return values
+
+    if how == "linear":
+        frac = (t % src) / src
+        upper = numpy.minimum(e0 + 1, len(data) - 1)
+        return data[e0] * (1 - frac) + data[upper] * frac
+
+    return data[e0]
+
+
+def _resample_index(t_index, interval_s, how="mean"):
+    """Grid of `interval_s` from the start of `t_index`, as long as it covers"""
+    import numpy
+
+    # Outputs until the first that needs rows after the end of the data
+    span = t_index["n"] * t_index["interval_s"]
+    n_max = int(numpy.ceil(span / interval_s)) + 1
+    t_index_out = time_index(t_index["start"], interval_s, n_max)
+    _, r1, _ = _resample_rows(numpy.arange(n_max), t_index, t_index_out, how)
+    t_index_out["n"] = int(numpy.searchsorted(r1, t_index["n"], side="right"))
+
+    return t_index_out
+
+
+def resample(data, t_index, t_index_out=None, interval_s=None, how="mean"):
+    """Resample regularly sampled data to another interval
+
+    Args
+    ----
+    data: ndarray, shape (n,)
+        Data to resample
+    t_index: dict
+        Implicit time index of `data`, see `time_index`
+    t_index_out: dict, optional
+        Time index of the output grid. Defaults to a grid of `interval_s`
+        starting with `data`, as long as `data` covers.
+    interval_s: float, optional
+        Output interval [s] when `t_index_out` is not passed
+    how: str
+        `sum` or `mean` of the samples in each output interval `[t, t +
+        interval_s)`, or `linear` or `nearest` interpolation at each output
+        time
+
+    Returns
+    -------
+    values: ndarray, shape (t_index_out["n"],)
+        Resampled data. Outputs not covered by `data` are NaN.
+    t_index_out: dict
+        Time index of `values`
+
+    Example
+    -------
+    >>> import numpy
+    >>> t_index = time_index("2016-04-18", 0.5, 7)
+    >>> values, _ = resample(numpy.arange(7), t_index, interval_s=1, how="sum")
+    >>> values.tolist()
+    [1, 5, 9]
+    """
+    import numpy
+
+    if t_index_out is None:
+        t_index_out = _resample_index(t_index, interval_s, how)
+
+    values = numpy.concatenate(
+        list(iter_resample([data], t_index, t_index_out, how=how))
+    )
+
+    return values, t_index_out
+
+
+def iter_resample(chunks, t_index, t_index_out, how="mean"):
+    """Resample consecutive chunks of data to another interval
+
+    Source rows still needed by later outputs are carried between chunks, so
+    chunks of any size give the same result as `resample` on all data.
+
+    Args
+    ----
+    chunks: iterable of ndarray
+        Consecutive chunks of regularly sampled data, e.g. from
+        `iter_channel`
+    t_index: dict
+        Implicit time index of the concatenated chunks
+    t_index_out: dict
+        Time index of the output grid
+    how: str
+        Resampling method, see `resample`
+
+    Yields
+    ------
+    values: ndarray
+        Consecutive outputs on the grid of `t_index_out`. Outputs not covered
+        by the data are NaN.
+    """
+    import numpy
+
+    src = _interval_ns(t_index)
+    out = _interval_ns(t_index_out)
+    offset = (t_index_out["start"] - t_index["start"]).value
+    n_out = t_index_out["n"]
+
+    buf = None
+    i0 = 0
+    j = 0
+    for chunk in chunks:
+        chunk = numpy.asarray(chunk)
+        buf = chunk if buf is None else numpy.concatenate((buf, chunk))
+        i_end = i0 + len(buf)
+
+        # Candidate outputs that may be complete with rows up to `i_end`
+        j_max = (i_end * src - offset) // out + 1
+        jj = numpy.arange(j, min(max(j_max + 1, j), n_out))
+        r0, r1, t = _resample_rows(jj, t_index, t_index_out, how)
+        k = int(numpy.searchsorted(r1, i_end, side="right"))
+        if k == 0:
+            continue
+
+        # Outputs needing rows before the start of the data are NaN
+        valid = r0[:k] >= 0
+        if how in ("sum", "mean"):
+            valid &= t[:k] >= 0
+        if valid.all():
+            values = _resample_block(buf, i0, r0[:k], r1[:k], t[:k], src, how)
+        else:
+            values = numpy.full(k, numpy.nan)
+            if valid.any():
+                values[valid] = _resample_block(
+                    buf, i0, r0[:k][valid], r1[:k][valid], t[:k][valid], src, how
+                )
+        yield values
+        j += k
+
+        # Drop rows that no later output needs
+        if j < n_out:
+            next_r0, _, _ = _resample_rows(j, t_index, t_index_out, how)
+            drop = int(min(max(next_r0 - i0, 0), len(buf)))
+        else:
+            drop = len(buf)
+        buf = buf[drop:]
+        i0 += drop
+
+    # Outputs after the end of the data
+    if j < n_out:
+        yield numpy.full(n_out - j, numpy.nan)
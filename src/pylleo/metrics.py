@@ -0,0 +1,121 @@
+"""Timing, size and memory metrics of processing stages
+
+Stages of reading and caching data (e.g. `encoding`, `header`, `tokenize`,
+`time_axis`, `merge` and `cache_write`) are timed with `stage`. Each record is
+logged to the `pylleo` logger at DEBUG level and passed to the callbacks
+registered with `add_callback`, e.g. to feed monitoring. Progress messages of
+pylleo are logged at INFO level and may be shown or silenced with the standard
+`logging` configuration:
+
+.. code:: python
+
+    import logging
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("pylleo").setLevel(logging.WARNING)
+
+A record is a dictionary with the `stage` name, its `duration_s`, the peak
+resident memory of the process (`peak_rss_bytes`, `None` where unavailable)
+at its end, and fields describing the stage, such as `experiment`, `channel`,
+`rows` and `bytes` read or written.
+"""
+
+_callbacks = list()
+
+
+def add_callback(callback):
+    """Register a function called with the record of each completed stage
+
+    Example
+    -------
+    >>> records = list()
+    >>> add_callback(records.append)
+    >>> with stage("tokenize", channel="depth") as record:
+    ...     record["rows"] = 3600
+    >>> remove_callback(records.append)
+    >>> records[0]["stage"], records[0]["rows"]
+    ('tokenize', 3600)
+    """
+    _callbacks.append(callback)
+
+    return None
+
+
+def remove_callback(callback):
+    """Unregister a function registered with `add_callback`"""
+    _callbacks.remove(callback)
+
+    return None
+
+
+def peak_rss():
+    """Return the peak resident memory of the process in bytes, if available"""
+    import sys
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in bytes on macOS, and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def report(record):
+    """Log a record and pass it to the registered callbacks
+
+    Args
+    ----
+    record: dict
+        Record with at least the `stage` name and its `duration_s`, e.g. of
+        measurements not made with `stage`
+    """
+    import logging
+
+    logger = logging.getLogger("pylleo.metrics")
+
+    if logger.isEnabledFor(logging.DEBUG):
+        details = ", ".join(
+            "{}={}".format(k, v)
+            for k, v in record.items()
+            if k not in ("stage", "duration_s")
+        )
+        logger.debug("%s: %.3f s (%s)", record["stage"], record["duration_s"], details)
+    for callback in list(_callbacks):
+        callback(record)
+
+    return None
+
+
+def stage(name, **fields):
+    """Context manager timing a processing stage and reporting its record
+
+    Args
+    ----
+    name: str
+        Name of the stage
+    **fields
+        Fields of the record describing the stage, e.g. `channel`
+
+    Yields
+    ------
+    record: dict
+        Record of the stage, to which the block may add fields such as
+        `rows` and `bytes`. It is reported when the block completes.
+    """
+    import contextlib
+    import time
+
+    @contextlib.contextmanager
+    def _stage():
+        record = dict(stage=name)
+        record.update(fields)
+        t0 = time.perf_counter()
+        yield record
+        record["duration_s"] = time.perf_counter() - t0
+        record["peak_rss_bytes"] = peak_rss()
+        report(record)
+
+    return _stage()
@@ -0,0 +1,219 @@
+"""Parquet datasets of calibrated experiment data
+
+Dataframes of `lleoio.read_data`, with the calibrated columns added by
+`lleocal.calibrate_acc` and `lleocal.calibrate_propeller`, are exported to a
+Hive partitioned Parquet dataset, e.g. to query deployments from Spark or
+DuckDB. Each experiment is written below `experiment=<name>/` of the dataset,
+with one file per day (`date=<YYYY-MM-DD>/part-0.parquet`). Rows are sorted
+by their `datetimes` column, which is written in row groups with min/max
+statistics, so that time range predicates skip the row groups and files
+outside the range. The experiment's meta data, calibration and the time index
+of each file are stored as JSON in the `pylleo` key of the file footer.
+
+Data is written one block at a time, from a pandas dataframe or one Dask
+partition at a time (see `lleoio.read_data_dask`), so that neither the
+`datetimes` column nor an Arrow table of the whole experiment is created.
+
+Requires `pyarrow` (`pip install pylleo[parquet]`).
+
+.. code:: sql
+
+    SELECT * FROM read_parquet('dataset/**/*.parquet', hive_partitioning=1)
+    WHERE datetimes BETWEEN '2016-04-18 10:00' AND '2016-04-18 11:00'
+"""
+
+
+def _iter_blocks(data_df, block_rows):
+    """Iterate over pandas blocks of a dataframe and their time indices"""
+    from . import lleoio
+
+    if hasattr(data_df, "partitions"):
+        for k in range(data_df.npartitions):
+            part = data_df.get_partition(k).compute()
+            if "time_index" in part.attrs:
+                t_index = lleoio.get_time_index(part)
+            else:
+                t_index = lleoio._infer_time_index(part["datetimes"])
+            yield part, t_index
+        return
+
+    t_index = lleoio.get_time_index(data_df)
+    for i0 in range(0, len(data_df), block_rows):
+        block = data_df.iloc[i0 : i0 + block_rows]
+        start = lleoio.index_to_time(t_index, i0)
+        yield block, lleoio.time_index(start, t_index["interval_s"], len(block))
+
+
+def _footer(meta, cal_dict, t_index):
+    """JSON of the meta data, calibration and time index of a file"""
+    import json
+
+    t_index = dict(t_index, start=t_index["start"].isoformat())
+
+    return json.dumps(
+        dict(meta=meta, cal=cal_dict or dict(), time_index=t_index), default=str
+    )
+
+
+def write_parquet(
+    path,
+    data_df,
+    meta,
+    cal_dict=None,
+    partition="D",
+    row_group_rows=2**17,
+    compression="zstd",
+):
+    """Write experiment data to a partitioned Parquet dataset
+
+    Args
+    ----
+    path: str
+        Root directory of the dataset, which may hold several experiments
+    data_df: pandas.DataFrame or dask.dataframe.DataFrame
+        Dataframe returned by `lleoio.read_data` or `lleoio.read_data_dask`,
+        optionally with calibrated columns
+    meta: dict
+        Dictionary of meta data from `lleoio.read_meta`
+    cal_dict: dict, optional
+        Calibration dictionary from `lleocal.read_cal`
+    partition: str or None
+        Frequency of the time partitions (`D` for days, `h` for hours), or
+        `None` for one file per experiment
+    row_group_rows: int
+        Maximum number of rows in each row group, the unit of pruning by
+        time statistics
+    compression: str
+        Parquet compression codec, e.g. `zstd`, `snappy` or `none`
+
+    Returns
+    -------
+    paths: list of str
+        Paths of the files written
+    """
+    import os
+    import shutil
+    import uuid
+
+    import numpy
+    import pandas
+    import pyarrow
+    import pyarrow.parquet
+
+    from . import lleoio
+    from . import utils
+
+    # Names starting with `.` are skipped by readers of the dataset
+    name_exp = "experiment={}".format(meta["experiment"])
+    path_exp = os.path.join(path, name_exp)
+    path_tmp = os.path.join(path, ".{}.{}.tmp".format(name_exp, uuid.uuid4().hex))
+    os.makedirs(path_tmp)
+
+    paths = list()
+    writer, key, t_file = None, None, None
+
+    def _close(writer, t_file):
+        # Footers are written last, so they hold the time index of the file
+        writer.add_key_value_metadata({"pylleo": _footer(meta, cal_dict, t_file)})
+        writer.close()
+
+    try:
+        for block, t_block in _iter_blocks(data_df, row_group_rows):
+            if len(block) == 0:
+                continue
+            times = lleoio.index_to_time(t_block, numpy.arange(len(block)))
+            block = block.drop(columns="datetimes", errors="ignore")
+            block.insert(0, "datetimes", times)
+            # Attributes are stored in the footer instead of pandas metadata
+            block.attrs = dict()
+
+            # Rows are sorted, so each partition is one run of rows
+            if partition is None:
+                keys = numpy.zeros(len(block), dtype=int)
+                names = ["all"]
+            else:
+                floors = pandas.DatetimeIndex(times).floor(partition)
+                names, keys = numpy.unique(floors, return_inverse=True)
+            bounds = numpy.flatnonzero(numpy.diff(keys)) + 1
+            for i0, i1 in zip(numpy.r_[0, bounds], numpy.r_[bounds, len(block)]):
+                name = names[keys[i0]]
+                if name != key:
+                    if writer is not None:
+                        _close(writer, t_file)
+                    if partition is None:
+                        path_dir = path_tmp
+                    else:
+                        day = pandas.Timestamp(name)
+                        fmt = "%Y-%m-%d" if partition == "D" else "%Y-%m-%dT%H%M%S"
+                        path_dir = os.path.join(
+                            path_tmp, "date={}".format(day.strftime(fmt))
+                        )
+                    os.makedirs(path_dir, exist_ok=True)
+                    path_file = os.path.join(path_dir, "part-0.parquet")
+                    table = pyarrow.Table.from_pandas(
+                        block.iloc[i0:i1], preserve_index=False
+                    )
+                    writer = pyarrow.parquet.ParquetWriter(
+                        path_file,
+                        table.schema,
+                        compression=compression,
+                        coerce_timestamps="us",
+                        sorting_columns=[pyarrow.parquet.SortingColumn(0)],
+                        write_statistics=True,
+                    )
+                    paths.append(os.path.relpath(path_file, path_tmp))
+                    key = name
+                    t_file = lleoio.time_index(times[i0], t_block["interval_s"], 0)
+                else:
+                    table = pyarrow.Table.from_pandas(
+                        block.iloc[i0:i1], schema=writer.schema, preserve_index=False
+                    )
+                writer.write_table(table, row_group_size=row_group_rows)
+                t_file["n"] += i1 - i0
+
+        if writer is not None:
+            _close(writer, t_file)
+            writer = None
+
+        # Replace a previous export of the experiment at once
+        with utils.file_lock(os.path.join(path, "." + name_exp)):
+            path_old = None
+            if os.path.exists(path_exp):
+                path_old = path_tmp + ".old"
+                os.replace(path_exp, path_old)
+            os.replace(path_tmp, path_exp)
+            if path_old is not None:
+                shutil.rmtree(path_old)
+    finally:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(path_tmp, ignore_errors=True)
+
+    return [os.path.join(path_exp, p) for p in paths]
+
+
+def read_parquet_info(path_file):
+    """Read the meta data, calibration and time index of a Parquet file
+
+    Returns
+    -------
+    t_index: dict
+        Implicit time index of the rows of the file, see `lleoio.time_index`
+    meta: dict
+        Meta data of the experiment
+    cal_dict: dict
+        Calibration dictionary of the experiment, empty if not exported
+    """
+    from collections import OrderedDict
+    import json
+
+    import pyarrow.parquet
+
+    from . import lleoio
+
+    metadata = pyarrow.parquet.read_metadata(path_file).metadata
+    info = json.loads(metadata[b"pylleo"], object_pairs_hook=OrderedDict)
+    t = info["time_index"]
+    t_index = lleoio.time_index(t["start"], t["interval_s"], t["n"])
+
+    return t_index, info["meta"], info["cal"]
@@ -0,0 +1,213 @@
+"""Quality checks of channel data, made while it is parsed
+
+As `lleoio.read_data` parses each data file, its chunks of values pass
+through `iter_checked`, which counts in the same pass, with vectorized
+operations on each chunk:
+
+- missing values (rows that could not be parsed),
+- values outside the channel's `valid_range` (see `tags`),
+- runs of identical values lasting the channel's `stuck_s` or longer, and
+- for channels that `saturate`, values at the limits of the sensor's counts.
+
+`summarize` adds the time ranges of the channels, to find channels whose
+duration differs from the first channel's (e.g. from clock drift or missing
+rows), and row counts that differ from the `Data count` of the header. It
+lists the problems found as `flags`. The report is small, and is stored in
+`data_df.attrs["qc"]` and so in the cache of the data, so it is never
+computed again.
+"""
+
+QC_DEFAULTS = {"saturation_min": 10}
+
+
+def saturation_range(saturates, dtype):
+    """Get the counts a channel saturates at from its schema (see `tags`)
+
+    Args
+    ----
+    saturates: bool or list of float
+        `saturates` of the channel's schema
+    dtype: numpy.dtype
+        Storage dtype of the channel, whose limits are those of the counts
+        if `saturates` is True
+
+    Returns
+    -------
+    limits: list of float or None
+        Lowest and highest counts, or None if the channel does not saturate
+
+    Example
+    -------
+    >>> saturation_range(True, "int16"), saturation_range([0, 4095], "int16")
+    ([-32768.0, 32767.0], [0.0, 4095.0])
+    """
+    import numpy
+
+    if saturates is True:
+        if numpy.dtype(dtype).kind not in "iu":
+            raise ValueError(
+                "Limits of counts of {} are unknown, set `saturates` to "
+                "the lowest and highest counts".format(dtype)
+            )
+        info = numpy.iinfo(dtype)
+        return [float(info.min), float(info.max)]
+    if not saturates:
+        return None
+
+    return [float(saturates[0]), float(saturates[1])]
+
+
+def iter_checked(
+    chunks, report, valid_range=None, stuck_rows=None, saturation_range=None
+):
+    """Pass chunks of values through, counting quality problems in a report
+
+    Args
+    ----
+    chunks: iterable of ndarray
+        Consecutive chunks of the values of a channel, e.g. from
+        `lleoio.iter_channel`
+    report: dict
+        Filled with the counts of the checks once all chunks are consumed
+    valid_range: list of float, optional
+        Lowest and highest plausible values
+    stuck_rows: int, optional
+        Number of identical consecutive values counted as a stuck run
+    saturation_range: list of float, optional
+        Lowest and highest counts of the sensor, values at or beyond which
+        are counted as saturated (see `saturation_range`)
+
+    Yields
+    ------
+    chunk: ndarray
+        The chunks, unchanged
+
+    Example
+    -------
+    >>> import numpy
+    >>> report = dict()
+    >>> chunks = [numpy.array([1.0, 5, 5]), numpy.array([5.0, 5, numpy.nan])]
+    >>> _ = list(iter_checked(chunks, report, valid_range=[0, 4], stuck_rows=3))
+    >>> report["rows"], report["missing"], report["above"], report["stuck_rows"]
+    (6, 1, 4, 4)
+    """
+    import numpy
+
+    counts = dict(rows=0, missing=0, below=0, above=0)
+    counts.update(stuck_runs=0, stuck_rows=0, longest_run=0)
+    if saturation_range is not None:
+        counts.update(at_min=0, at_max=0)
+    last, run = None, 0
+
+    def _runs(lengths):
+        counts["longest_run"] = max(counts["longest_run"], int(lengths.max()))
+        if stuck_rows:
+            stuck = lengths[lengths >= stuck_rows]
+            counts["stuck_runs"] += len(stuck)
+            counts["stuck_rows"] += int(stuck.sum())
+
+    for chunk in chunks:
+        if len(chunk) > 0:
+            nan = numpy.isnan(chunk)
+            counts["rows"] += len(chunk)
+            counts["missing"] += int(nan.sum())
+            if valid_range is not None:
+                counts["below"] += int((chunk < valid_range[0]).sum())
+                counts["above"] += int((chunk > valid_range[1]).sum())
+
+            # Values at the limits of the sensor, not of the data, as long
+            # deployments reach their own extremes many times
+            if saturation_range is not None:
+                counts["at_min"] += int((chunk <= saturation_range[0]).sum())
+                counts["at_max"] += int((chunk >= saturation_range[1]).sum())
+
+            # Lengths of runs of identical values, the first continuing the
+            # last run of the previous chunk
+            starts = numpy.r_[0, numpy.flatnonzero(chunk[1:] != chunk[:-1]) + 1]
+            lengths = numpy.diff(numpy.r_[starts, len(chunk)])
+            if chunk[0] == last:
+                lengths[0] += run
+            elif run:
+                _runs(numpy.array([run]))
+            if len(lengths) > 1:
+                _runs(lengths[:-1])
+            last, run = chunk[-1], int(lengths[-1])
+        yield chunk
+
+    if run:
+        _runs(numpy.array([run]))
+
+    report.update(counts)
+    if saturation_range is not None:
+        report.update(min=saturation_range[0], max=saturation_range[1])
+
+    return None
+
+
+def summarize(reports, t_indexes, meta, saturation_min=QC_DEFAULTS["saturation_min"]):
+    """Combine the checks of all channels of an experiment and flag problems
+
+    Args
+    ----
+    reports: dict
+        Reports of `iter_checked` by column name
+    t_indexes: dict
+        Time index of the rows of each channel's file, by column name, see
+        `lleoio.time_index`
+    meta: dict
+        Dictionary of meta data from `lleoio.read_meta`
+    saturation_min: int
+        Number of values at a limit of the sensor's counts from which a
+        channel is flagged as saturated
+
+    Returns
+    -------
+    qc: dict
+        `channels` with the checks, `start`, `end`, `end_offset_s` (end
+        relative to the first channel's) and `expected_rows` (from the header,
+        if any) of each, and `flags`, a list of the problems found
+    """
+    from . import lleoio
+
+    channels = dict()
+    flags = list()
+    t_base = next(iter(t_indexes.values()))
+    end_base = lleoio.index_to_time(t_base, t_base["n"])
+    for col, report in reports.items():
+        t_index = t_indexes[col]
+        end = lleoio.index_to_time(t_index, t_index["n"])
+        entry = dict(report)
+        entry["start"] = t_index["start"].isoformat()
+        entry["end"] = end.isoformat()
+        entry["end_offset_s"] = (end - end_base).total_seconds()
+        expected = meta["parameters"].get(col, dict()).get("Data count")
+        entry["expected_rows"] = int(float(expected)) if expected else None
+        channels[col] = entry
+
+        def _flag(msg, *args):
+            flags.append("{}: {}".format(col, msg.format(*args)))
+
+        if entry["missing"]:
+            _flag("{} missing values", entry["missing"])
+        if entry["below"] or entry["above"]:
+            _flag("{} values out of range", entry["below"] + entry["above"])
+        if entry["stuck_runs"]:
+            _flag("{} rows stuck in {} runs", entry["stuck_rows"], entry["stuck_runs"])
+        for bound in ("min", "max"):
+            if entry.get("at_" + bound, 0) >= saturation_min:
+                _flag(
+                    "{} values saturated at {} {}",
+                    entry["at_" + bound],
+                    bound,
+                    entry[bound],
+                )
+        if abs(entry["end_offset_s"]) >= max(
+            t_index["interval_s"], t_base["interval_s"]
+        ):
+            _flag("ends {} s after the first channel", entry["end_offset_s"])
+        if (entry["expected_rows"] is not None) and (
+            entry["expected_rows"] != entry["rows"]
+        ):
+            _flag("{} rows, header has {}", entry["rows"], entry["expected_rows"])
+
+    return dict(channels=channels, flags=flags)
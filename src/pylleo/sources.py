@@ -0,0 +1,287 @@
+"""Reading experiments from archives and compressed data files
+
+Experiments bundled as `.zip` or `.tar` archives (optionally compressed, e.g.
+`.tar.gz`) are read in place: a path inside an archive, such as
+`/data/20160418_W190PD3GT_34840_Skinny_2Neutral.zip`, is used as the data
+directory, and its members are decompressed as they are parsed, without
+extracting them. If all members of an archive are in a single directory, that
+directory is the root of the archive's paths. Data files compressed with
+`gzip`, `bz2`, `xz` or `zstd` (`.TXT.gz`, ..., `.TXT.zst`) are decompressed as
+they are read, from directories or archives.
+
+Caches and YAML files of experiments read from an archive are written to a
+directory next to it, named after the archive without its extension.
+
+Reading `.zst` files requires `zstandard` (`pip install pylleo[zstd]`) on
+Python versions before 3.14.
+"""
+
+ARCHIVE_EXTS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+COMPRESSION_EXTS = (".gz", ".bz2", ".xz", ".zst")
+
+
+def _archive_ext(path):
+    """Return the archive extension of a path, or `None`"""
+    name = path.lower()
+    for ext in sorted(ARCHIVE_EXTS, key=len, reverse=True):
+        if name.endswith(ext):
+            return ext
+
+    return None
+
+
+def is_archive(path):
+    """Return whether a path is an existing archive file, e.g. of an experiment"""
+    import os
+
+    return (_archive_ext(path) is not None) and os.path.isfile(path)
+
+
+def strip_compression(name):
+    """Return a file name without its compression extension
+
+    Example
+    -------
+    >>> strip_compression("exp-Depth.TXT.gz")
+    'exp-Depth.TXT'
+    """
+    import os
+
+    root, ext = os.path.splitext(name)
+
+    return root if ext.lower() in COMPRESSION_EXTS else name
+
+
+def split_archive(path):
+    """Split a path into an archive and the path of a member in it
+
+    Returns
+    -------
+    archive: str or None
+        Path of the archive containing `path`, or `None` if not in an archive
+    member: str
+        Path relative to the root of the archive, or `path` if not in one
+    """
+    import os
+
+    head = os.path.abspath(path)
+    parts = list()
+    while True:
+        if is_archive(head):
+            return head, "/".join(reversed(parts))
+        head, name = os.path.split(head)
+        if not name:
+            return None, path
+        parts.append(name)
+
+
+def _archive_index(archive):
+    """Get the root and file members of an archive, cached while unchanged"""
+    import os
+
+    stat = os.stat(archive)
+
+    return _read_archive_index(archive, stat.st_mtime, stat.st_size)
+
+
+def _read_archive_index(archive, mtime, size):
+    """Read the file members of an archive and the directory they share"""
+    import tarfile
+    import zipfile
+
+    key = (archive, mtime, size)
+    if key in _index_cache:
+        return _index_cache[key]
+
+    if _archive_ext(archive) == ".zip":
+        with zipfile.ZipFile(archive) as z:
+            names = [i.filename for i in z.infolist() if not i.is_dir()]
+            sizes = [i.file_size for i in z.infolist() if not i.is_dir()]
+    else:
+        with tarfile.open(archive, "r:*") as t:
+            members = [m for m in t.getmembers() if m.isfile()]
+            names = [m.name for m in members]
+            sizes = [m.size for m in members]
+    names = [n[2:] if n.startswith("./") else n for n in names]
+
+    # Members all in one directory are addressed relative to it
+    root = ""
+    tops = {n.split("/")[0] for n in names}
+    if (len(tops) == 1) and all("/" in n for n in names):
+        root = tops.pop() + "/"
+
+    index = (root, dict(zip(names, sizes)))
+    _index_cache[key] = index
+
+    return index
+
+
+_index_cache = dict()
+
+
+def list_dir(path_dir):
+    """List the names of files in a directory or a directory of an archive"""
+    import os
+
+    archive, member = split_archive(path_dir)
+    if archive is None:
+        return os.listdir(path_dir)
+
+    root, sizes = _archive_index(archive)
+    prefix = root + (member.strip("/") + "/" if member.strip("/") else "")
+
+    return [
+        n[len(prefix) :]
+        for n in sizes
+        if n.startswith(prefix) and "/" not in n[len(prefix) :]
+    ]
+
+
+def file_size(path_file):
+    """Return the size of a file, uncompressed for archive members"""
+    import os
+
+    archive, member = split_archive(path_file)
+    if archive is None:
+        return os.path.getsize(path_file)
+
+    root, sizes = _archive_index(archive)
+
+    return sizes[root + member]
+
+
+def _chain(outer, *inner):
+    """Binary stream reading `outer` that closes all `inner` streams with it"""
+    import io
+
+    class _Stream(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, b):
+            data = outer.read(len(b))
+            b[: len(data)] = data
+            return len(data)
+
+        def close(self):
+            if not self.closed:
+                for f in (outer,) + inner:
+                    f.close()
+            super().close()
+
+    return io.BufferedReader(_Stream(), buffer_size=2**20)
+
+
+def _decompress(f, name):
+    """Wrap a binary stream with decompression by the extension of `name`"""
+    import bz2
+    import gzip
+    import lzma
+    import os
+
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".gz":
+        return _chain(gzip.GzipFile(fileobj=f), f)
+    if ext == ".bz2":
+        return _chain(bz2.BZ2File(f), f)
+    if ext == ".xz":
+        return _chain(lzma.LZMAFile(f), f)
+    if ext == ".zst":
+        try:
+            from compression import zstd
+
+            return _chain(zstd.ZstdFile(f), f)
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "Reading {} requires `zstandard` (pip install "
+                "pylleo[zstd])".format(name)
+            )
+        return _chain(zstandard.ZstdDecompressor().stream_reader(f), f)
+
+    return f
+
+
+def open_file(path_file):
+    """Open a data file for reading as a decompressed binary stream
+
+    Args
+    ----
+    path_file: str
+        Path of a file in a directory or archive, optionally compressed
+
+    Returns
+    -------
+    f: file object
+        Binary stream of the decompressed contents
+    """
+    import tarfile
+    import zipfile
+
+    archive, member = split_archive(path_file)
+    if archive is None:
+        return _decompress(open(path_file, "rb"), path_file)
+
+    root, _ = _archive_index(archive)
+    if _archive_ext(archive) == ".zip":
+        z = zipfile.ZipFile(archive)
+        f = _chain(z.open(root + member), z)
+    else:
+        t = tarfile.open(archive, "r:*")
+        f = _chain(t.extractfile(root + member), t)
+
+    return _decompress(f, member)
+
+
+def open_text(path_file, encoding=None):
+    """Open a data file for reading as decompressed text"""
+    import io
+
+    return io.TextIOWrapper(open_file(path_file), encoding=encoding)
+
+
+def is_plain_file(path_file):
+    """Return whether a file is uncompressed and not in an archive"""
+    archive, _ = split_archive(path_file)
+
+    return (archive is None) and (strip_compression(path_file) == path_file)
+
+
+def experiment_name(path_dir):
+    """Return the experiment name of a data directory or archive
+
+    Example
+    -------
+    >>> experiment_name("/data/20160418_W190PD3GT_34840_Skinny_2Neutral.tar.gz")
+    '20160418_W190PD3GT_34840_Skinny_2Neutral'
+    """
+    import os
+
+    name = os.path.basename(os.path.normpath(path_dir))
+    ext = _archive_ext(name)
+
+    return name[: -len(ext)] if ext else name
+
+
+def cache_dir(path_dir):
+    """Return the directory for caches and YAML files of a data directory
+
+    This is the data directory itself, or for a directory in an archive, the
+    same path with the archive replaced by a directory named after it.
+    """
+    import os
+
+    archive, member = split_archive(path_dir)
+    if archive is None:
+        return path_dir
+
+    path_cache = os.path.join(os.path.dirname(archive), experiment_name(archive))
+    if member:
+        path_cache = os.path.join(path_cache, *member.split("/"))
+    os.makedirs(path_cache, exist_ok=True)
+
+    return path_cache
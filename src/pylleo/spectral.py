@@ -0,0 +1,199 @@
+"""Sliding-window power spectra and dominant (e.g. stroke) frequencies
+
+All windows of a signal are transformed with one batched FFT over a strided
+view, so no copies of the overlapping windows are made before tapering.
+Long signals are processed in batches of windows, or chunk by chunk with
+`iter_dominant_frequency`, to keep memory bounded.
+"""
+
+
+def _windows(x, window, step):
+    """Strided view of windows of `window` samples every `step` samples"""
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    return sliding_window_view(x, window)[::step]
+
+
+def power_spectra(x, window, step, fs, taper="hann", batch=4096):
+    """Calculate power spectra of sliding windows of a signal
+
+    Args
+    ----
+    x: ndarray, shape (n,)
+        Signal, e.g. calibrated acceleration [g] of one axis
+    window: int
+        Number of samples in each window
+    step: int
+        Number of samples between the starts of windows
+    fs: float
+        Sampling frequency [Hz]
+    taper: str or None
+        `hann` window applied after removing the mean of each window, or
+        `None` for no taper
+    batch: int
+        Number of windows transformed at once
+
+    Returns
+    -------
+    freqs: ndarray, shape (window // 2 + 1,)
+        Frequencies of the spectra [Hz]
+    power: ndarray, shape (n_windows, window // 2 + 1)
+        Power spectrum of each window
+    """
+    import numpy
+
+    x = numpy.asarray(x, dtype=float)
+    freqs = numpy.fft.rfftfreq(window, d=1 / fs)
+
+    n_windows = max((len(x) - window) // step + 1, 0)
+    power = numpy.empty((n_windows, len(freqs)))
+    if n_windows == 0:
+        return freqs, power
+
+    views = _windows(x, window, step)
+    weights = numpy.hanning(window) if taper == "hann" else numpy.ones(window)
+    for i in range(0, n_windows, batch):
+        w = views[i : i + batch]
+        w = (w - w.mean(axis=1, keepdims=True)) * weights
+        spec = numpy.fft.rfft(w, axis=1)
+        power[i : i + batch] = spec.real**2 + spec.imag**2
+
+    return freqs, power
+
+
+def dominant_frequency(x, window, step, fs, fmin=0.0, fmax=None, **kwargs):
+    """Find the frequency of maximum power in sliding windows of a signal
+
+    Args
+    ----
+    x: ndarray, shape (n,)
+        Signal, e.g. calibrated acceleration [g] of one axis
+    window: int
+        Number of samples in each window
+    step: int
+        Number of samples between the starts of windows
+    fs: float
+        Sampling frequency [Hz]
+    fmin: float
+        Lowest frequency searched [Hz]
+    fmax: float, optional
+        Highest frequency searched [Hz], defaults to the Nyquist frequency.
+        A `ValueError` is raised if no frequency of the spectra of `window`
+        samples is between `fmin` and `fmax`.
+    **kwargs
+        Passed to `power_spectra`
+
+    Returns
+    -------
+    centers: ndarray of int, shape (n_windows,)
+        Index of the center sample of each window
+    freq: ndarray, shape (n_windows,)
+        Dominant frequency of each window [Hz]
+    power: ndarray, shape (n_windows,)
+        Power at the dominant frequency
+
+    Example
+    -------
+    >>> import numpy
+    >>> t = numpy.arange(2000) / 20
+    >>> _, freq, _ = dominant_frequency(numpy.sin(2 * numpy.pi * 1.5 * t),
+    ...                                 window=200, step=100, fs=20, fmin=0.5)
+    >>> freq[:3].tolist()
+    [1.5, 1.5, 1.5]
+    """
+    import numpy
+
+    freqs, power = power_spectra(x, window, step, fs, **kwargs)
+
+    fmax = freqs[-1] if fmax is None else fmax
+    band = numpy.flatnonzero((freqs >= fmin) & (freqs <= fmax))
+    if len(band) == 0:
+        raise ValueError(
+            "No frequencies of windows of {} samples are within {} to {} Hz, "
+            "widen the band or the window".format(window, fmin, fmax)
+        )
+    peak = band[0] + numpy.argmax(power[:, band], axis=1)
+
+    centers = numpy.arange(len(power)) * step + window // 2
+    peak_power = power[numpy.arange(len(power)), peak]
+
+    return centers, freqs[peak], peak_power
+
+
+def iter_dominant_frequency(chunks, window, step, fs, **kwargs):
+    """Find dominant frequencies of sliding windows chunk by chunk
+
+    Samples of windows that span chunks are carried to the next chunk, so
+    the concatenated outputs equal those of `dominant_frequency`.
+
+    Args
+    ----
+    chunks: iterable of ndarray
+        Consecutive chunks of the signal
+    window, step, fs, **kwargs
+        See `dominant_frequency`
+
+    Yields
+    ------
+    centers, freq, power: ndarray
+        Outputs of `dominant_frequency` for the windows completed by each
+        chunk, with `centers` indexing the whole signal
+    """
+    import numpy
+
+    buf = numpy.empty(0)
+    i0 = 0
+    for chunk in chunks:
+        buf = numpy.concatenate((buf, numpy.asarray(chunk, dtype=float)))
+        n_windows = (len(buf) - window) // step + 1
+        if n_windows <= 0:
+            continue
+
+        centers, freq, power = dominant_frequency(buf, window, step, fs, **kwargs)
+        yield centers + i0, freq, power
+
+        # Keep samples from the start of the next window
+        drop = n_windows * step
+        buf = buf[drop:]
+        i0 += drop
+
+
+def stroke_frequency(data_df, window_s, step_s, col="Ax_g", **kwargs):
+    """Estimate stroke frequency from calibrated acceleration of a dataframe
+
+    Args
+    ----
+    data_df: pandas.DataFrame
+        Dataframe returned by `lleoio.read_data` with calibrated acceleration
+        columns, see `lleocal.calibrate_acc`
+    window_s: float
+        Duration of each window [s]
+    step_s: float
+        Time between the starts of windows [s]
+    col: str
+        Calibrated acceleration column to analyse
+    **kwargs
+        `fmin`, `fmax`, `taper` and `batch`, see `dominant_frequency`
+
+    Returns
+    -------
+    strokes: pandas.DataFrame
+        Dominant frequency `freq` [Hz] and its `power` for each window,
+        indexed by the index of `data_df` at the center of the window
+    """
+    import pandas
+
+    from . import lleoio
+
+    interval_s = lleoio.get_time_index(data_df)["interval_s"]
+    fs = 1 / interval_s
+    window = int(round(window_s / interval_s))
+    step = max(int(round(step_s / interval_s)), 1)
+
+    x = data_df[col].to_numpy(dtype=float)
+    centers, freq, power = dominant_frequency(x, window, step, fs, **kwargs)
+
+    index = data_df.index[centers]
+    strokes = pandas.DataFrame({"freq": freq, "power": power}, index=index)
+
+    return strokes
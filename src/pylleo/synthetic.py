@@ -0,0 +1,208 @@
+"""Synthetic Little Leonardo W190PD3GT experiments for tests and benchmarks
+
+Experiment directories are written with one data file per channel, with
+header rows as written by the tag software and the values of simulated
+deployments: the accelerometer is first held still in the lower and upper
+orientation of each axis for calibration (see `calibration_regions`), after
+which the animal repeats dives with stroking, and propeller counts and
+temperature follow depth.
+"""
+
+SYNTHETIC_INTERVALS = {
+    "Acceleration-X": 0.05,
+    "Acceleration-Y": 0.05,
+    "Acceleration-Z": 0.05,
+    "Depth": 1.0,
+    "Propeller": 0.5,
+    "Temperature": 1.0,
+}
+
+UNITS = {"Acceleration": "G", "Depth": "m", "Propeller": "count", "Temperature": "°C"}
+
+COUNTS_PER_G = 1000
+COUNT_OFFSETS = {"x": 12, "y": -8, "z": 30}
+DIVE_PERIOD_S = 240.0
+DIVE_DEPTH = 40.0
+
+
+def experiment_name(
+    start="2016-04-18", tag_id=34840, animal="Skinny", notes="2Neutral"
+):
+    """Return a data directory name parsed by `utils.parse_experiment_params`
+
+    Example
+    -------
+    >>> experiment_name()
+    '20160418_W190PD3GT_34840_Skinny_2Neutral'
+    """
+    import pandas
+
+    return "{:%Y%m%d}_W190PD3GT_{}_{}_{}".format(
+        pandas.Timestamp(start), tag_id, animal, notes
+    )
+
+
+def calibration_regions(cal_s=10.0, interval_s=SYNTHETIC_INTERVALS["Acceleration-X"]):
+    """Get accelerometer rows of the calibration orientations of an experiment
+
+    Returns
+    -------
+    regions: list of tuple
+        Parameter name, `lower` or `upper` bound, and first and last row of
+        each orientation, e.g. to pass to `lleocal.update`
+    """
+    n = int(round(cal_s / interval_s))
+
+    regions = list()
+    for i, (ax, bound) in enumerate(
+        (ax, bound) for ax in "xyz" for bound in ("lower", "upper")
+    ):
+        # Leave time to turn the tag at the start and end of each orientation
+        start, end = i * n + n // 10, (i + 1) * n - n // 10 - 1
+        regions.append(("acceleration_" + ax, bound, start, end))
+
+    return regions
+
+
+def _dives(t):
+    """Depth [m], vertical speed [m/s] and swimming flag of times `t` [s]"""
+    import numpy
+
+    phase = (t % DIVE_PERIOD_S) / DIVE_PERIOD_S
+    diving = (t >= 0) & (phase < 0.6)
+    arg = numpy.pi * phase / 0.6
+    depth = numpy.where(diving, DIVE_DEPTH * numpy.sin(arg), 0.0)
+    rate = numpy.where(
+        diving, DIVE_DEPTH * numpy.pi / (0.6 * DIVE_PERIOD_S) * numpy.cos(arg), 0.0
+    )
+
+    return depth, rate, diving
+
+
+def _channel_values(channel, t, cal_s, rng):
+    """Simulate values of a channel at times `t` [s] from the start"""
+    import numpy
+
+    # Dives begin after the six calibration orientations
+    t_dive = t - 6 * cal_s
+    depth, rate, diving = _dives(t_dive)
+    speed = numpy.where(diving, 2.0, 0.5)
+
+    if channel.startswith("Acceleration"):
+        ax = channel[-1].lower()
+        i = "xyz".index(ax)
+
+        pitch = -numpy.arcsin(numpy.clip(rate / speed, -1, 1))
+        roll = 0.1 * numpy.sin(t / 50)
+        static = [
+            numpy.sin(pitch),
+            numpy.cos(pitch) * numpy.sin(roll),
+            numpy.cos(pitch) * numpy.cos(roll),
+        ][i]
+        stroke = [0.3, 0.05, 0.2][i] * numpy.sin(2 * numpy.pi * 1.5 * t) * diving
+        g = static + stroke
+
+        # Held still with each axis down (lower) and up (upper) for `cal_s`
+        orientation = (t // cal_s).astype(int)
+        calibrating = t_dive < 0
+        held = numpy.where(orientation % 2 == 0, -1.0, 1.0)
+        held = numpy.where(orientation // 2 == i, held, 0.0)
+        g = numpy.where(calibrating, held, g)
+
+        noise = rng.normal(0, 5, len(t))
+        return numpy.round(COUNT_OFFSETS[ax] + COUNTS_PER_G * g + noise), "%d"
+
+    if channel == "Depth":
+        return depth + 0.3 + rng.normal(0, 0.05, len(t)), "%.1f"
+
+    if channel == "Propeller":
+        interval_s = t[1] - t[0] if len(t) > 1 else 1.0
+        return rng.poisson(30 * speed * interval_s), "%d"
+
+    return 18 - 0.2 * depth + rng.normal(0, 0.02, len(t)), "%.2f"
+
+
+def write_experiment(
+    path_parent,
+    duration_s=3600.0,
+    intervals=None,
+    encoding="utf-8",
+    newline="\r\n",
+    start="2016-04-18 10:15:00",
+    tag_id=34840,
+    animal="Skinny",
+    notes="2Neutral",
+    cal_s=10.0,
+    chunk_rows=1000000,
+    seed=0,
+):
+    """Write a synthetic W190PD3GT experiment directory
+
+    Args
+    ----
+    path_parent: str
+        Parent directory in which to create the experiment directory
+    duration_s: float
+        Duration of the deployment [s]
+    intervals: dict, optional
+        Sampling interval [s] of channels, overriding `SYNTHETIC_INTERVALS`
+    encoding: str
+        Text encoding of the data files, e.g. `utf-8` or `shift_jis`
+    newline: str
+        Line ending of the data files
+    start: datetime-like
+        Time of the first sample
+    tag_id, animal, notes: str or int
+        Parameters in the experiment name, see `experiment_name`
+    cal_s: float
+        Duration of each calibration orientation [s], see
+        `calibration_regions`
+    chunk_rows: int
+        Number of rows simulated and written at once
+    seed: int
+        Seed of the random noise
+
+    Returns
+    -------
+    path_dir: str
+        Path of the experiment directory
+    """
+    import numpy
+    import os
+    import pandas
+
+    start = pandas.Timestamp(start)
+    name = experiment_name(start, tag_id, animal, notes)
+    path_dir = os.path.join(path_parent, name)
+    os.makedirs(path_dir, exist_ok=True)
+
+    channel_intervals = dict(SYNTHETIC_INTERVALS)
+    channel_intervals.update(intervals or dict())
+
+    for k, (channel, interval_s) in enumerate(channel_intervals.items()):
+        rng = numpy.random.default_rng(seed + k)
+        file_name = "{}-{}.TXT".format(name, channel)
+        n = int(duration_s / interval_s)
+
+        header = [
+            ("File name", file_name),
+            ("Channel", channel),
+            ("Model", "W190L-PD3GT"),
+            ("Serial No.", tag_id),
+            ("Start date", "{:%Y/%m/%d}".format(start)),
+            ("Start time", "{:%H:%M:%S}".format(start)),
+            ("Interval(Sec)", interval_s),
+            ("Unit", UNITS[channel.split("-")[0]]),
+            ("Data count", n),
+        ]
+
+        path_file = os.path.join(path_dir, file_name)
+        with open(path_file, "w", encoding=encoding, newline="") as f:
+            for key, value in header:
+                f.write('"{}","{}"{}'.format(key, value, newline))
+            for i0 in range(0, n, chunk_rows):
+                t = numpy.arange(i0, min(i0 + chunk_rows, n)) * interval_s
+                values, fmt = _channel_values(channel, t, cal_s, rng)
+                numpy.savetxt(f, values, fmt=fmt, newline=newline)
+
+    return path_dir
@@ -0,0 +1,208 @@
+"""Registry of Little Leonardo tag models and the schemas of their channels
+
+Each tag model is a list of channel schemas, dictionaries with the fields:
+
+name: str
+    Parameter name of the channel, e.g. `Acceleration-X`
+pattern: str
+    String contained in the name of the channel's data file
+ext: str
+    Extension of the channel's data file
+interval_s: float or None
+    Expected sampling interval [s], or `None` if it varies between tags and
+    is read from the file header
+dtype: str
+    Storage dtype of the channel, see `utils.to_compact`
+n_header: int or None
+    Number of header rows, or `None` to count them in each file
+header_char: str
+    Character at the beginning of each header row
+resample: str
+    Method used to downsample the channel, `mean` for measurements or `sum`
+    for counts per interval (see `lleoio.resample`)
+valid_range: list of float or None
+    Lowest and highest plausible values, outside of which values are flagged
+    by the quality checks (see `qc`)
+stuck_s: float or None
+    Duration of identical consecutive values [s] flagged as a stuck sensor
+saturates: bool or list of float
+    Lowest and highest counts the sensor outputs, values at which are
+    flagged as saturated, True for the limits of the integer `dtype`, or
+    False not to check
+
+Tag models other than those built in are registered with
+`register_tag_model`, from YAML files listed in the `PYLLEO_TAG_MODELS`
+environment variable (see `load_tag_models`), or by packages that provide a
+`pylleo.tag_models` entry point returning a dictionary of tag model names and
+channel lists.
+"""
+
+CHANNEL_DEFAULTS = {
+    "ext": ".TXT",
+    "interval_s": None,
+    "dtype": "float32",
+    "n_header": None,
+    "header_char": '"',
+    "resample": "mean",
+    "valid_range": None,
+    "stuck_s": None,
+    "saturates": False,
+}
+
+ENTRY_POINT_GROUP = "pylleo.tag_models"
+
+_registry = dict()
+_loaded = False
+
+
+def _normalize(tag_model):
+    """Return tag model name without dashes"""
+    return tag_model.replace("-", "")
+
+
+def channel(name, **kwargs):
+    """Create a channel schema, filling missing fields with defaults
+
+    Args
+    ----
+    name: str
+        Parameter name of the channel
+    **kwargs
+        Fields of the schema, see module documentation. `pattern` defaults to
+        `name`.
+
+    Returns
+    -------
+    schema: OrderedDict
+        Channel schema
+
+    Example
+    -------
+    >>> channel("Depth", interval_s=1)["pattern"]
+    'Depth'
+    """
+    from collections import OrderedDict
+
+    unknown = set(kwargs) - set(CHANNEL_DEFAULTS) - {"pattern"}
+    if unknown:
+        raise ValueError("Unknown channel fields: {}".format(sorted(unknown)))
+
+    schema = OrderedDict()
+    schema["name"] = name
+    schema["pattern"] = kwargs.pop("pattern", name)
+    for key, default in CHANNEL_DEFAULTS.items():
+        schema[key] = kwargs.get(key, default)
+
+    return schema
+
+
+def register_tag_model(tag_model, channels, overwrite=False):
+    """Register the channel schemas of a tag model
+
+    Args
+    ----
+    tag_model: str
+        Little Leonardo tag model name
+    channels: list of dict
+        Channel schemas, or keyword arguments of `channel`
+    overwrite: bool
+        Replace a tag model that is already registered
+    """
+    tag_model = _normalize(tag_model)
+    if (tag_model in _registry) and not overwrite:
+        raise KeyError("{} is already registered".format(tag_model))
+
+    _registry[tag_model] = [channel(**dict(ch)) for ch in channels]
+
+    return None
+
+
+def load_tag_models(path, overwrite=False):
+    """Register tag models from a YAML file
+
+    The file maps tag model names to lists of channel fields, e.g.
+
+    .. code:: yaml
+
+        M190LD2GT:
+        - name: Depth
+          dtype: float32
+        - name: Acceleration-X
+          dtype: int16
+    """
+    import yamlord
+
+    for tag_model, channels in yamlord.read_yaml(path).items():
+        register_tag_model(tag_model, channels, overwrite=overwrite)
+
+    return None
+
+
+def _load_plugins():
+    """Register tag models from entry points and the environment once"""
+    from importlib import metadata
+    import os
+
+    global _loaded
+    if _loaded:
+        return None
+    _loaded = True
+
+    eps = metadata.entry_points()
+    if hasattr(eps, "select"):
+        eps = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        eps = eps.get(ENTRY_POINT_GROUP, [])
+    for ep in eps:
+        models = ep.load()
+        models = models() if callable(models) else models
+        for tag_model, channels in models.items():
+            register_tag_model(tag_model, channels, overwrite=True)
+
+    for path in os.environ.get("PYLLEO_TAG_MODELS", "").split(os.pathsep):
+        if path:
+            load_tag_models(path, overwrite=True)
+
+    return None
+
+
+def get_tag_model(tag_model):
+    """Get the channel schemas of a tag model
+
+    Args
+    ----
+    tag_model: str
+        Little Leonardo tag model name
+
+    Returns
+    -------
+    channels: list of OrderedDict
+        Channel schemas, in the column order of `lleoio.read_data`
+    """
+    _load_plugins()
+
+    tag_model = _normalize(tag_model)
+    if tag_model not in _registry:
+        raise KeyError("{} not found in tag dictionary".format(tag_model))
+
+    return _registry[tag_model]
+
+
+def list_tag_models():
+    """Return names of all registered tag models"""
+    _load_plugins()
+
+    return sorted(_registry)
+
+
+register_tag_model(
+    "W190PD3GT",
+    [
+        channel("Acceleration-X", dtype="int16", stuck_s=10.0, saturates=True),
+        channel("Acceleration-Y", dtype="int16", stuck_s=10.0, saturates=True),
+        channel("Acceleration-Z", dtype="int16", stuck_s=10.0, saturates=True),
+        channel("Depth", dtype="float32", valid_range=[-5.0, 2000.0]),
+        channel("Propeller", dtype="int16", resample="sum"),
+        channel("Temperature", dtype="float32", valid_range=[-5.0, 45.0]),
+    ],
+)
@@ -16,8 +16,10 @@ def predict_encoding(file_path, n_lines=20):
     """Get file encoding of a text file"""
     import chardet
 
-    # Open the file as binary data
-    with open(file_path, "rb") as f:
+    from . import sources
+
+    # Open the file as binary data, decompressed if needed
+    with sources.open_file(file_path) as f:
         # Join binary lines for specified number of lines
         rawdata = b"".join([f.readline() for _ in range(n_lines)])
 
@@ -53,34 +55,86 @@ def get_n_header(f, header_char='"'):
 
 
 def get_tag_params(tag_model):
-    """Load param strs and n_header based on model of tag model"""
-
-    tag_model = tag_model.replace("-", "")
-    tags = dict()
-    tags["W190PD3GT"] = [
-        "Acceleration-X",
-        "Acceleration-Y",
-        "Acceleration-Z",
-        "Depth",
-        "Propeller",
-        "Temperature",
-    ]
-
-    # Return tag parameters if found, else raise error
-    if tag_model in tags:
-        return tags[tag_model]
-    else:
-        raise KeyError("{} not found in tag dictionary".format(tag_model))
+    """Load param strs based on model of tag
+
+    See also
+    --------
+    tags.get_tag_model: full channel schemas of tag models
+    """
+    from . import tags
+
+    return [ch["name"] for ch in tags.get_tag_model(tag_model)]
+
+
+def get_tag_dtypes(tag_model):
+    """Load storage dtypes of each parameter based on model of tag
+
+    Raw counts are stored as small integers, and physical values as 32 bit
+    floats.
+    """
+    from . import tags
+
+    return {ch["name"]: ch["dtype"] for ch in tags.get_tag_model(tag_model)}
+
+
+def to_compact(data, dtype):
+    """Cast data to a compact dtype if that can be done exactly
+
+    Args
+    ----
+    data: ndarray
+        Data to cast
+    dtype: numpy.dtype
+        Compact dtype to cast to. Integer data that exceeds the range of an
+        integer `dtype` is cast to the smallest integer type that holds it.
+
+    Returns
+    -------
+    data: ndarray
+        Data cast to `dtype`, or unchanged if non-integer or missing values
+        prevent an exact cast to an integer `dtype`
+
+    Example
+    -------
+    >>> import numpy
+    >>> to_compact(numpy.array([1.0, 40000.0]), "int16").dtype
+    dtype('int32')
+    >>> to_compact(numpy.array([1.0, 2.5]), "int16").dtype
+    dtype('float64')
+    """
+    import numpy
+
+    dtype = numpy.dtype(dtype)
+    if dtype.kind == "f":
+        return data.astype(dtype)
+
+    if len(data) == 0:
+        return data.astype(dtype)
+    if not (numpy.isfinite(data).all() and (data == numpy.round(data)).all()):
+        return data
+
+    for int_type in (dtype, numpy.int32, numpy.int64):
+        info = numpy.iinfo(int_type)
+        if data.min() >= info.min and data.max() <= info.max:
+            return data.astype(int_type)
+
+    return data
 
 
 def find_file(path_dir, search_str, file_ext):
-    """Find path of file in directory containing the search string"""
+    """Find path of file in directory containing the search string
+
+    Directories may be in archives and files compressed, see `sources`.
+    """
     import os
 
+    from . import sources
+
     file_path = None
 
-    for file_name in os.listdir(path_dir):
-        if (search_str in file_name) and (file_name.endswith(file_ext)):
+    for file_name in sources.list_dir(path_dir):
+        name = sources.strip_compression(file_name)
+        if (search_str in name) and (name.endswith(file_ext)):
             file_path = os.path.join(path_dir, file_name)
             break
 
@@ -124,6 +178,32 @@ def nearest(items, pivot):
     return min(items, key=lambda x: abs(x - pivot))
 
 
+def parse_size(size):
+    """Get a number of bytes from a size such as `4GB` or `512 MiB`
+
+    Example
+    -------
+    >>> parse_size("4GB"), parse_size("512 MiB"), parse_size(1000)
+    (4000000000, 536870912, 1000)
+    """
+    import re
+
+    if not isinstance(size, str):
+        return int(size)
+
+    units = {"": 1, "k": 10**3, "m": 10**6, "g": 10**9, "t": 10**12}
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kmgt]?)(i?)b?\s*", size.lower())
+    if match is None:
+        raise ValueError("Size `{}` not a number of bytes, e.g. 4GB".format(size))
+    value, unit, binary = match.groups()
+    if binary and unit:
+        factor = 1024 ** ("kmgt".index(unit) + 1)
+    else:
+        factor = units[unit]
+
+    return int(float(value) * factor)
+
+
 def parse_experiment_params(name_exp):
     """Parse experiment parameters from the data directory name
 
@@ -152,3 +232,204 @@ def parse_experiment_params(name_exp):
     tag_params["notes"] = name_exp.split("_")[4]
 
     return tag_params
+
+
+def rolling_mean_var(a, window):
+    """Calculate rolling mean and variance in O(n) with cumulative sums
+
+    Args
+    ----
+    a: ndarray, shape (n,) or (n, m)
+        Data to calculate statistics over, along the first axis
+    window: int
+        Number of samples in each window
+
+    Returns
+    -------
+    mean: ndarray, shape (n - window + 1,) or (n - window + 1, m)
+        Mean of the window starting at each sample
+    var: ndarray
+        Population variance of the window starting at each sample. Windows
+        containing NaN values are NaN in both outputs.
+
+    Example
+    -------
+    >>> mean, var = rolling_mean_var([1.0, 2.0, 3.0, 5.0], 2)
+    >>> mean.tolist(), var.tolist()
+    ([1.5, 2.5, 4.0], [0.25, 0.25, 1.0])
+    """
+    import numpy
+
+    a = numpy.asarray(a, dtype=float)
+    if len(a) < window:
+        shape = (0,) + a.shape[1:]
+        return numpy.empty(shape), numpy.empty(shape)
+
+    # Offset by the overall mean to limit loss of precision in the sums
+    nans = numpy.isnan(a)
+    center = numpy.nanmean(a, axis=0)
+    a = numpy.where(nans, 0.0, a - center)
+
+    def _window_sum(x):
+        c = numpy.cumsum(x, axis=0)
+        s = c[window - 1 :].copy()
+        s[1:] -= c[:-window]
+        return s
+
+    mean = _window_sum(a) / window
+    var = numpy.maximum(_window_sum(a * a) / window - mean * mean, 0.0)
+
+    has_nan = _window_sum(nans) > 0
+    mean[has_nan] = numpy.nan
+    var[has_nan] = numpy.nan
+
+    return mean + center, var
+
+
+def find_runs(mask):
+    """Find start and end indices of contiguous runs of `True` values
+
+    Args
+    ----
+    mask: ndarray of bool, shape (n,)
+        Boolean array to find runs in
+
+    Returns
+    -------
+    starts: ndarray of int
+        Index of the first value in each run
+    ends: ndarray of int
+        Index of the last value in each run (inclusive)
+
+    Example
+    -------
+    >>> starts, ends = find_runs([False, True, True, False, True])
+    >>> starts.tolist(), ends.tolist()
+    ([1, 4], [2, 4])
+    """
+    import numpy
+
+    mask = numpy.asarray(mask, dtype=bool)
+    edges = numpy.diff(numpy.concatenate(([0], mask.view(numpy.int8), [0])))
+
+    starts = numpy.flatnonzero(edges == 1)
+    ends = numpy.flatnonzero(edges == -1) - 1
+
+    return starts, ends
+
+
+def file_lock(path, timeout=None, poll_s=0.1):
+    """Context manager holding an exclusive lock for writing a file
+
+    The lock is held on a `<path>.lock` file, so that it is shared by all
+    processes that write `path` and is not replaced with it.
+
+    Args
+    ----
+    path: str
+        Path of the file to lock
+    timeout: float, optional
+        Seconds to wait for the lock before raising `TimeoutError`, by default
+        wait until it is released
+    poll_s: float
+        Seconds between attempts to acquire the lock
+    """
+    import contextlib
+    import os
+    import time
+
+    try:
+        import fcntl
+
+        def _try_lock(fd):
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        def _unlock(fd):
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    except ImportError:
+        import msvcrt
+
+        def _try_lock(fd):
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+        def _unlock(fd):
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    @contextlib.contextmanager
+    def _lock():
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            t0 = time.monotonic()
+            while True:
+                try:
+                    _try_lock(fd)
+                    break
+                except OSError:
+                    if (timeout is not None) and (time.monotonic() - t0 > timeout):
+                        raise TimeoutError("Timed out waiting for lock on " + path)
+                    time.sleep(poll_s)
+            try:
+                yield
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+
+    return _lock()
+
+
+def atomic_path(path):
+    """Context manager for writing a file atomically via a temporary path
+
+    Yields a temporary path in the directory of `path`, which replaces `path`
+    once the block has completed, so that readers never see partial files.
+    The temporary file is removed if the block raises.
+
+    Example
+    -------
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "data.csv")
+    >>> with atomic_path(path) as tmp:
+    ...     with open(tmp, "w") as f:
+    ...         _ = f.write("a,b")
+    >>> open(path).read()
+    'a,b'
+    """
+    import contextlib
+    import os
+    import uuid
+
+    @contextlib.contextmanager
+    def _atomic():
+        path_dir, name = os.path.split(os.path.abspath(path))
+        os.makedirs(path_dir, exist_ok=True)
+        tmp = os.path.join(path_dir, ".{}.{}.tmp".format(name, uuid.uuid4().hex))
+        try:
+            yield tmp
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    return _atomic()
+
+
+def write_pickle(obj, path):
+    """Write a pickle (e.g. a dataframe cache) atomically"""
+    with atomic_path(path) as tmp:
+        obj.to_pickle(tmp)
+
+    return None
+
+
+def write_yaml(data, path):
+    """Write a YAML file (e.g. `meta.yml` or `cal.yml`) atomically"""
+    import yamlord
+
+    with atomic_path(path) as tmp:
+        yamlord.write_yaml(data, tmp)
+
+    return None
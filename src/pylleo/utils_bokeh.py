@@ -25,7 +25,24 @@ def create_bokeh_server(io_loop, files, argvs, host, port):
     return server
 
 
-def run_server_to_disconnect(files, port=5000, new="tab"):
+def run_server_to_disconnect(files, port=5000, new="tab", argv=None, t_start=None):
+    """Serve bokeh apps, open them in the browser and stop once all are closed
+
+    Args
+    ----
+    files: list of str
+        Paths of the bokeh applications
+    port: int
+        Port of the server
+    new: str
+        Open apps in a new browser `tab` or `window`, or the `current` one
+    argv: list of str, optional
+        Command line arguments passed to the apps in `sys.argv`
+    t_start: float, optional
+        `time.perf_counter()` at startup, from which the time to the first
+        session is reported, see `metrics.report`
+    """
+
     def start_bokeh(io_loop):
         """Start the `io_loop`"""
         io_loop.start()
@@ -50,8 +67,11 @@ def run_server_to_disconnect(files, port=5000, new="tab"):
 
     def server_loop(server, io_loop):
         """Check connections once session created and close on disconnect"""
+        import logging
         import time
 
+        from . import metrics
+
         connected = [True]
         session_loaded = False
         while any(connected):
@@ -61,6 +81,18 @@ def run_server_to_disconnect(files, port=5000, new="tab"):
             if not session_loaded:
                 if sessions:
                     session_loaded = True
+                    if t_start is not None:
+                        duration_s = time.perf_counter() - t_start
+                        logging.getLogger(__name__).info(
+                            "First session after %.2f s", duration_s
+                        )
+                        metrics.report(
+                            dict(stage="first_session", duration_s=duration_s)
+                        )
+                else:
+                    # Poll quickly until the first session is created
+                    time.sleep(0.05)
+                    continue
             # Once 1+ sessions started, check for no connections
             else:
                 # List of bools for each session
@@ -87,7 +119,7 @@ def run_server_to_disconnect(files, port=5000, new="tab"):
     argvs = {}
     app_names = []
     for path in files:
-        argvs[path] = None
+        argvs[path] = argv
         app_names.append(os.path.splitext(os.path.split(path)[1])[0])
 
     # Concate hostname/port for creating handlers, launching apps
@@ -108,11 +140,13 @@ def run_server_to_disconnect(files, port=5000, new="tab"):
     # Launch each application in own tab or window
     th_launch = [None] * len(app_names)
     for i in range(len(app_names)):
+        # Delay to allow tabs to open in same browser window, the server
+        # already accepts connections for the first
+        if i > 0:
+            time.sleep(2)
         args = (host, app_names[i], new)
         th_launch[i] = threading.Thread(target=launch_app, args=args)
         th_launch[i].start()
-        # Delay to allow tabs to open in same browser window
-        time.sleep(2)
 
     # Run session connection test, then stop `io_loop`
     args = (server, io_loop)
@@ -0,0 +1,312 @@
+"""Automatic ingestion of experiments arriving in a parent directory
+
+`watch` scans a parent directory for new or changed experiment directories
+and archives (see `sources`), and ingests each of them in a bounded pool of
+worker processes once its data files have stopped changing: meta data and
+data are read into their caches, dives are detected and cached, and the
+catalog of the parent directory is updated (see `catalog`). Experiments are
+opened instantly in the calibration app afterwards.
+
+The parent directory is scanned every `poll_s` seconds, or as soon as files
+change if `watchdog` is installed. The state of each experiment (`queued`,
+`running`, `done` or `failed`), the time of its last ingestion and any error
+are written to a JSON status file, `pylleo_watch.json` in the parent
+directory by default, which is also read on startup so that experiments are
+only ingested again when their data changes.
+"""
+
+STATUS_NAME = "pylleo_watch.json"
+
+
+def status_path(path_parent):
+    """Return the default path of the status file of a parent directory"""
+    import os
+
+    return os.path.join(path_parent, STATUS_NAME)
+
+
+def read_status(path_parent, path_status=None):
+    """Read the status file of a watched parent directory
+
+    Returns
+    -------
+    status: dict
+        `pid` of the watching process, time it was `updated` and an entry per
+        experiment with its `path`, `state`, data `signature`, `ingested`
+        time, `duration_s` and `error`. Empty if no status file exists.
+    """
+    import json
+    import os
+
+    path_status = path_status or status_path(path_parent)
+    if not os.path.isfile(path_status):
+        return dict(experiments=dict())
+
+    with open(path_status) as f:
+        return json.load(f)
+
+
+def _write_status(status, path_status):
+    """Write the status file atomically, so readers never see partial files"""
+    import datetime
+    import json
+    import os
+
+    from . import utils
+
+    status["pid"] = os.getpid()
+    status["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+    with utils.atomic_path(path_status) as tmp:
+        with open(tmp, "w") as f:
+            json.dump(status, f, indent=2, sort_keys=True)
+
+    return None
+
+
+def _signature(path_dir, data_exts):
+    """Latest modification time and total size of the data files of a path"""
+    import os
+
+    from . import sources
+
+    if os.path.isfile(path_dir):
+        stat = os.stat(path_dir)
+        return [stat.st_mtime, stat.st_size]
+
+    mtime, size = 0.0, 0
+    for entry in os.scandir(path_dir):
+        name = sources.strip_compression(entry.name)
+        if entry.is_file() and os.path.splitext(name)[1] in data_exts:
+            stat = entry.stat()
+            mtime, size = max(mtime, stat.st_mtime), size + stat.st_size
+
+    return [mtime, size]
+
+
+def scan(path_parent):
+    """Find the experiment directories and archives of a parent directory
+
+    Returns
+    -------
+    experiments: dict
+        Path and data `signature` (latest modification time and total size of
+        its data files) of each experiment, by name
+    """
+    from . import catalog
+    from . import tags
+    from . import utils
+
+    experiments = dict()
+    for name, path_dir in catalog.list_experiments(path_parent).items():
+        channels = tags.get_tag_model(utils.parse_experiment_params(name)["tag_model"])
+        data_exts = {ch["ext"] for ch in channels}
+        experiments[name] = dict(
+            path=path_dir, signature=_signature(path_dir, data_exts)
+        )
+
+    return experiments
+
+
+def ingest(path_dir, overwrite=False, **kwargs):
+    """Read an experiment into its caches and detect its dives
+
+    Args
+    ----
+    path_dir: str
+        Experiment directory or archive
+    overwrite: bool
+        Create the meta data and caches again, e.g. after the data changed
+    **kwargs
+        Passed to `lleoio.read_data`
+
+    Returns
+    -------
+    duration_s: float
+        Time taken to ingest the experiment [s]
+    """
+    import time
+
+    from . import dives
+    from . import lleoio
+    from . import metrics
+    from . import sources
+    from . import utils
+
+    t0 = time.perf_counter()
+    name = sources.experiment_name(path_dir)
+    with metrics.stage("ingest", experiment=name) as record:
+        params = utils.parse_experiment_params(name)
+        meta = lleoio.read_meta(
+            path_dir, params["tag_model"], params["tag_id"], overwrite=overwrite
+        )
+        data_df = lleoio.read_data(
+            meta, path_dir, datetimes=False, overwrite=overwrite, **kwargs
+        )
+        dives.read_dives(meta, path_dir, data_df, overwrite=overwrite)
+        record["rows"] = len(data_df)
+
+    return time.perf_counter() - t0
+
+
+def _wake_event(path_parent):
+    """Event set on changes below the parent directory, if `watchdog` exists"""
+    import os
+    import threading
+
+    from . import catalog
+
+    event = threading.Event()
+    # Files written by watching itself do not wake it
+    own = (STATUS_NAME, catalog.CATALOG_NAME)
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return event, None
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, e):
+            if not any(n in os.path.basename(e.src_path) for n in own):
+                event.set()
+
+    observer = Observer()
+    observer.schedule(_Handler(), path_parent, recursive=True)
+    observer.daemon = True
+    observer.start()
+
+    return event, observer
+
+
+def watch(
+    path_parent,
+    workers=2,
+    poll_s=30.0,
+    settle_s=60.0,
+    once=False,
+    path_status=None,
+    **kwargs
+):
+    """Ingest new and changed experiments of a parent directory as they arrive
+
+    Args
+    ----
+    path_parent: str
+        Parent directory receiving experiment directories or archives
+    workers: int
+        Maximum number of experiments ingested at once, each in a process
+    poll_s: float
+        Interval between scans of the parent directory [s]
+    settle_s: float
+        Time without changes to the data files of an experiment after which
+        it is ingested [s], so that files still being copied are not read
+    once: bool
+        Ingest the experiments found by one scan, wait for them and return,
+        e.g. to run from a scheduler, instead of watching until interrupted
+    path_status: str, optional
+        Path of the status file, defaults to `status_path(path_parent)`
+    **kwargs
+        Passed to `lleoio.read_data`, e.g. `interval_s`
+
+    Returns
+    -------
+    status: dict
+        Final status, see `read_status`
+    """
+    import concurrent.futures
+    import logging
+    import time
+
+    from . import catalog
+
+    logger = logging.getLogger(__name__)
+
+    path_status = path_status or status_path(path_parent)
+    status = read_status(path_parent, path_status)
+    entries = status.setdefault("experiments", dict())
+    # Ingestion interrupted by a previous process is repeated
+    for entry in entries.values():
+        if entry["state"] in ("queued", "running"):
+            entry["state"] = "stale"
+
+    event, observer = _wake_event(path_parent)
+    running = dict()
+    logger.info("Watching %s with %d workers", path_parent, workers)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                event.clear()
+                now = time.time()
+                changed = False
+                for name, found in scan(path_parent).items():
+                    entry = entries.get(name)
+                    if name in running:
+                        continue
+                    if (
+                        (entry is not None)
+                        and entry["signature"] == found["signature"]
+                        and entry["state"] in ("done", "failed")
+                    ):
+                        continue
+                    if (not once) and (now - found["signature"][0] < settle_s):
+                        continue
+                    logger.info("Queued %s", name)
+                    # Caches of data that changed since it was ingested are stale
+                    overwrite = (entry is not None) and (
+                        entry["signature"] != found["signature"]
+                    )
+                    entries[name] = dict(
+                        path=found["path"],
+                        state="queued",
+                        signature=found["signature"],
+                        ingested=None,
+                        duration_s=None,
+                        error=None,
+                    )
+                    running[name] = pool.submit(
+                        ingest, found["path"], overwrite=overwrite, **kwargs
+                    )
+                    running[name].add_done_callback(lambda f: event.set())
+                    changed = True
+
+                # Collect finished experiments, waiting for all if run once
+                while running:
+                    done, _ = concurrent.futures.wait(
+                        running.values(),
+                        timeout=None if once else 0,
+                        return_when=concurrent.futures.FIRST_COMPLETED,
+                    )
+                    for name, future in running.items():
+                        if future.running() and entries[name]["state"] == "queued":
+                            entries[name]["state"] = "running"
+                            changed = True
+                    if changed:
+                        _write_status(status, path_status)
+                        changed = False
+                    if not done:
+                        break
+                    for name in [n for n, f in running.items() if f in done]:
+                        entry = entries[name]
+                        try:
+                            entry["duration_s"] = running.pop(name).result()
+                            entry["state"] = "done"
+                            entry["error"] = None
+                            logger.info("Ingested %s", name)
+                        except Exception as e:
+                            entry["state"] = "failed"
+                            entry["error"] = str(e)
+                            logger.warning("Could not ingest %s: %s", name, e)
+                        entry["ingested"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                    catalog.update_catalog(path_parent)
+                    changed = True
+                if changed:
+                    _write_status(status, path_status)
+
+                if once:
+                    break
+                event.wait(poll_s)
+        finally:
+            if observer is not None:
+                observer.stop()
+            _write_status(status, path_status)
+
+    return status
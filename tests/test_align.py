@@ -0,0 +1,48 @@
+def test_estimate_alignment():
+    import numpy
+    import pandas
+
+    from pylleo import align
+    from pylleo import lleoio
+
+    # Acceleration at 20 Hz, and an external series of its middle 40 min at
+    # 10 Hz, with the external clock ahead and running fast
+    rng = numpy.random.default_rng(0)
+    t_index = lleoio.time_index("2016-04-18 10:15:00", 0.05, 72000)
+    x = numpy.convolve(rng.normal(size=t_index["n"]), numpy.ones(10) / 10, "same")
+    data_df = pandas.DataFrame({"acceleration_z": x})
+    data_df["datetimes"] = lleoio.materialize_datetimes(t_index)
+    data_df.attrs["time_index"] = t_index
+
+    offset_s, drift = 123.4567, 5e-5
+    rows = numpy.arange(12000, 60000, 2)
+    t_ext = offset_s + rows * t_index["interval_s"] * (1 + drift)
+    external = pandas.Series(
+        x[rows] + rng.normal(0, 0.05, len(rows)),
+        index=t_index["start"] + pandas.to_timedelta(t_ext, unit="s"),
+    )
+
+    alignment = align.estimate_alignment(data_df, "acceleration_z", external)
+    assert abs(alignment["offset_s"] - offset_s) < 0.01
+    assert abs(alignment["drift"] - drift) < 5e-6
+    assert len(alignment["segments"]) == 4
+
+    aligned = align.apply_alignment(data_df, alignment)
+    t_aligned = lleoio.get_time_index(aligned)
+    assert t_aligned["n"] == t_index["n"]
+    assert (
+        abs((t_aligned["start"] - t_index["start"]).total_seconds() - offset_s) < 0.01
+    )
+    times = lleoio.index_to_time(t_aligned, rows)
+    assert numpy.abs((times - external.index).total_seconds()).max() < 0.01
+    assert aligned["datetimes"].iloc[-1] == lleoio.index_to_time(
+        t_aligned, t_index["n"] - 1
+    )
+    assert lleoio.get_time_index(data_df) == t_index
+
+    # Without drift, and with only an offset
+    alignment = align.estimate_alignment(
+        data_df, "acceleration_z", external.iloc[:2000], segments=1
+    )
+    assert alignment["drift"] == 0.0
+    assert abs(alignment["offset_s"] - offset_s - 600 * drift) < 0.01
@@ -0,0 +1,29 @@
+def test_archive_window(tmp_path):
+    import numpy
+    import pandas
+    import pytest
+
+    pytest.importorskip("h5py")
+
+    from pylleo import archive
+    from pylleo import lleoio
+
+    t_index = lleoio.time_index("2016-04-18 10:00:00", 0.5, 1000)
+    propeller = pandas.arrays.IntegerArray(
+        numpy.arange(1000, dtype="int16"), numpy.arange(1000) % 2 == 1
+    )
+    data_df = pandas.DataFrame(
+        {"depth": numpy.linspace(0, 10, 1000, dtype="float32"), "propeller": propeller}
+    )
+    data_df.attrs["time_index"] = t_index
+
+    path = str(tmp_path / "archive.h5")
+    archive.write_archive(path, data_df, {"experiment": "test"}, chunk_rows=64)
+    window = archive.read_archive(
+        path, "2016-04-18 10:01:00", "2016-04-18 10:02:00", datetimes=False
+    )
+
+    expected = data_df.iloc[120:241]
+    pandas.testing.assert_frame_equal(window, expected)
+    assert window.attrs["meta"] == {"experiment": "test"}
+    assert window.attrs["time_index"]["start"] == pandas.Timestamp("2016-04-18 10:01")
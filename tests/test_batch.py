@@ -0,0 +1,91 @@
+def test_calibrate_batch(tmp_path):
+    import os
+
+    import pytest
+
+    pytest.importorskip("pyarrow")
+
+    from pylleo import batch
+    from pylleo import lleocal
+    from pylleo import lleoio
+    from pylleo import parquet
+    from pylleo import synthetic
+    from pylleo import utils
+
+    path_parent = str(tmp_path)
+    path_dir = synthetic.write_experiment(path_parent, duration_s=120)
+    synthetic.write_experiment(path_parent, duration_s=120, animal="Other")
+
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    data_df = lleoio.read_data(meta, path_dir)
+    cal_dict = {"experiment": meta["experiment"], "parameters": dict()}
+    for param, bound, start, end in synthetic.calibration_regions():
+        lleocal.update(data_df, cal_dict, param, bound, start, end)
+    for param in lleocal.ACC_PARAMS:
+        lower, upper = lleocal.get_cal_data(data_df, cal_dict, param)
+        poly = lleocal.fit1d(lower, upper)
+        cal_dict["parameters"][param]["poly"] = [float(c) for c in poly]
+    utils.write_yaml(cal_dict, os.path.join(path_dir, "cal.yml"))
+
+    results = batch.calibrate_batch(path_parent, workers=1)
+    name = meta["experiment"]
+    assert results["written"] == [name]
+    assert results["uncalibrated"] == ["20160418_W190PD3GT_34840_Other_2Neutral"]
+
+    path_out = os.path.join(path_parent, batch.OUTPUT_NAME)
+    path_file = os.path.join(
+        path_out, "experiment=" + name, "date=2016-04-18", "part-0.parquet"
+    )
+    _, meta_file, cal_file = parquet.read_parquet_info(path_file)
+    assert meta_file["provenance"]["cal"] is not None
+    assert meta_file["read_strategy"] == "full"
+    assert cal_file["parameters"]["acceleration_x"]["poly"]
+
+    # Only changed calibrations are applied again
+    assert batch.calibrate_batch(path_parent, workers=1)["unchanged"] == [name]
+    cal_dict["parameters"]["acceleration_x"]["poly"][0] *= 1.01
+    utils.write_yaml(cal_dict, os.path.join(path_dir, "cal.yml"))
+    assert batch.calibrate_batch(path_parent, workers=1)["written"] == [name]
+
+    # Data that changed is read again rather than from its caches
+    synthetic.write_experiment(path_parent, duration_s=240)
+    assert batch.calibrate_batch(path_parent, workers=1)["written"] == [name]
+    t_index, meta_file, _ = parquet.read_parquet_info(path_file)
+    assert t_index["n"] == 4800
+    assert meta_file["parameters"]["acceleration_x"]["Data count"] == "4800"
+
+
+def test_calibrate_experiment_not_resampled(tmp_path):
+    import os
+    import shutil
+    import zipfile
+
+    import pytest
+
+    pytest.importorskip("pyarrow")
+
+    from pylleo import batch
+    from pylleo import lleoio
+    from pylleo import sources
+    from pylleo import synthetic
+    from pylleo import utils
+
+    path_dir = synthetic.write_experiment(str(tmp_path / "plain"), duration_s=600)
+    name = os.path.basename(path_dir)
+    path_zip = str(tmp_path / (name + ".zip"))
+    with zipfile.ZipFile(path_zip, "w") as z:
+        for f in sorted(os.listdir(path_dir)):
+            z.write(os.path.join(path_dir, f), f)
+    cal_dict = {"experiment": name, "parameters": dict()}
+    utils.write_yaml(cal_dict, os.path.join(sources.cache_dir(path_zip), "cal.yml"))
+    shutil.rmtree(path_dir)
+
+    # Archives cannot be streamed, and exports are not resampled to fit
+    meta = lleoio.read_meta(path_zip, "W190PD3GT", 34840)
+    projection = lleoio.estimate_memory(meta, path_zip, datetimes=False)
+    path_out = str(tmp_path / "out")
+    with pytest.raises(ValueError, match="resampled"):
+        batch.calibrate_experiment(path_zip, path_out, max_memory=projection // 2)
+    assert not os.path.exists(path_out)
+
+    assert batch.worker_memory(4) < batch.worker_memory(1)
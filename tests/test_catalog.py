@@ -0,0 +1,80 @@
+def _write_experiment(path_parent, name, n=200):
+    import numpy
+    import os
+
+    path_dir = os.path.join(path_parent, name)
+    os.makedirs(path_dir)
+    for channel in [
+        "Acceleration-X",
+        "Acceleration-Y",
+        "Acceleration-Z",
+        "Depth",
+        "Propeller",
+        "Temperature",
+    ]:
+        with open(os.path.join(path_dir, "{}-{}.TXT".format(name, channel)), "w") as f:
+            f.write('"File name","{}-{}.TXT"\n'.format(name, channel))
+            f.write('"Channel","{}"\n'.format(channel))
+            f.write('"Start date","2016/04/18"\n"Start time","10:15:00"\n')
+            f.write('"Interval(Sec)","1"\n"Unit","count"\n')
+            numpy.savetxt(f, numpy.arange(n), fmt="%d")
+
+    return path_dir
+
+
+def test_update_catalog(tmp_path):
+    import os
+    import pandas
+
+    from pylleo import catalog
+
+    parent = str(tmp_path)
+    name = "20160418_W190PD3GT_34840_Skinny_2Neutral"
+    path_dir = _write_experiment(parent, name)
+    os.makedirs(os.path.join(parent, "not_an_experiment"))
+
+    assert catalog.update_catalog(parent)["added"] == [name]
+    assert catalog.update_catalog(parent)["updated"] == []
+
+    experiments = catalog.find_experiments(parent, animal="Skinny")
+    assert experiments.loc[name, "cal_status"] == "none"
+    assert experiments.loc[name, "end"] == pandas.Timestamp("2016-04-18 10:18:19")
+    assert catalog.get_channels(parent, name).loc["Depth", "n_samples"] == 200
+    assert catalog.find_experiments(parent, start="2016-04-19").empty
+
+    with open(os.path.join(path_dir, "cal.yml"), "w") as f:
+        f.write("parameters:\n  acceleration_x:\n    lower: {}\n")
+    os.utime(os.path.join(path_dir, "cal.yml"), (1e10, 1e10))
+    assert catalog.update_catalog(parent)["updated"] == [name]
+    assert catalog.find_experiments(parent).loc[name, "cal_status"] == "regions"
+
+
+def test_update_catalog_archive(tmp_path):
+    import os
+    import shutil
+    import tarfile
+
+    from pylleo import catalog
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    parent = str(tmp_path)
+    path_dir = synthetic.write_experiment(parent, duration_s=60)
+    name = os.path.basename(path_dir)
+    path_archive = path_dir + ".tar.gz"
+    with tarfile.open(path_archive, "w:gz") as t:
+        t.add(path_dir, arcname=name)
+    shutil.rmtree(path_dir)
+
+    assert list(catalog.list_experiments(parent).items()) == [(name, path_archive)]
+    assert catalog.update_catalog(parent)["added"] == [name]
+    experiments = catalog.find_experiments(parent)
+    assert experiments.loc[name, "path"] == os.path.abspath(path_archive)
+    assert experiments.loc[name, "cache"] == ""
+
+    # Caches are found in the cache directory of the archive
+    meta = lleoio.read_meta(path_archive, "W190PD3GT", 34840)
+    lleoio.read_data(meta, path_archive)
+    assert catalog.update_catalog(parent)["updated"] == [name]
+    experiments = catalog.find_experiments(parent)
+    assert experiments.loc[name, "cache"] == "pydata_{}.p".format(name)
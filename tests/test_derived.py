@@ -0,0 +1,39 @@
+def test_iter_derived_chunks():
+    import numpy
+    import pandas
+
+    from pylleo import derived
+
+    acc = numpy.random.default_rng(0).normal(size=(500, 3))
+    expected = derived.derive(acc, window=20)
+
+    static = pandas.DataFrame(acc).rolling(20, center=True, min_periods=1).mean()
+    numpy.testing.assert_allclose(expected["static"], static.to_numpy())
+
+    chunks = numpy.split(acc, [3, 4, 250, 490])
+    out = list(derived.iter_derived(chunks, window=20))
+    for key, values in expected.items():
+        numpy.testing.assert_allclose(numpy.concatenate([o[key] for o in out]), values)
+
+
+def test_derive_missing_values():
+    import numpy
+    import pandas
+
+    from pylleo import derived
+
+    acc = numpy.random.default_rng(0).normal(size=(100, 3))
+    acc[:5] = numpy.nan
+    acc[50, 0] = numpy.nan
+
+    # Missing values only leave their own rows missing
+    out = derived.derive(acc, window=20)
+    static = pandas.DataFrame(acc).rolling(20, center=True, min_periods=1).mean()
+    numpy.testing.assert_allclose(out["static"], static.to_numpy())
+    assert numpy.isnan(out["odba"]).sum() == 6
+
+    chunks = numpy.split(acc, [3, 40, 60])
+    out_chunks = list(derived.iter_derived(chunks, window=20))
+    numpy.testing.assert_allclose(
+        numpy.concatenate([o["static"] for o in out_chunks]), out["static"]
+    )
@@ -0,0 +1,47 @@
+def test_detect_dives():
+    import numpy
+
+    from pylleo import dives
+
+    rng = numpy.random.default_rng(0)
+
+    # Surface reading drifting from 0.3 to 0.7 m, with dives every 700 s
+    depth = 0.3 + numpy.linspace(0, 0.4, 20000) + rng.normal(0, 0.05, 20000)
+    expected = list()
+    for start in range(100, 19000, 700):
+        n = int(rng.integers(100, 300))
+        depth[start : start + n] += 20 * numpy.sin(numpy.linspace(0, numpy.pi, n))
+        expected.append((start, start + n - 1))
+
+    # Depth sampled every fourth row
+    rows = numpy.full(len(depth) * 4, numpy.nan)
+    rows[::4] = depth
+
+    table = dives.detect_dives(rows, interval_s=0.25)
+
+    assert len(table) == len(expected)
+    for (start, end), (_, dive) in zip(expected, table.iterrows()):
+        assert abs(dive["start"] - 4 * start) <= 4 * 5
+        assert abs(dive["end"] - 4 * end) <= 4 * 5
+        assert dive["max_depth"] > 19
+
+
+def test_read_dives_cache(tmp_path):
+    from pylleo import dives
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=1200)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    data_df = lleoio.read_data(meta, path_dir, datetimes=False)
+    table = dives.read_dives(meta, path_dir, data_df)
+    assert len(table) > 0
+    assert (table["duration_s"] == (table["end"] - table["start"] + 1) * 0.05).all()
+    assert dives.read_dives(meta, path_dir, data_df).equals(table)
+
+    # Data with other rows does not reuse the cached table
+    data_1s = lleoio.read_data(meta, path_dir, datetimes=False, interval_s=1)
+    table_1s = dives.read_dives(meta, path_dir, data_1s)
+    assert len(table_1s) == len(table)
+    assert (table_1s["end"] < len(data_1s)).all()
+    assert (abs(table_1s["start"] - table["start"] / 20) <= 2).all()
@@ -0,0 +1,164 @@
+def test_detect_static():
+    import numpy
+    import pandas
+
+    from pylleo import lleocal
+
+    rng = numpy.random.default_rng(0)
+    acc = rng.normal(0, 300, (30000, 3))
+
+    # Place each axis at -g then +g, with the other axes near zero
+    regions = dict()
+    for i, param in enumerate(lleocal.ACC_PARAMS):
+        for j, (bound, sign) in enumerate([("lower", -1), ("upper", 1)]):
+            start = 10000 * i + 4000 * j + 1000
+            end = start + 2000 - 1
+            acc[start : end + 1] = rng.normal(0, 2, (2000, 3))
+            acc[start : end + 1, i] += sign * 1000
+            regions[(param, bound)] = (start, end)
+
+    data_df = pandas.DataFrame(acc.round(), columns=lleocal.ACC_PARAMS)
+    cal_dict = lleocal.detect_static(data_df, {"parameters": dict()})
+
+    for (param, bound), (start, end) in regions.items():
+        assert cal_dict["parameters"][param][bound]["start"] == start
+        assert cal_dict["parameters"][param][bound]["end"] == end
+
+
+def test_detect_static_not_inverted():
+    import numpy
+    import pandas
+    import pytest
+
+    from pylleo import lleocal
+
+    rng = numpy.random.default_rng(0)
+    acc = rng.normal(0, 300, (30000, 3))
+
+    # The z axis is only held at +g
+    for i in range(3):
+        for j, sign in enumerate([-1, 1]):
+            if (i, sign) == (2, -1):
+                continue
+            start = 10000 * i + 4000 * j + 1000
+            acc[start : start + 2000] = rng.normal(0, 2, (2000, 3))
+            acc[start : start + 2000, i] += sign * 1000
+
+    data_df = pandas.DataFrame(acc.round(), columns=lleocal.ACC_PARAMS)
+    with pytest.raises(ValueError, match="held at -g and \\+g"):
+        lleocal.detect_static(data_df, {"parameters": dict()})
+
+
+def test_fit_ellipsoid():
+    import numpy
+
+    from pylleo import lleocal
+
+    rng = numpy.random.default_rng(0)
+    transform = numpy.array(
+        [[1e-3, 2e-5, -1e-5], [2e-5, 1.05e-3, 3e-5], [-1e-5, 3e-5, 0.98e-3]]
+    )
+    offset = numpy.array([30.0, -20.0, 50.0])
+
+    # Counts of static samples in random orientations
+    acc = rng.normal(size=(10000, 3))
+    acc /= numpy.linalg.norm(acc, axis=1)[:, numpy.newaxis]
+    counts = numpy.linalg.solve(transform, acc.T).T + offset
+
+    ellipsoid = lleocal.fit_ellipsoid(counts, chunksize=3000)
+    numpy.testing.assert_allclose(ellipsoid["offset"], offset, atol=1e-6)
+    numpy.testing.assert_allclose(ellipsoid["transform"], transform, rtol=1e-6)
+
+    cal_dict = {"parameters": {"ellipsoid": ellipsoid}}
+    acc_cal = lleocal.calibrate_acc_array(counts, cal_dict, method="ellipsoid")
+    numpy.testing.assert_allclose(acc_cal, acc, atol=1e-6)
+
+
+def test_calibrate_acc_array_out():
+    import numpy
+    import pytest
+
+    from pylleo import lleocal
+
+    rng = numpy.random.default_rng(0)
+    counts = rng.integers(-1000, 1000, (500, 3)).astype(float)
+    linear = {"parameters": {p: {"poly": [1e-3, 0.01]} for p in lleocal.ACC_PARAMS}}
+    cubic = {
+        "parameters": {p: {"poly": [1e-9, 0.0, 1e-3, 0.01]} for p in lleocal.ACC_PARAMS}
+    }
+
+    for cal_dict in (linear, cubic):
+        coefs = cal_dict["parameters"]["acceleration_x"]["poly"]
+        expected = numpy.polyval(coefs, counts)
+        numpy.testing.assert_allclose(
+            lleocal.calibrate_acc_array(counts, cal_dict), expected
+        )
+
+        # float32 output, allocated or passed
+        acc = lleocal.calibrate_acc_array(counts, cal_dict, dtype="float32")
+        assert acc.dtype == numpy.float32
+        numpy.testing.assert_allclose(acc, expected, rtol=1e-6, atol=1e-6)
+        out = numpy.empty(counts.shape, dtype=numpy.float32)
+        assert lleocal.calibrate_acc_array(counts, cal_dict, out=out) is out
+        numpy.testing.assert_allclose(out, expected, rtol=1e-6, atol=1e-6)
+
+        # In place
+        values = counts.copy()
+        assert lleocal.calibrate_acc_array(values, cal_dict, out=values) is values
+        numpy.testing.assert_allclose(values, expected)
+
+    # Integer outputs would truncate calibrated values
+    with pytest.raises(ValueError, match="floating point"):
+        lleocal.calibrate_acc_array(
+            counts, linear, out=numpy.empty(counts.shape, dtype=numpy.int16)
+        )
+    with pytest.raises(ValueError, match="floating point"):
+        lleocal.calibrate_acc_array(counts, linear, dtype="int32")
+
+
+def test_propeller_slopes_grouped():
+    import numpy
+    import pandas
+
+    from pylleo import lleocal
+
+    # Speed runs of several calibration dates of two deployments
+    rng = numpy.random.default_rng(0)
+    frames = list()
+    for deployment, slopes in (("a", [0.05, 0.06]), ("b", [0.04, 0.045, 0.05])):
+        for k, slope in enumerate(slopes):
+            counts = rng.uniform(5, 60, 12)
+            speeds = slope * counts + rng.normal(0, 0.05, len(counts))
+            frames.append(
+                pandas.DataFrame(
+                    {
+                        "deployment": deployment,
+                        "date": pandas.Timestamp("2016-04-18")
+                        + pandas.Timedelta(days=k),
+                        "est_speed": speeds,
+                        "count_average": counts.round().astype(int),
+                    }
+                )
+            )
+    calibs = pandas.concat(frames, ignore_index=True)
+
+    # Reference through-origin least squares fit of each group
+    slopes = lleocal.propeller_slopes(calibs, by=["deployment", "date"])
+    assert len(slopes) == 5
+    for (deployment, date), group in calibs.groupby(["deployment", "date"]):
+        x = group[["count_average"]].to_numpy(dtype=float)
+        (expected,), _, _, _ = numpy.linalg.lstsq(x, group["est_speed"], rcond=None)
+        numpy.testing.assert_allclose(slopes[(deployment, date)], expected)
+
+    coefs = lleocal.propeller_coef(calibs, deployment="deployment")
+    for deployment in ("a", "b"):
+        numpy.testing.assert_allclose(coefs[deployment], slopes[deployment].mean())
+
+    # Without deployments, calibrations of the same date are fit together
+    by_date = lleocal.propeller_slopes(calibs)
+    date = pandas.Timestamp("2016-04-18")
+    x = calibs.loc[calibs["date"] == date, ["count_average"]].to_numpy(dtype=float)
+    y = calibs.loc[calibs["date"] == date, "est_speed"]
+    (expected,), _, _, _ = numpy.linalg.lstsq(x, y, rcond=None)
+    numpy.testing.assert_allclose(by_date[date], expected)
+    numpy.testing.assert_allclose(lleocal.propeller_coef(calibs), by_date.mean())
@@ -0,0 +1,240 @@
+def test_iter_resample_chunks():
+    import numpy
+
+    from pylleo import lleoio
+
+    data = numpy.arange(1000)
+    t_index = lleoio.time_index("2016-04-18 10:00:00", 0.05, len(data))
+
+    for how in lleoio.RESAMPLE_METHODS:
+        values, t_index_out = lleoio.resample(data, t_index, interval_s=0.3, how=how)
+        chunks = numpy.split(data, [1, 7, 500, 501])
+        chunked = list(lleoio.iter_resample(chunks, t_index, t_index_out, how=how))
+        numpy.testing.assert_array_equal(numpy.concatenate(chunked), values)
+
+    values, _ = lleoio.resample(data, t_index, interval_s=0.3, how="mean")
+    numpy.testing.assert_array_equal(values[:3], [2.5, 8.5, 14.5])
+
+
+def test_read_data_dask(tmp_path):
+    import numpy
+    import pandas
+    import pytest
+
+    pytest.importorskip("dask.dataframe")
+
+    from pylleo import lleoio
+
+    intervals = {
+        "Acceleration-X": 0.05,
+        "Acceleration-Y": 0.05,
+        "Acceleration-Z": 0.05,
+        "Depth": 1,
+        "Propeller": 0.5,
+        "Temperature": 1,
+    }
+    meta = {"tag_model": "W190PD3GT", "experiment": "test", "parameters": {}}
+    for name, interval_s in intervals.items():
+        n = int(round(301 * 0.05 / interval_s))
+        with open(str(tmp_path / "test-{}.TXT".format(name)), "w") as f:
+            f.write('"Channel","{}"\n'.format(name))
+            numpy.savetxt(f, numpy.arange(n) % 50, fmt="%d")
+        meta["parameters"][name.lower().replace("-", "_")] = {
+            "Interval(Sec)": str(interval_s),
+            "Start date": "2016/04/18",
+            "Start time": "101500",
+        }
+
+    for interval_s in (None, 0.2):
+        data_df = lleoio.read_data(
+            meta, str(tmp_path), overwrite=True, interval_s=interval_s
+        )
+        dask_df = lleoio.read_data(
+            meta, str(tmp_path), interval_s=interval_s, backend="dask"
+        )
+        assert dask_df.npartitions == 1
+
+        partitioned = lleoio.read_data_dask(
+            meta, str(tmp_path), partition_s=1.3, interval_s=interval_s
+        )
+        assert partitioned.npartitions > 1
+        pandas.testing.assert_frame_equal(
+            partitioned.compute().astype({"propeller": float}),
+            data_df.astype({"propeller": float}),
+        )
+
+
+def test_read_data_max_memory(tmp_path, caplog):
+    import logging
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=600)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+
+    full = lleoio.estimate_memory(meta, path_dir, compact=False)
+    compact = lleoio.estimate_memory(meta, path_dir)
+    assert compact < full
+
+    with caplog.at_level(logging.INFO, logger="pylleo.lleoio"):
+        data_df = lleoio.read_data(meta, path_dir, compact=False, max_memory=compact)
+    assert "strategy `compact`" in caplog.text
+    assert data_df["acceleration_x"].dtype == "int16"
+
+    # Without streaming, data that does not fit is resampled
+    projection = lleoio.estimate_memory(meta, path_dir, datetimes=False)
+    with caplog.at_level(logging.INFO, logger="pylleo.lleoio"):
+        data_df = lleoio.read_data(
+            meta, path_dir, sample_f=2, max_memory=projection // 2
+        )
+    assert "strategy `decimation`" in caplog.text
+    assert "datetimes" not in data_df
+    assert lleoio.get_time_index(data_df)["interval_s"] >= 0.2
+
+
+def test_time_index_lookups(tmp_path):
+    import numpy
+    import pandas
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    t_index = lleoio.time_index("2016-04-18 10:00:00", 0.05, 1000)
+    start = t_index["start"]
+
+    def t(seconds):
+        return start + pandas.Timedelta(seconds=seconds)
+
+    # Between samples, rounded as asked
+    assert lleoio.time_to_index(t_index, t(1.02)) == 20
+    assert lleoio.time_to_index(t_index, t(1.04)) == 21
+    assert lleoio.time_to_index(t_index, t(1.02), how="floor") == 20
+    assert lleoio.time_to_index(t_index, t(1.02), how="ceil") == 21
+    assert lleoio.time_to_index(t_index, t(1.05), how="ceil") == 21
+    idx = lleoio.time_to_index(t_index, [t(0), t(0.1), t(49.95)])
+    assert idx.tolist() == [0, 2, 999]
+
+    # Before the start and after the end
+    assert lleoio.time_to_index(t_index, t(-1)) == -20
+    assert lleoio.time_to_index(t_index, t(60)) == 1200
+    assert lleoio.time_slice(t_index, t(-10), t(0.12)) == slice(0, 3)
+    assert lleoio.time_slice(t_index, t(49.9), t(100)) == slice(998, 1000)
+    assert lleoio.time_slice(t_index, t(-10), t(100)) == slice(0, 1000)
+    for t0, t1 in ((-10, -5), (60, 70), (1.01, 1.04)):
+        rows = lleoio.time_slice(t_index, t(t0), t(t1))
+        assert rows.stop - rows.start == 0
+
+    # Data resampled to another interval
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=120)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    data_df = lleoio.read_data(meta, path_dir, interval_s=2.5)
+    t_resampled = lleoio.get_time_index(data_df)
+    assert t_resampled["interval_s"] == 2.5
+    t0, t1 = t_resampled["start"] + pandas.to_timedelta([9, 31], unit="s")
+    rows = lleoio.time_slice(t_resampled, t0, t1)
+    assert rows == slice(4, 13)
+    times = data_df["datetimes"].iloc[rows]
+    assert (times >= t0).all() and (times <= t1).all()
+    numpy.testing.assert_array_equal(
+        lleoio.index_to_time(t_resampled, numpy.arange(rows.start, rows.stop)),
+        times,
+    )
+
+
+def test_read_data_max_memory_limits(tmp_path, caplog, monkeypatch):
+    import logging
+    import os
+    import zipfile
+
+    import pytest
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path / "plain"), duration_s=600)
+    name = os.path.basename(path_dir)
+    path_zip = str(tmp_path / "zip" / (name + ".zip"))
+    os.makedirs(os.path.dirname(path_zip))
+    with zipfile.ZipFile(path_zip, "w", zipfile.ZIP_DEFLATED) as z:
+        for f in sorted(os.listdir(path_dir)):
+            if f.endswith(".TXT"):
+                z.write(os.path.join(path_dir, f), f)
+    meta = lleoio.read_meta(path_zip, "W190PD3GT", 34840)
+
+    # Rows are estimated once, as it decompresses archive members
+    estimated = list()
+    estimate_rows = lleoio._estimate_rows
+
+    def _counted(*args, **kwargs):
+        estimated.append(args)
+        return estimate_rows(*args, **kwargs)
+
+    monkeypatch.setattr(lleoio, "_estimate_rows", _counted)
+
+    # Archives cannot be streamed, even with dask installed
+    projection = lleoio.estimate_memory(meta, path_zip, datetimes=False)
+    estimated.clear()
+    with caplog.at_level(logging.INFO, logger="pylleo.lleoio"):
+        data_df = lleoio.read_data(meta, path_zip, max_memory=projection // 2)
+    assert "strategy `decimation`" in caplog.text
+    assert lleoio.get_time_index(data_df)["interval_s"] > 0.05
+    assert len(estimated) == 1
+
+    # Budgets below the memory of parsing state the smallest possible
+    with pytest.raises(ValueError, match="at least"):
+        lleoio.read_data(meta, path_zip, sample_f=2, max_memory="100kB")
+
+
+def test_read_data_unparsable(tmp_path):
+    import glob
+    import os
+
+    import numpy
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=60)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    expected = lleoio.read_data(meta, path_dir)
+
+    # Rows that are not numbers are missing values, as genfromtxt made them
+    (path_file,) = glob.glob(os.path.join(path_dir, "*-Acceleration-X.TXT"))
+    with open(path_file) as f:
+        lines = f.read().splitlines()
+    lines[meta["n_header"]["acceleration_x"] + 10] = "-"
+    with open(path_file, "w") as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+    data_df = lleoio.read_data(meta, path_dir, overwrite=True)
+    missing = data_df["acceleration_x"].isna().to_numpy()
+    assert numpy.flatnonzero(missing).tolist() == [10]
+    assert data_df.attrs["qc"]["channels"]["acceleration_x"]["missing"] == 1
+    assert len(data_df) == len(expected)
+
+
+def test_read_data_how_cached(tmp_path):
+    import os
+
+    import numpy
+    import pandas
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=60)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+
+    # Each resampling method is cached apart from the default's
+    means = lleoio.read_data(meta, path_dir, interval_s=1.0)
+    how = {"acceleration_x": "nearest"}
+    nearest = lleoio.read_data(meta, path_dir, interval_s=1.0, how=how)
+    assert not numpy.allclose(means["acceleration_x"], nearest["acceleration_x"])
+    assert len([f for f in os.listdir(path_dir) if f.endswith(".p")]) == 2
+
+    fresh = lleoio.read_data(meta, path_dir, interval_s=1.0, how=how, overwrite=True)
+    pandas.testing.assert_frame_equal(
+        lleoio.read_data(meta, path_dir, interval_s=1.0, how=how), fresh
+    )
+    pandas.testing.assert_frame_equal(nearest, fresh)
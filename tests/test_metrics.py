@@ -0,0 +1,22 @@
+def test_read_data_stages(tmp_path):
+    from pylleo import lleoio
+    from pylleo import metrics
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=60)
+
+    records = list()
+    metrics.add_callback(records.append)
+    try:
+        meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+        lleoio.read_data(meta, path_dir)
+    finally:
+        metrics.remove_callback(records.append)
+
+    stages = {r["stage"] for r in records}
+    assert {"encoding", "header", "time_axis", "tokenize", "merge"} <= stages
+    assert all(r["duration_s"] >= 0 for r in records)
+
+    (write,) = [r for r in records if r["stage"] == "cache_write"]
+    assert write["rows"] == 1200
+    assert write["bytes"] > 0
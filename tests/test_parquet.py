@@ -0,0 +1,53 @@
+def test_write_parquet(tmp_path):
+    import os
+
+    import numpy
+    import pandas
+    import pytest
+
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    from pylleo import lleoio
+    from pylleo import parquet
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(
+        str(tmp_path), duration_s=600, start="2016-04-18 23:55:00"
+    )
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    data_df = lleoio.read_data(meta, path_dir, datetimes=False)
+
+    path = str(tmp_path / "dataset")
+    for _ in range(2):
+        paths = parquet.write_parquet(path, data_df, meta, row_group_rows=1000)
+    assert [os.path.relpath(p, path) for p in paths] == [
+        os.path.join(
+            "experiment=" + meta["experiment"], "date=" + day, "part-0.parquet"
+        )
+        for day in ("2016-04-18", "2016-04-19")
+    ]
+    assert sorted(os.listdir(path))[-1] == "experiment=" + meta["experiment"]
+
+    # Row groups are time sorted, with statistics of their time ranges
+    f = pyarrow.parquet.ParquetFile(paths[0])
+    stats = [
+        f.metadata.row_group(i).column(0).statistics
+        for i in range(f.metadata.num_row_groups)
+    ]
+    assert f.metadata.num_row_groups == 6
+    assert all(a.max < b.min for a, b in zip(stats[:-1], stats[1:]))
+
+    t_index, meta_file, _ = parquet.read_parquet_info(paths[1])
+    assert meta_file["experiment"] == meta["experiment"]
+    assert t_index["start"] == pandas.Timestamp("2016-04-19")
+    assert t_index["n"] == 6000
+
+    table = pyarrow.parquet.read_table(
+        path, filters=[("datetimes", ">=", pandas.Timestamp("2016-04-19 00:04"))]
+    )
+    assert table.num_rows == 1200
+    numpy.testing.assert_array_equal(
+        table.column("acceleration_x").to_numpy(),
+        data_df["acceleration_x"].to_numpy()[-1200:],
+    )
@@ -0,0 +1,68 @@
+def test_read_data_qc(tmp_path):
+    import glob
+    import os
+
+    from pylleo import lleoio
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path), duration_s=120)
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    data_df = lleoio.read_data(meta, path_dir)
+    assert data_df.attrs["qc"]["flags"] == []
+    assert data_df.attrs["qc"]["channels"]["depth"]["rows"] == 120
+
+    def _rewrite(channel, edit):
+        (path_file,) = glob.glob(os.path.join(path_dir, "*-{}.TXT".format(channel)))
+        with open(path_file) as f:
+            lines = f.read().splitlines()
+        with open(path_file, "w") as f:
+            f.write("\r\n".join(edit(lines)) + "\r\n")
+
+    # Depths out of range, acceleration stuck for 15 s and saturated,
+    # temperature truncated
+    _rewrite("Depth", lambda lines: lines[:20] + ["-50.0", "3000.0"] + lines[22:])
+    _rewrite("Acceleration-X", lambda lines: lines[:100] + ["512"] * 300 + lines[400:])
+    _rewrite(
+        "Acceleration-Y",
+        lambda lines: lines[:100] + ["32767", "0"] * 10 + lines[120:],
+    )
+    _rewrite("Temperature", lambda lines: lines[:-10])
+    for path_file in glob.glob(os.path.join(path_dir, "*.p")):
+        os.remove(path_file)
+
+    qc = lleoio.read_data(meta, path_dir).attrs["qc"]
+    depth = qc["channels"]["depth"]
+    assert (depth["below"], depth["above"]) == (1, 1)
+    acc = qc["channels"]["acceleration_x"]
+    assert (acc["stuck_runs"], acc["stuck_rows"]) == (1, 300)
+    assert (acc["at_min"], acc["at_max"]) == (0, 0)
+    assert qc["channels"]["acceleration_y"]["at_max"] == 10
+    temp = qc["channels"]["temperature"]
+    assert temp["rows"] == temp["expected_rows"] - 10
+    assert temp["end_offset_s"] < 0
+    assert sorted(flag.split(":")[0] for flag in qc["flags"]) == [
+        "acceleration_x",
+        "acceleration_y",
+        "depth",
+        "temperature",
+        "temperature",
+    ]
+
+    # The checks are cached with the data
+    assert lleoio.read_data(meta, path_dir).attrs["qc"] == qc
+
+
+def test_saturation_at_sensor_limits():
+    import numpy
+
+    from pylleo import qc
+
+    # Values at the extremes of the data are not at those of the sensor
+    values = numpy.tile([-900.0, 0.0, 900.0], 1000)
+    report = dict()
+    _ = list(qc.iter_checked([values], report, saturation_range=[-2048, 2047]))
+    assert (report["at_min"], report["at_max"]) == (0, 0)
+
+    values[:20] = 2047
+    _ = list(qc.iter_checked([values], report, saturation_range=[-2048, 2047]))
+    assert report["at_max"] == 20
@@ -0,0 +1,95 @@
+def test_read_archives_and_compressed(tmp_path):
+    import gzip
+    import os
+    import shutil
+    import tarfile
+    import zipfile
+
+    import pandas
+
+    from pylleo import lleoio
+    from pylleo import sources
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path / "plain"), duration_s=60)
+    name = os.path.basename(path_dir)
+    expected = lleoio.read_data(
+        lleoio.read_meta(path_dir, "W190PD3GT", 34840), path_dir
+    )
+
+    # Bundles with the experiment directory, or the files at their root
+    path_zip = str(tmp_path / "zip" / (name + ".zip"))
+    os.makedirs(os.path.dirname(path_zip))
+    with zipfile.ZipFile(path_zip, "w", zipfile.ZIP_DEFLATED) as z:
+        for f in sorted(os.listdir(path_dir)):
+            if f.endswith(".TXT"):
+                z.write(os.path.join(path_dir, f), name + "/" + f)
+    path_tar = str(tmp_path / "tar" / (name + ".tar.gz"))
+    os.makedirs(os.path.dirname(path_tar))
+    with tarfile.open(path_tar, "w:gz") as t:
+        for f in sorted(os.listdir(path_dir)):
+            if f.endswith(".TXT"):
+                t.add(os.path.join(path_dir, f), f)
+
+    # Directory of gzip compressed data files
+    path_gz = str(tmp_path / "gz" / name)
+    os.makedirs(path_gz)
+    for f in os.listdir(path_dir):
+        if f.endswith(".TXT"):
+            with open(os.path.join(path_dir, f), "rb") as src:
+                with gzip.open(os.path.join(path_gz, f + ".gz"), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+
+    assert sources.is_archive(path_zip) and sources.is_archive(path_tar)
+    assert not sources.is_archive(path_gz)
+
+    for path in (path_zip, path_tar, path_gz):
+        meta = lleoio.read_meta(path, "W190PD3GT", 34840)
+        assert meta["experiment"] == name
+        data_df = lleoio.read_data(meta, path)
+        pandas.testing.assert_frame_equal(data_df, expected)
+
+    # Caches are written next to archives, and no data files are extracted
+    cached = os.listdir(str(tmp_path / "tar" / name))
+    assert {"meta.yml", "pydata_{}.p".format(name)} <= set(cached)
+    assert not [f for f in cached if f.endswith(".TXT")]
+
+
+def test_read_archive_decompressed_once(tmp_path, monkeypatch):
+    import collections
+    import os
+    import tarfile
+
+    import pandas
+
+    from pylleo import lleoio
+    from pylleo import sources
+    from pylleo import synthetic
+
+    path_dir = synthetic.write_experiment(str(tmp_path / "plain"), duration_s=60)
+    name = os.path.basename(path_dir)
+    expected = lleoio.read_data(
+        lleoio.read_meta(path_dir, "W190PD3GT", 34840), path_dir
+    )
+    path_tar = str(tmp_path / "tar" / (name + ".tar.gz"))
+    os.makedirs(os.path.dirname(path_tar))
+    with tarfile.open(path_tar, "w:gz") as t:
+        for f in sorted(os.listdir(path_dir)):
+            if f.endswith(".TXT"):
+                t.add(os.path.join(path_dir, f), f)
+    meta = lleoio.read_meta(path_tar, "W190PD3GT", 34840)
+
+    # Count the opens of each member while the data are read
+    opened = collections.Counter()
+    open_file = sources.open_file
+
+    def _counted(path, *args, **kwargs):
+        opened[path] += 1
+        return open_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(sources, "open_file", _counted)
+    data_df = lleoio.read_data(meta, path_tar)
+
+    pandas.testing.assert_frame_equal(data_df, expected)
+    assert len(opened) == len([f for f in os.listdir(path_dir) if f.endswith(".TXT")])
+    assert set(opened.values()) == {1}
@@ -0,0 +1,46 @@
+def test_iter_dominant_frequency_chunks():
+    import numpy
+
+    from pylleo import spectral
+
+    rng = numpy.random.default_rng(0)
+    t = numpy.arange(5000) / 20
+    x = numpy.sin(2 * numpy.pi * (1 + t / 250) * t) + rng.normal(0, 0.2, len(t))
+    expected = spectral.dominant_frequency(x, window=256, step=100, fs=20, fmin=0.2)
+
+    chunks = numpy.split(x, [10, 300, 301, 2500])
+    out = list(spectral.iter_dominant_frequency(chunks, 256, 100, 20, fmin=0.2))
+    for i, values in enumerate(expected):
+        numpy.testing.assert_allclose(numpy.concatenate([o[i] for o in out]), values)
+
+
+def test_stroke_frequency():
+    import numpy
+    import pandas
+
+    from pylleo import lleoio
+    from pylleo import spectral
+
+    # Strokes at 1.25 Hz on gravity, sampled at 20 Hz
+    rng = numpy.random.default_rng(0)
+    t_index = lleoio.time_index("2016-04-18 10:15:00", 0.05, 6000)
+    t = numpy.arange(t_index["n"]) * t_index["interval_s"]
+    ax = 0.3 * numpy.sin(2 * numpy.pi * 1.25 * t) + rng.normal(0, 0.05, len(t))
+    data_df = pandas.DataFrame({"Ax_g": ax - 1})
+    data_df.attrs["time_index"] = t_index
+
+    strokes = spectral.stroke_frequency(data_df, 8.0, 4.0, fmin=0.3)
+    assert len(strokes) == (6000 - 160) // 80 + 1
+    assert strokes.index[0] == 80
+    numpy.testing.assert_allclose(strokes["freq"], 1.25)
+
+
+def test_dominant_frequency_empty_band():
+    import numpy
+    import pytest
+
+    from pylleo import spectral
+
+    x = numpy.random.default_rng(0).normal(size=200)
+    with pytest.raises(ValueError, match="No frequencies"):
+        spectral.dominant_frequency(x, window=8, step=4, fs=20, fmin=1.0, fmax=2.0)
@@ -0,0 +1,25 @@
+def test_write_experiment(tmp_path):
+    import os
+
+    from pylleo import lleocal
+    from pylleo import lleoio
+    from pylleo import synthetic
+    from pylleo import utils
+
+    path_dir = synthetic.write_experiment(
+        str(tmp_path), duration_s=120, encoding="latin-1", chunk_rows=500
+    )
+    path_file = utils.find_file(path_dir, "Depth", ".TXT")
+    with open(path_file, encoding="latin-1") as f:
+        assert utils.get_n_header(f) == 9
+
+    meta = lleoio.read_meta(path_dir, "W190PD3GT", 34840)
+    assert meta["experiment"] == os.path.basename(path_dir)
+    data_df = lleoio.read_data(meta, path_dir)
+    assert len(data_df) == 2400
+
+    cal_dict = {"parameters": dict()}
+    for param, bound, start, end in synthetic.calibration_regions():
+        lleocal.update(data_df, cal_dict, param, bound, start, end)
+    lower, upper = lleocal.get_cal_data(data_df, cal_dict, "acceleration_z")
+    assert abs(lower.mean() + upper.mean() - 2 * synthetic.COUNT_OFFSETS["z"]) < 5
@@ -0,0 +1,17 @@
+def test_register_tag_model():
+    from pylleo import tags
+    from pylleo import utils
+
+    tags.register_tag_model(
+        "TEST-D2GT",
+        [{"name": "Depth", "interval_s": 1}, {"name": "Temperature"}],
+        overwrite=True,
+    )
+
+    assert "TESTD2GT" in tags.list_tag_models()
+    assert utils.get_tag_params("TESTD2GT") == ["Depth", "Temperature"]
+
+    depth = tags.get_tag_model("TEST-D2GT")[0]
+    assert depth["pattern"] == "Depth"
+    assert depth["interval_s"] == 1
+    assert depth["dtype"] == "float32"
@@ -4,3 +4,43 @@ def test_posix_string():
     a = "Foo Bar-BAZ"
     b = "foo_bar_baz"
     assert utils.posix_string(a) == b
+
+
+def test_atomic_path_and_lock(tmp_path):
+    import os
+    import pytest
+
+    from pylleo import utils
+
+    path = str(tmp_path / "cal.yml")
+    utils.write_yaml({"experiment": "test"}, path)
+
+    # A failed write leaves the previous file and no temporary files
+    with pytest.raises(RuntimeError):
+        with utils.atomic_path(path) as tmp:
+            with open(tmp, "w") as f:
+                f.write("partial")
+            raise RuntimeError
+    assert open(path).read() == "experiment: test\n"
+    assert sorted(os.listdir(str(tmp_path))) == ["cal.yml"]
+
+    # Locks are exclusive, also between opened lock files of one process
+    with utils.file_lock(path):
+        with pytest.raises(TimeoutError):
+            with utils.file_lock(path, timeout=0.2):
+                pass
+    with utils.file_lock(path, timeout=0.2):
+        pass
+
+
+def test_lazy_submodules():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, pylleo; "
+        "assert 'pandas' not in sys.modules; "
+        "pylleo.lleoio.time_index; "
+        "assert 'pandas' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
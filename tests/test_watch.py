@@ -0,0 +1,51 @@
+def test_watch_once(tmp_path):
+    import os
+
+    from pylleo import catalog
+    from pylleo import synthetic
+    from pylleo import watch
+
+    path_parent = str(tmp_path)
+    path_dir = synthetic.write_experiment(path_parent, duration_s=60)
+    name = os.path.basename(path_dir)
+    os.makedirs(os.path.join(path_parent, "not_an_experiment"))
+
+    status = watch.watch(path_parent, workers=1, once=True)
+    assert list(status["experiments"]) == [name]
+    assert status["experiments"][name]["state"] == "done"
+    assert watch.read_status(path_parent)["experiments"] == status["experiments"]
+    assert os.path.isfile(os.path.join(path_dir, "pydata_{}.p".format(name)))
+    assert os.path.isfile(os.path.join(path_dir, "pydives_{}.p".format(name)))
+    assert list(catalog.find_experiments(path_parent).index) == [name]
+
+    # Unchanged experiments are not ingested again
+    ingested = status["experiments"][name]["ingested"]
+    os.remove(os.path.join(path_dir, "pydata_{}.p".format(name)))
+    status = watch.watch(path_parent, workers=1, once=True)
+    assert status["experiments"][name]["ingested"] == ingested
+    assert not os.path.isfile(os.path.join(path_dir, "pydata_{}.p".format(name)))
+
+
+def test_watch_changed(tmp_path):
+    import os
+
+    import pandas
+    import yamlord
+
+    from pylleo import synthetic
+    from pylleo import watch
+
+    path_parent = str(tmp_path)
+    path_dir = synthetic.write_experiment(path_parent, duration_s=60)
+    name = os.path.basename(path_dir)
+    path_pickle = os.path.join(path_dir, "pydata_{}.p".format(name))
+    watch.watch(path_parent, workers=1, once=True)
+    assert len(pandas.read_pickle(path_pickle)) == 1200
+
+    # Data that grew since it was ingested replaces its caches
+    synthetic.write_experiment(path_parent, duration_s=120)
+    status = watch.watch(path_parent, workers=1, once=True)
+    assert status["experiments"][name]["state"] == "done"
+    assert len(pandas.read_pickle(path_pickle)) == 2400
+    meta = yamlord.read_yaml(os.path.join(path_dir, "meta.yml"))
+    assert meta["parameters"]["acceleration_x"]["Data count"] == "2400"